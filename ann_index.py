@@ -0,0 +1,134 @@
+# ==========================================
+# FILE: ann_index.py
+# ==========================================
+import torch
+
+
+# =====================================================
+# IVF INDEX OVER TAG EMBEDDINGS
+# =====================================================
+class IVFTagIndex:
+    """
+    Inverted-file approximate nearest-neighbor index for normalized
+    tag embeddings.
+
+    Tags are clustered with spherical k-means; a query only scores the
+    tags in its n_probe closest clusters. The index stores centroids and
+    row ids only — vectors stay in the caller's embedding matrix, which is
+    passed in at search time.
+    """
+
+    def __init__(self, centroids, lists):
+        self.centroids = centroids          # (L, D) normalized
+        self.lists = lists                  # list of L LongTensors of matrix row ids
+        self.size = sum(len(ids) for ids in lists)
+
+    @property
+    def n_lists(self):
+        return self.centroids.shape[0]
+
+    # -------------------------------------------------
+    # Build
+    # -------------------------------------------------
+    @classmethod
+    def build(cls, matrix, n_lists=None, iters=10, sample_per_list=256, seed=0, chunk_size=65536):
+        """
+        Cluster the rows of matrix (N, D) into n_lists inverted lists.
+        n_lists=None picks ~sqrt(N). k-means is trained on a sample of at
+        most sample_per_list * n_lists rows, then every row is assigned.
+        """
+        n = matrix.shape[0]
+        if n_lists is None:
+            n_lists = int(n ** 0.5)
+        n_lists = max(1, min(n_lists, n))
+
+        data = matrix.float()
+        gen = torch.Generator(device="cpu").manual_seed(seed)
+
+        sample_size = min(n, n_lists * sample_per_list)
+        sample_idx = torch.randperm(n, generator=gen)[:sample_size].to(matrix.device)
+        sample = data[sample_idx]
+
+        # Spherical k-means: centroids live on the unit sphere
+        centroids = sample[torch.randperm(sample_size, generator=gen)[:n_lists].to(matrix.device)].clone()
+        for _ in range(iters):
+            assign = (sample @ centroids.T).argmax(dim=1)
+            sums = torch.zeros_like(centroids).index_add_(0, assign, sample)
+            counts = torch.bincount(assign, minlength=n_lists)
+
+            # Re-seed empty clusters from random sample points
+            empty = (counts == 0).nonzero(as_tuple=True)[0]
+            if len(empty) > 0:
+                reseed = torch.randint(0, sample_size, (len(empty),), generator=gen).to(matrix.device)
+                sums[empty] = sample[reseed]
+
+            centroids = sums / sums.norm(dim=-1, keepdim=True).clamp(min=1e-12)
+
+        index = cls(centroids.to(matrix.dtype), [torch.empty(0, dtype=torch.long) for _ in range(n_lists)])
+        index.add(matrix, start=0, chunk_size=chunk_size)
+        return index
+
+    # -------------------------------------------------
+    # Incremental add
+    # -------------------------------------------------
+    def assign(self, vectors):
+        """Nearest centroid for each row of vectors (M, D)."""
+        return (vectors.to(self.centroids.dtype) @ self.centroids.T).argmax(dim=1)
+
+    def add(self, vectors, start, chunk_size=65536):
+        """
+        Add rows that occupy matrix positions start .. start + len(vectors).
+        """
+        for i in range(0, vectors.shape[0], chunk_size):
+            chunk = vectors[i:i + chunk_size]
+            assign = self.assign(chunk).cpu()
+            ids = torch.arange(start + i, start + i + chunk.shape[0], dtype=torch.long)
+
+            order = torch.argsort(assign, stable=True)
+            assign, ids = assign[order], ids[order]
+            lists, counts = torch.unique_consecutive(assign, return_counts=True)
+
+            offset = 0
+            for list_id, count in zip(lists.tolist(), counts.tolist()):
+                self.lists[list_id] = torch.cat([self.lists[list_id], ids[offset:offset + count]])
+                offset += count
+
+        self.size += vectors.shape[0]
+
+    # -------------------------------------------------
+    # Search
+    # -------------------------------------------------
+    def candidates(self, query, n_probe):
+        """Row ids stored in the n_probe lists closest to query (D,)."""
+        n_probe = max(1, min(n_probe, self.n_lists))
+        probe = torch.topk(self.centroids @ query.to(self.centroids.dtype), n_probe).indices.tolist()
+        return torch.cat([self.lists[c] for c in probe])
+
+    def search(self, matrix, query, n_probe=8):
+        """
+        Score query (D,) against the tags in the n_probe closest lists.
+        Returns (scores, row_ids) for the candidates, unsorted. Rows the
+        index gained after `matrix` was snapshotted are skipped.
+        """
+        ids = self.candidates(query, n_probe).to(matrix.device)
+        ids = ids[ids < matrix.shape[0]]
+        if ids.numel() == 0:
+            return torch.empty(0, device=matrix.device), ids
+        scores = matrix[ids] @ query
+        return scores, ids
+
+    # -------------------------------------------------
+    # Persistence
+    # -------------------------------------------------
+    def state_dict(self):
+        return {
+            "centroids": self.centroids.cpu(),
+            "lists": [ids.cpu() for ids in self.lists],
+        }
+
+    @classmethod
+    def from_state_dict(cls, state, device="cpu", dtype=None):
+        centroids = state["centroids"].to(device)
+        if dtype is not None:
+            centroids = centroids.to(dtype)
+        return cls(centroids, [ids.clone() for ids in state["lists"]])
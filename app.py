@@ -1,21 +1,32 @@
 # ==========================================
 # FILE: app.py (Main Flask Application)
 # ==========================================
-from flask import Flask, request, jsonify, render_template, Response
-from threading import Thread
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
+from concurrent.futures import CancelledError
 from datetime import datetime
 import uuid
 from collections import Counter
 from functools import wraps
 import random
-
-from config import PAGE_SIZE, ES_INDEX
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+
+from config import (PAGE_SIZE, ES_INDEX, IMAGE_TAGS_TOP_K, BULK_TAG_SETTINGS, IMAGE_DECODE_SETTINGS,
+                    IMAGE_TASK_SETTINGS, CLIP_SERVER_SETTINGS,
+                    IMAGE_FUSION_SETTINGS, RELATIONS_DB, RELATION_QUEUE_SETTINGS, RELATION_JOB_SETTINGS)
 from database import (get_db_connection, init_databases, add_tag_relation, delete_tag_relation, 
                      list_tag_relations, update_relation_direction, update_relation_type)
 from elasticsearch_utils import get_es_client, fetch_unique_tags, fetch_all_tags_from_es
 from clip_utils import CLIPManager
 from suggestion_engine import SuggestionEngine
 from relation_analyzer import RelationAnalyzer
+from relation_queue import RelationSuggestionQueue
+from relation_jobs import RelationMiningJobs
+from relation_store import RelationCandidateStore
+from task_queue import BoundedExecutor, TaskStore, QueueFullError
 import sqlite3
 
 import psutil
@@ -101,7 +112,12 @@ except Exception as e:
     print(f"\n  Please ensure Elasticsearch is running on {es.transport.hosts}")
     sys.exit(1)
 
-clip_manager = CLIPManager()
+if CLIP_SERVER_SETTINGS.get('mode') == 'remote':
+    # Model and tag matrix live in clip_server.py, shared by all web workers
+    from clip_server import RemoteCLIPManager
+    clip_manager = RemoteCLIPManager()
+else:
+    clip_manager = CLIPManager()
 
 import time
 
@@ -126,7 +142,8 @@ if mem > 25000:  # 25GB
 # Step 2: Fetch documents from ES
 print("\n[2/6] Fetching documents from Elasticsearch...")
 start = time.time()
-tag_lists = fetch_all_tags_from_es(es, max_docs=MAX_DOCS_LIMIT)
+tag_lists, object_ids = fetch_all_tags_from_es(es, max_docs=MAX_DOCS_LIMIT, with_ids=True)
+object_rows = {obj_id: idx for idx, obj_id in enumerate(object_ids)}  # ES id -> position in tag_lists
 elapsed = time.time() - start
 print(f"  ✓ Fetched {len(tag_lists)} documents in {elapsed:.2f}s")
 if elapsed > 10:
@@ -188,10 +205,27 @@ start = time.time()
 if not BYPASS_RELATIONS:
     print("\n[6/6] Initializing relation analyzer...")
     start = time.time()
-    relation_analyzer = RelationAnalyzer(tag_counts, tag_to_objects)
+    relation_analyzer = RelationAnalyzer(tag_counts, tag_to_objects, RelationCandidateStore(RELATIONS_DB),
+                                         lock=suggestion_engine.lock)
     print(f"  ✓ Relation analyzer ready in {time.time()-start:.2f}s")
+    relation_queue = None
+    if RELATION_QUEUE_SETTINGS.get('enabled', True):
+        relation_queue = RelationSuggestionQueue(
+            relation_analyzer, RELATIONS_DB,
+            refill_below=RELATION_QUEUE_SETTINGS.get('refill_below', 20),
+            max_size=RELATION_QUEUE_SETTINGS.get('max_size', 5000),
+        )
+        relation_queue.refresh()
+    relation_jobs = RelationMiningJobs(
+        relation_analyzer,
+        workers=RELATION_JOB_SETTINGS.get('workers', 2),
+        queue_size=RELATION_JOB_SETTINGS.get('queue_size', 16),
+        ttl_seconds=RELATION_JOB_SETTINGS.get('ttl_seconds', 600),
+    )
 else:
     relation_analyzer = None
+    relation_queue = None
+    relation_jobs = None
     print("\n[6/6] SKIPPED: Relation analyzer (bypass mode)")
 print(f"  ✓ Relation analyzer ready in {time.time()-start:.2f}s")
 
@@ -215,7 +249,12 @@ if mem > 25000:  # 25GB
 # ==========================================
 session_added = []
 session_deleted = []
-image_tasks = {}
+image_tasks = TaskStore(ttl_seconds=IMAGE_TASK_SETTINGS.get('ttl_seconds', 600))
+image_executor = BoundedExecutor(
+    max_workers=IMAGE_TASK_SETTINGS.get('workers', 4),
+    queue_size=IMAGE_TASK_SETTINGS.get('queue_size', 64),
+    name="image-task"
+)
 
 # ==========================================
 # ----- ROUTES (API & HTML) -----
@@ -278,42 +317,69 @@ def suggest_relations_endpoint():
     if relation_analyzer is None:
         return jsonify({"error": "Relations disabled in bypass mode"}), 503
 
-    suggestions = relation_analyzer.calculate_suggested_relations(
-        limit=limit * 2,  # Fetch extra to account for filtering
-        offset=offset, 
-        relation_type=relation_type,
-        force_tag=force_tag
+    # Unforced requests are served from the precomputed queue once it is built
+    if relation_queue is not None and not force_tag and relation_queue.ready(relation_type):
+        if offset == 0:
+            relation_queue.rewind(relation_type)  # fresh view: unanswered suggestions come back first
+        filtered = relation_queue.pop(relation_type, limit)
+        print(f"[API] /suggest_relations served {len(filtered)} queued results in {time.time() - start:.3f}s")
+        return jsonify(filtered)
+
+    # Mining runs as a job; identical concurrent requests share it, each with its own ticket
+    try:
+        ticket = relation_jobs.submit(relation_type, force_tag)
+    except QueueFullError:
+        return jsonify({"error": "Too many pending relation jobs, retry later"}), 429, {"Retry-After": "1"}
+    job = relation_jobs.wait(ticket, RELATION_JOB_SETTINGS.get('wait_seconds', 2.0))
+    if job is None or job["status"] in ("error", "cancelled"):
+        error = job.get("error", job["status"]) if job else "Job not found"
+        return jsonify({"error": error, "task_id": ticket}), 500
+    if job["status"] != "completed":
+        # Still mining: the client polls /relation_job_status and asks again when done
+        print(f"[API] /suggest_relations running as job ticket {ticket} ({job['progress']}%)")
+        return jsonify(relation_jobs.status(ticket, limit)), 202
+    
+    suggestions = relation_analyzer.take_page(
+        relation_jobs.result(ticket),
+        offset,
+        limit * 2  # Fetch extra to account for filtering
     )
     
     # Filter out any that already exist or are unrelated
-    from database import get_unrelated_pairs
-    unrelated = get_unrelated_pairs()
-    
-    filtered = []
-    for sugg in suggestions:
-        # Check if this pair is marked as unrelated
-        pair_key = (sugg['tag1'], sugg['tag2'])
-        reverse_key = (sugg['tag2'], sugg['tag1'])
-        
-        if pair_key in unrelated or reverse_key in unrelated:
-            continue
-        
-        # Check if already exists in confirmed relations
-        from database import get_relation
-        existing = get_relation(sugg['tag1'], sugg['tag2'])
-        if existing:
-            continue
-        
-        filtered.append(sugg)
-        
-        if len(filtered) >= limit:
-            break
+    filtered = relation_analyzer.filter_known(suggestions)[:limit]
     
     elapsed = time.time() - start
     print(f"[API] /suggest_relations completed in {elapsed:.2f}s, returned {len(filtered)} results")
     
     return jsonify(filtered[:limit])
 
+@app.route("/relation_job_status/<ticket>")
+def relation_job_status(ticket):
+    """Progress of a relation mining job, with the best suggestions found so far"""
+    if relation_jobs is None:
+        return jsonify({"error": "Relations disabled in bypass mode"}), 503
+    job = relation_jobs.status(ticket, int(request.args.get("limit", 5)))
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route("/cancel_relation_job/<ticket>", methods=["POST"])
+def cancel_relation_job(ticket):
+    """Leave a relation mining job; it stops once no other request is waiting on it"""
+    if relation_jobs is None:
+        return jsonify({"error": "Relations disabled in bypass mode"}), 503
+    job = relation_jobs.cancel(ticket)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route("/relation_queue_status")
+def relation_queue_status():
+    """Sizes and build state of the precomputed suggestion queues"""
+    if relation_queue is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(relation_queue.stats(), enabled=True))
+
 @app.route("/confirm_relation", methods=["POST"])
 def confirm_relation():
     data = request.json
@@ -338,6 +404,8 @@ def confirm_relation():
     
     add_tag_relation(tag1, tag2, relation_type, context_tags, confidence, 
                      tag1_count, tag2_count, bidirectional, cooccurrence, calculation)
+    if relation_queue is not None:
+        relation_queue.resolve(tag1, tag2)
     return jsonify({"status": "success"})
 
 @app.route("/deny_relation", methods=["POST"])
@@ -346,6 +414,8 @@ def deny_relation():
     tag1 = data.get("tag1")
     tag2 = data.get("tag2")
     add_tag_relation(tag1, tag2, "unrelated", "", 0, 0, 0, True)
+    if relation_queue is not None:
+        relation_queue.resolve(tag1, tag2)
     return jsonify({"status": "success"})
 
 @app.route("/delete_relation", methods=["POST"])
@@ -364,14 +434,15 @@ def list_relations_route():
     filter_type = request.args.get("filter_type", None)
     min_count = request.args.get("min_count", None)
     max_count = request.args.get("max_count", None)
+    cursor = request.args.get("cursor", None)
     
     if min_count is not None:
         min_count = int(min_count)
     if max_count is not None:
         max_count = int(max_count)
     
-    relations, total, stats = list_tag_relations(page, page_size, search, sort_by, 
-                                                  filter_type, min_count, max_count)
+    relations, total, stats, cursor = list_tag_relations(page, page_size, search, sort_by, 
+                                                          filter_type, min_count, max_count, cursor)
     
     # Add current tag counts to each relation
     for rel in relations:
@@ -389,6 +460,7 @@ def list_relations_route():
         "total": total,
         "total_pages": total_pages,
         "current_page": page,
+        "cursor": cursor,  # pass back with the next page request for keyset paging
         "stats": stats
     })
     
@@ -398,21 +470,22 @@ def calculate_cooccurrence(tag1, tag2):
     tag2_parts = tag2.split()
     
     # Get objects for each tag
-    tag1_objs = set()
-    for part in tag1_parts:
-        if part in tag_to_objects:
-            if not tag1_objs:
-                tag1_objs = tag_to_objects[part].copy()
-            else:
-                tag1_objs &= tag_to_objects[part]
-    
-    tag2_objs = set()
-    for part in tag2_parts:
-        if part in tag_to_objects:
-            if not tag2_objs:
-                tag2_objs = tag_to_objects[part].copy()
-            else:
-                tag2_objs &= tag_to_objects[part]
+    with suggestion_engine.lock:
+        tag1_objs = set()
+        for part in tag1_parts:
+            if part in tag_to_objects:
+                if not tag1_objs:
+                    tag1_objs = tag_to_objects[part].copy()
+                else:
+                    tag1_objs &= tag_to_objects[part]
+        
+        tag2_objs = set()
+        for part in tag2_parts:
+            if part in tag_to_objects:
+                if not tag2_objs:
+                    tag2_objs = tag_to_objects[part].copy()
+                else:
+                    tag2_objs &= tag_to_objects[part]
     
     if not tag1_objs or not tag2_objs:
         return 0
@@ -487,29 +560,69 @@ def update_direction_route():
 # ==========================================
 # IMAGE PROCESSING ENDPOINTS
 # ==========================================
-def process_image_task(task_id, file_bytes):
-    image_tasks[task_id]["status"] = "running"
-    image_tasks[task_id]["progress"] = 0
+def process_image_task(task_id, file_bytes, rank_args):
+    if not image_tasks.update(task_id, status="running", stage="decoding", progress=10):
+        return  # cancelled while queued
     
     try:
-        image_tasks[task_id]["progress"] = 10
-        result = clip_manager.process_image(file_bytes)
-        image_tasks[task_id]["tags"] = result
-        image_tasks[task_id]["status"] = "completed"
-        image_tasks[task_id]["progress"] = 100
+        future = clip_manager.embed_image_async(
+            file_bytes,
+            on_stage=lambda stage: image_tasks.update(task_id, stage="embedding", progress=50)
+        )
+        if not image_tasks.attach(task_id, future):
+            return
+        
+        emb, timings = future.result()
+        if emb is None:
+            image_tasks.update(task_id, status="error", stage="error", progress=100,
+                               error="Could not read image", timings=timings)
+            return
+        
+        if not image_tasks.update(task_id, stage="ranking", progress=90):
+            return
+        result = clip_manager.rank_tags(emb, **rank_args)
+        
+        image_tasks.update(task_id, status="completed", stage="completed", progress=100,
+                           tags=result, timings=timings)
+    except CancelledError:
+        pass
     except Exception as e:
-        image_tasks[task_id]["status"] = "error"
-        image_tasks[task_id]["error"] = str(e)
-        image_tasks[task_id]["progress"] = 100
+        image_tasks.update(task_id, status="error", stage="error", progress=100, error=str(e))
+
+def _parse_image_rank_args(form):
+    """
+    Read top_k / min_score / offset and search / n_probe from a form.
+    search: "exact" or "ann" (default: ANN when an index is built)
+    n_probe: IVF lists scanned per query, the ANN recall/latency knob
+    """
+    min_score = form.get("min_score", "")
+    n_probe = form.get("n_probe", "")
+    search = form.get("search", "")
+    return {
+        "top_k": max(1, int(form.get("top_k", IMAGE_TAGS_TOP_K))),
+        "offset": max(0, int(form.get("offset", 0))),
+        "min_score": float(min_score) if min_score != "" else None,
+        "search": search if search in ("exact", "ann") else None,
+        "n_probe": int(n_probe) if n_probe != "" else None,
+    }
 
 @app.route("/submit_image", methods=["POST"])
 def submit_image():
     if "file" not in request.files:
         return jsonify({"error": "No file provided"}), 400
     file_bytes = request.files["file"].read()
+    rank_args = _parse_image_rank_args(request.form)
+    # Tasks keep only the top-k results, never the full ranking
+    rank_args["top_k"] = min(rank_args["top_k"], IMAGE_TASK_SETTINGS.get('max_top_k', 100))
+    
     task_id = str(uuid.uuid4())
-    image_tasks[task_id] = {"status": "pending", "progress": 0}
-    Thread(target=process_image_task, args=(task_id, file_bytes), daemon=True).start()
+    image_tasks.create(task_id)
+    try:
+        future = image_executor.submit(process_image_task, task_id, file_bytes, rank_args)
+    except QueueFullError:
+        image_tasks.remove(task_id)
+        return jsonify({"error": "Too many pending image tasks, retry later"}), 429, {"Retry-After": "1"}
+    image_tasks.attach(task_id, future)
     return jsonify({"task_id": task_id})
 
 @app.route("/task_status/<task_id>")
@@ -519,17 +632,223 @@ def task_status(task_id):
         return jsonify({"error": "Task not found"}), 404
     return jsonify(task)
 
+@app.route("/cancel_task/<task_id>", methods=["POST"])
+def cancel_task(task_id):
+    task = image_tasks.cancel(task_id)
+    if not task:
+        return jsonify({"error": "Task not found"}), 404
+    return jsonify(task)
+
 @app.route("/suggest_from_image", methods=["POST"])
 def suggest_from_image():
     if "image" not in request.files:
         return jsonify({"error": "No image uploaded"}), 400
     
     file_bytes = request.files["image"].read()
-    result = clip_manager.process_image(file_bytes)
+    rank_args = _parse_image_rank_args(request.form)
+    top_k, offset = rank_args["top_k"], rank_args["offset"]
     
-    # Return top 10 tags
-    top_tags = [item["tag"] for item in result[:10]]
-    return jsonify({"tags": top_tags})
+    # Ask for one extra result to know whether a "more" page exists
+    timings = {}
+    result = clip_manager.process_image(file_bytes, timings=timings, **dict(rank_args, top_k=top_k + 1))
+    page = result[:top_k]
+    
+    return jsonify({
+        "tags": [item["tag"] for item in page],
+        "scores": [round(item["score"], 4) for item in page],
+        "has_more": len(result) > top_k,
+        "next_offset": offset + len(page),
+        "timings": timings
+    })
+
+@app.route("/suggest_from_image_fused", methods=["POST"])
+def suggest_from_image_fused():
+    """
+    One-round-trip image suggestions: the CLIP shortlist is re-ranked with
+    co-occurrence against the given tags plus the top CLIP tags.
+    Form: image, tags (comma-separated, optional), top_n, offset,
+    shortlist, search, n_probe.
+    """
+    if "image" not in request.files:
+        return jsonify({"error": "No image uploaded"}), 400
+    
+    file_bytes = request.files["image"].read()
+    rank_args = _parse_image_rank_args(request.form)
+    input_tags = [t.strip().lower() for t in request.form.get("tags", "").split(",") if t.strip()]
+    top_n = max(1, int(request.form.get("top_n", 10)))
+    offset = max(0, int(request.form.get("offset", 0)))
+    shortlist = max(1, int(request.form.get("shortlist", IMAGE_FUSION_SETTINGS.get('shortlist_size', 50))))
+    
+    timings = {}
+    clip_ranking = clip_manager.process_image(
+        file_bytes, top_k=shortlist, min_score=rank_args["min_score"],
+        search=rank_args["search"], n_probe=rank_args["n_probe"], timings=timings)
+    
+    start = time.perf_counter()
+    result = suggestion_engine.calculate_image_suggestions(
+        clip_ranking, input_tags, top_n, offset,
+        seed_count=IMAGE_FUSION_SETTINGS.get('seed_tags', 5),
+        rrf_k=IMAGE_FUSION_SETTINGS.get('rrf_k', 60),
+        clip_weight=IMAGE_FUSION_SETTINGS.get('clip_weight', 1.0),
+        cooccurrence_weight=IMAGE_FUSION_SETTINGS.get('cooccurrence_weight', 1.0),
+    )
+    timings["fusion_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+    result["timings"] = timings
+    return jsonify(result)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")
+
+class TooManyImages(Exception):
+    pass
+
+def _copy_upload(src, dst, max_bytes, chunk_size=1 << 20):
+    """Copy src to dst, stopping past max_bytes (0 = no limit). Returns the bytes copied."""
+    copied = 0
+    while not max_bytes or copied <= max_bytes:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        dst.write(chunk)
+        copied += len(chunk)
+    return copied
+
+def _collect_bulk_images(files, archive, max_files, spools):
+    """
+    Gather (name, data) pairs from uploaded files and/or a zip archive,
+    counting images as they are found: TooManyImages is raised as soon as
+    there are more than max_files. The request closes its uploads before
+    the response streams, so they are copied to temporary files (appended
+    to spools) and every image is read back only when it is submitted.
+    Oversized entries are returned separately and never read.
+    """
+    max_bytes = IMAGE_DECODE_SETTINGS.get('max_bytes')
+    images, rejected = [], []
+    
+    def add(name, data):
+        if len(images) >= max_files:
+            raise TooManyImages(max_files)
+        images.append((name, data))
+    
+    if files:
+        uploads = tempfile.TemporaryFile()
+        spools.append(uploads)
+        
+        def read_back(offset, size):
+            uploads.seek(offset)
+            return uploads.read(size)
+        
+        for f in files:
+            if len(images) >= max_files:
+                raise TooManyImages(max_files)
+            offset = uploads.seek(0, io.SEEK_END)
+            size = _copy_upload(f.stream, uploads, max_bytes)
+            if max_bytes and size > max_bytes:
+                uploads.truncate(offset)
+                rejected.append((f.filename, f"Image exceeds {max_bytes:,} bytes"))
+                continue
+            add(f.filename, lambda offset=offset, size=size: read_back(offset, size))
+    
+    if archive is not None:
+        archive_file = tempfile.TemporaryFile()
+        spools.append(archive_file)
+        shutil.copyfileobj(archive.stream, archive_file)
+        zf = zipfile.ZipFile(archive_file)
+        
+        def read_member(info):
+            # Never more than max_bytes + 1, whatever the header claims; decode rejects the rest
+            try:
+                with zf.open(info) as member:
+                    return member.read(max_bytes + 1) if max_bytes else member.read()
+            except (zipfile.BadZipFile, OSError, EOFError) as e:
+                print(f"[CLIP] Failed to read {info.filename} from archive: {e}")
+                return b""
+        
+        for info in zf.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if max_bytes and info.file_size > max_bytes:
+                rejected.append((info.filename, f"Image exceeds {max_bytes:,} bytes"))
+                continue
+            add(info.filename, lambda info=info: read_member(info))
+    
+    return images, rejected
+
+@app.route("/bulk_tag_images", methods=["POST"])
+def bulk_tag_images():
+    """
+    Tag many images in one request: multipart "images" files and/or a zip
+    "archive". Results stream back as NDJSON (or SSE with format=sse), one
+    line per image in completion order, then a final summary line.
+    """
+    files = request.files.getlist("images")
+    archive = request.files.get("archive")
+    if not files and archive is None:
+        return jsonify({"error": "No images uploaded"}), 400
+    
+    max_files = BULK_TAG_SETTINGS.get('max_files', 20000)
+    spools = []
+    
+    def close_spools():
+        for spool in spools:
+            spool.close()
+    
+    try:
+        images, rejected = _collect_bulk_images(files, archive, max_files, spools)
+    except zipfile.BadZipFile:
+        close_spools()
+        return jsonify({"error": "Archive is not a valid zip file"}), 400
+    except TooManyImages:
+        close_spools()
+        return jsonify({"error": f"Too many images, limit is {max_files}"}), 413
+    
+    rank_args = _parse_image_rank_args(request.form)
+    concurrency = int(request.form.get("concurrency", BULK_TAG_SETTINGS.get('concurrency', 32)))
+    concurrency = max(1, min(concurrency, BULK_TAG_SETTINGS.get('max_concurrency', 128)))
+    use_sse = request.form.get("format", request.args.get("format", "")) == "sse"
+    
+    def encode(payload):
+        line = json.dumps(payload)
+        return f"data: {line}\n\n" if use_sse else line + "\n"
+    
+    def generate():
+        start = time.time()
+        completed = failed = 0
+        
+        for name, error in rejected:
+            failed += 1
+            yield encode({"name": name, "error": error})
+        
+        try:
+            for name, tags, timings in clip_manager.iter_tag_images(images, concurrency, **rank_args):
+                if tags is None:
+                    failed += 1
+                    yield encode({"name": name, "error": timings.get("error", "Could not read image"),
+                                  "timings": timings})
+                    continue
+                completed += 1
+                yield encode({
+                    "name": name,
+                    "tags": [item["tag"] for item in tags],
+                    "scores": [round(item["score"], 4) for item in tags],
+                    "timings": timings
+                })
+        finally:
+            close_spools()
+        
+        yield encode({
+            "done": True,
+            "completed": completed,
+            "failed": failed,
+            "elapsed_ms": round((time.time() - start) * 1000.0, 1)
+        })
+    
+    mimetype = "text/event-stream" if use_sse else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+@app.route("/clip_stats")
+def clip_stats():
+    """Image inference queue depth, batch sizes and stage latencies"""
+    return jsonify(clip_manager.inference_stats())
 
 @app.route("/add_tags", methods=["POST"])
 def add_tags():
@@ -540,6 +859,27 @@ def add_tags():
 # ==========================================
 # OBJECT MANAGEMENT ENDPOINTS
 # ==========================================
+def index_object(obj_id, tags):
+    """Count a new object in the in-memory index; suggestion and relation statistics update incrementally"""
+    if not tags:
+        return
+    with suggestion_engine.lock:
+        if obj_id in object_rows:
+            return
+        row = object_rows[obj_id] = suggestion_engine.add_object(tags)
+        if relation_analyzer is not None:
+            relation_analyzer.add_object(row, tags)
+
+def unindex_object(obj_id):
+    """Drop a deleted object from the in-memory index (its row stays, empty)"""
+    with suggestion_engine.lock:
+        row = object_rows.pop(obj_id, None)
+        if row is None:
+            return
+        tags = suggestion_engine.remove_object(row)
+        if relation_analyzer is not None:
+            relation_analyzer.remove_object(row, tags)
+
 @app.route("/add_object", methods=["POST"])
 def add_object_endpoint():
     data = request.json
@@ -548,6 +888,7 @@ def add_object_endpoint():
         return jsonify({"error": "No tags provided"}), 400
     obj_id = str(uuid.uuid4())
     es.index(index=ES_INDEX, id=obj_id, document={"tags": tags, "added": datetime.now()})
+    index_object(obj_id, tags)
     session_added.append({"id": obj_id, "tags": tags})
     return jsonify({"id": obj_id, "tags": tags})
 
@@ -560,6 +901,7 @@ def delete_object_endpoint():
     try:
         doc = es.get(index=ES_INDEX, id=obj_id)["_source"]
         es.delete(index=ES_INDEX, id=obj_id)
+        unindex_object(obj_id)
         session_deleted.append({"id": obj_id, "tags": doc.get("tags", [])})
         return jsonify({"deleted_id": obj_id, "tags": doc.get("tags", [])})
     except:
@@ -607,6 +949,7 @@ def delete_duplicates():
     for obj_id in ids_to_delete:
         try:
             es.delete(index=ES_INDEX, id=obj_id)
+            unindex_object(obj_id)
             deleted_ids.append(obj_id)
         except:
             pass
@@ -618,10 +961,12 @@ def revert_session():
     for obj in session_added:
         if es.exists(index=ES_INDEX, id=obj["id"]):
             es.delete(index=ES_INDEX, id=obj["id"])
+            unindex_object(obj["id"])
             reverted["added_deleted"].append(obj["id"])
     session_added.clear()
     for obj in session_deleted:
         es.index(index=ES_INDEX, id=obj["id"], document={"tags": obj["tags"]})
+        index_object(obj["id"], obj["tags"])
         reverted["deleted_restored"].append(obj["id"])
     session_deleted.clear()
     return jsonify({"status": "success", "reverted": reverted})
@@ -737,10 +1082,10 @@ def update_performance_settings():
             PERF_SETTINGS[key] = value
     
     # Clear caches when settings change
-    if hasattr(relation_analyzer, '_suggestion_cache'):
-        relation_analyzer._suggestion_cache.clear()
-    if hasattr(relation_analyzer, '_tag_contexts_cache'):
-        delattr(relation_analyzer, '_tag_contexts_cache')
+    if relation_analyzer is not None:
+        relation_analyzer.invalidate()
+    if relation_queue is not None:
+        relation_queue.refresh(restart=True)
     
     return jsonify({"status": "success", "settings": PERF_SETTINGS})
 
@@ -753,10 +1098,10 @@ def reset_performance_settings():
     PERF_SETTINGS.update(PERF_SETTINGS_DEFAULTS)
     
     # Clear caches
-    if hasattr(relation_analyzer, '_suggestion_cache'):
-        relation_analyzer._suggestion_cache.clear()
-    if hasattr(relation_analyzer, '_tag_contexts_cache'):
-        delattr(relation_analyzer, '_tag_contexts_cache')
+    if relation_analyzer is not None:
+        relation_analyzer.invalidate()
+    if relation_queue is not None:
+        relation_queue.refresh(restart=True)
     
     return jsonify({"status": "success", "settings": PERF_SETTINGS})
 
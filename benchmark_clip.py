@@ -0,0 +1,180 @@
+# ==========================================
+# FILE: benchmark_clip.py
+# ==========================================
+"""
+Benchmarks for CLIP tag retrieval.
+
+  python benchmark_clip.py ann [--cache tag_embeddings.pt] [--synthetic N]
+      Recall@10 and per-query latency of the IVF index vs. brute force.
+
+  python benchmark_clip.py cpu --images DIR [--dtype auto] [--no-quantize] [--threads N]
+      Embeddings/s of the CPU inference profile and its top-10 tag agreement
+      with the float32 reference model.
+"""
+import argparse
+import os
+import time
+
+import torch
+
+from config import TAG_EMBEDDING_CACHE, ANN_SETTINGS
+from ann_index import IVFTagIndex
+
+
+def _normalize(tensor):
+    return tensor / tensor.norm(dim=-1, keepdim=True).clamp(min=1e-12)
+
+
+def _load_tag_matrix(cache_path, synthetic, dim=512):
+    """Real CLIP tag embeddings from the cache, or clustered random vectors."""
+    if not synthetic:
+        try:
+            cache = torch.load(cache_path, map_location="cpu")
+            print(f"Loaded {len(cache['tags']):,} tag embeddings from {cache_path}")
+            return cache["embeddings"].float()
+        except FileNotFoundError:
+            print(f"No cache at {cache_path}, falling back to synthetic data")
+            synthetic = 200000
+
+    gen = torch.Generator().manual_seed(0)
+    centers = _normalize(torch.randn(max(1, synthetic // 500), dim, generator=gen))
+    assign = torch.randint(0, centers.shape[0], (synthetic,), generator=gen)
+    print(f"Generated {synthetic:,} synthetic tag embeddings")
+    return _normalize(centers[assign] + 0.6 * torch.randn(synthetic, dim, generator=gen) / dim ** 0.5)
+
+
+# =====================================================
+# ANN vs. BRUTE FORCE
+# =====================================================
+def bench_ann(args):
+    matrix = _load_tag_matrix(args.cache, args.synthetic)
+    n = matrix.shape[0]
+
+    # Queries: perturbed tag embeddings stand in for image embeddings
+    gen = torch.Generator().manual_seed(1)
+    picks = torch.randint(0, n, (args.queries,), generator=gen)
+    queries = _normalize(matrix[picks] + args.noise * _normalize(torch.randn(args.queries, matrix.shape[1], generator=gen)))
+
+    start = time.perf_counter()
+    index = IVFTagIndex.build(matrix, n_lists=args.n_lists or ANN_SETTINGS.get('n_lists'),
+                              iters=ANN_SETTINGS.get('kmeans_iters', 10))
+    print(f"Built IVF index: {index.n_lists} lists in {time.perf_counter() - start:.2f}s\n")
+
+    # Brute-force ground truth
+    truth = []
+    start = time.perf_counter()
+    for q in queries:
+        truth.append(set(torch.topk(matrix @ q, 10).indices.tolist()))
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    print(f"{'mode':<14}{'recall@10':>10}{'ms/query':>10}{'scanned':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{exact_ms:>10.3f}{n:>10,}")
+
+    for n_probe in args.n_probe:
+        hits = 0
+        scanned = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            scores, ids = index.search(matrix, q, n_probe)
+            scanned += ids.numel()
+            top = ids[torch.topk(scores, min(10, scores.numel())).indices]
+            hits += len(expected & set(top.tolist()))
+        ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = hits / (10 * len(queries))
+        print(f"{'ann p=' + str(n_probe):<14}{recall:>10.3f}{ann_ms:>10.3f}{scanned // len(queries):>10,}")
+
+
+# =====================================================
+# CPU INFERENCE PROFILE vs. FLOAT32 REFERENCE
+# =====================================================
+def _load_images(path, limit):
+    """Raw bytes of up to limit images from a directory."""
+    exts = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")
+    names = sorted(n for n in os.listdir(path) if n.lower().endswith(exts))[:limit]
+    images = []
+    for name in names:
+        with open(os.path.join(path, name), "rb") as f:
+            images.append(f.read())
+    return images
+
+
+def _load_tags(cache_path, tags_file, limit):
+    if tags_file:
+        with open(tags_file, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()][:limit]
+    return torch.load(cache_path, map_location="cpu")["tags"][:limit]
+
+
+def _time_embeddings(manager, images, batch_size):
+    """Embed all images in batches; returns (embeddings, images per second)."""
+    tensors = [manager._load_image(b) for b in images]
+    tensors = [t for t in tensors if t is not None]
+    start = time.perf_counter()
+    embs = [manager._encode_image_batch(tensors[i:i + batch_size])
+            for i in range(0, len(tensors), batch_size)]
+    elapsed = time.perf_counter() - start
+    return torch.cat(embs), len(tensors) / elapsed
+
+
+def bench_cpu(args):
+    from clip_utils import CLIPManager
+
+    images = _load_images(args.images, args.limit)
+    tags = _load_tags(args.cache, args.tags_file, args.max_tags)
+    print(f"{len(images)} images, {len(tags):,} tags\n")
+
+    profiles = [
+        ("reference fp32", {"dtype": "float32", "quantize_int8": False, "num_threads": args.threads}),
+        ("cpu profile", {"dtype": args.dtype, "quantize_int8": not args.no_quantize, "num_threads": args.threads}),
+    ]
+
+    results = []
+    for name, settings in profiles:
+        manager = CLIPManager(device="cpu", cpu_settings=settings)
+        tag_matrix = torch.stack(list(manager.precompute_tag_embeddings(tags).values())).float()
+
+        _time_embeddings(manager, images[:args.batch_size], args.batch_size)  # warm-up
+        embs, rate = _time_embeddings(manager, images, args.batch_size)
+        top10 = torch.topk(embs.float() @ tag_matrix.T, 10, dim=1).indices
+        results.append((name, rate, top10))
+        manager.batcher.stop()
+
+    ref_top10 = results[0][2]
+    print(f"{'profile':<18}{'emb/s':>10}{'top-10 agreement':>20}")
+    for name, rate, top10 in results:
+        agreement = sum(len(set(a.tolist()) & set(b.tolist())) for a, b in zip(top10, ref_top10))
+        agreement /= 10 * len(ref_top10)
+        print(f"{name:<18}{rate:>10.2f}{agreement:>20.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLIP tag retrieval benchmarks")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    ann = sub.add_parser("ann", help="IVF index recall@10 and latency vs. brute force")
+    ann.add_argument("--cache", default=TAG_EMBEDDING_CACHE)
+    ann.add_argument("--synthetic", type=int, default=0, help="Use N synthetic embeddings instead of the cache")
+    ann.add_argument("--queries", type=int, default=200)
+    ann.add_argument("--noise", type=float, default=0.5, help="Query perturbation norm")
+    ann.add_argument("--n-lists", type=int, default=None)
+    ann.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    ann.set_defaults(func=bench_ann)
+
+    cpu = sub.add_parser("cpu", help="CPU inference profile throughput and top-10 agreement")
+    cpu.add_argument("--images", required=True, help="Directory of sample images")
+    cpu.add_argument("--limit", type=int, default=256)
+    cpu.add_argument("--batch-size", type=int, default=16)
+    cpu.add_argument("--cache", default=TAG_EMBEDDING_CACHE, help="Tag list source")
+    cpu.add_argument("--tags-file", default=None, help="One tag per line (instead of the cache)")
+    cpu.add_argument("--max-tags", type=int, default=20000)
+    cpu.add_argument("--dtype", default="auto", choices=["auto", "float32", "bfloat16"])
+    cpu.add_argument("--no-quantize", action="store_true")
+    cpu.add_argument("--threads", type=int, default=None)
+    cpu.set_defaults(func=bench_cpu)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+# ==========================================
+# FILE: clip_server.py
+# ==========================================
+"""
+Dedicated CLIP inference process.
+
+  python clip_server.py [--no-es]
+
+Loads the model once and serves image embeddings to any number of web
+worker processes over a local multiprocessing connection. The tag
+embedding matrix is published as float32 in shared memory, so workers
+rank tags without their own copy of the model or the matrix.
+
+Set CLIP_SERVER_SETTINGS['mode'] = 'remote' to make app.py connect to it.
+Both processes need the same secret in CLIP_SERVER_AUTHKEY, e.g.
+
+  CLIP_SERVER_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(32))")
+
+The connection unpickles what it receives, so anyone holding the key can
+run code in the other process; neither side starts without one.
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.managers import BaseManager
+
+import numpy as np
+import torch
+
+from config import CLIP_SERVER_SETTINGS
+from clip_utils import CLIPManager
+
+
+# =====================================================
+# CONNECTION SECRET
+# =====================================================
+MIN_AUTHKEY_BYTES = 16
+DEFAULT_AUTHKEYS = {b'change-me'}
+
+
+def server_authkey(authkey=None):
+    """
+    Shared secret of the server connection: `authkey`, or the variable
+    named by CLIP_SERVER_SETTINGS['authkey_env']. Raises RuntimeError when
+    it is unset, a known default or shorter than MIN_AUTHKEY_BYTES.
+    """
+    env_name = CLIP_SERVER_SETTINGS.get('authkey_env', 'CLIP_SERVER_AUTHKEY')
+    key = authkey if authkey is not None else os.environ.get(env_name, '')
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    if not key:
+        raise RuntimeError(f"{env_name} is not set; refusing to run the CLIP server connection without a secret")
+    if key in DEFAULT_AUTHKEYS or len(key) < MIN_AUTHKEY_BYTES:
+        raise RuntimeError(f"{env_name} is a default or shorter than {MIN_AUTHKEY_BYTES} bytes; "
+                           f"set a random secret")
+    return key
+
+
+# =====================================================
+# SHARED-MEMORY TAG MATRIX
+# =====================================================
+class SharedTagMatrix:
+    """
+    float32 (capacity, D) tag embedding matrix in a shared memory segment.
+
+    A small header holds the number of published rows and a "retired"
+    flag. The server writes rows first and bumps the row count after, so
+    readers never see a partial row. When the matrix outgrows the
+    segment, the server publishes a new one and retires the old; readers
+    that see the flag re-attach.
+    """
+
+    HEADER_BYTES = 64
+
+    def __init__(self, shm, capacity, dim, owner):
+        self.shm = shm
+        self.capacity = capacity
+        self.dim = dim
+        self.owner = owner
+        self._header = np.ndarray((2,), dtype=np.int64, buffer=shm.buf)
+        self._data = np.ndarray((capacity, dim), dtype=np.float32,
+                                buffer=shm.buf, offset=self.HEADER_BYTES)
+
+    @classmethod
+    def create(cls, capacity, dim):
+        size = cls.HEADER_BYTES + capacity * dim * 4
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        matrix = cls(shm, capacity, dim, owner=True)
+        matrix._header[:] = 0
+        return matrix
+
+    @classmethod
+    def attach(cls, name, capacity, dim):
+        shm = shared_memory.SharedMemory(name=name)
+        # Only the server unlinks; keep this process's tracker from doing it at exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm, capacity, dim, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def rows(self):
+        return int(self._header[0])
+
+    @property
+    def retired(self):
+        return bool(self._header[1])
+
+    def info(self):
+        return {"name": self.name, "capacity": self.capacity, "dim": self.dim}
+
+    # -------------------------------------------------
+    # Server side
+    # -------------------------------------------------
+    def write(self, start, matrix):
+        self._data[start:start + matrix.shape[0]] = matrix.detach().float().cpu().numpy()
+
+    def publish(self, rows):
+        self._header[0] = rows
+
+    def retire(self):
+        self._header[1] = 1
+
+    # -------------------------------------------------
+    # Client side
+    # -------------------------------------------------
+    def view(self, rows):
+        """Zero-copy (rows, D) tensor over the segment."""
+        return torch.from_numpy(self._data[:rows])
+
+    def close(self):
+        self._header = None
+        self._data = None
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except (BufferError, FileNotFoundError):
+            pass  # a view is still alive / already unlinked
+
+
+# =====================================================
+# SERVER: CLIPManager behind a local IPC endpoint
+# =====================================================
+class CLIPService:
+    """
+    Methods exposed to web workers. Each client connection is served on
+    its own thread, so concurrent embed_image calls from many workers meet
+    in the CLIPManager batcher and share encode_image calls.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self._lock = threading.Lock()
+        self._tags = []          # tags of the published rows
+        self.shared = None
+        self._publish()
+
+    def _publish(self):
+        """Copy rows added to the manager's tag store into shared memory."""
+        matrix, tags, n = self.manager.tag_store.snapshot()
+        start = len(self._tags)
+        if n <= start:
+            return
+
+        if self.shared is None or n > self.shared.capacity:
+            old = self.shared
+            shared = SharedTagMatrix.create(max(n, self.manager.tag_store.capacity), matrix.shape[1])
+            shared.write(0, matrix[:n])
+            self._tags = list(tags[:n])
+            shared.publish(n)
+            self.shared = shared
+            if old is not None:
+                old.retire()
+                old.close()
+            print(f"[CLIP] Published {n:,} tag embeddings in shared memory '{shared.name}' "
+                  f"(capacity {shared.capacity:,})")
+        else:
+            self.shared.write(start, matrix[start:n])
+            self._tags.extend(tags[start:n])
+            self.shared.publish(n)
+
+    # -------------------------------------------------
+    # Tag matrix
+    # -------------------------------------------------
+    def segment(self):
+        """Shared memory segment of the current tag matrix, or None."""
+        with self._lock:
+            return self.shared.info() if self.shared is not None else None
+
+    def tags(self, start, stop):
+        return self._tags[start:stop]
+
+    def has_ann_index(self):
+        return self.manager.ann_index is not None
+
+    def ensure_tags(self, unique_tags):
+        """Initialize from unique_tags if empty, otherwise add the missing ones."""
+        with self._lock:
+            if len(self.manager.tag_store) == 0:
+                self.manager.initialize_tags(unique_tags)
+            else:
+                missing = [t for t in unique_tags if t not in self.manager.tag_store]
+                self.manager.add_new_tags(missing)
+            self._publish()
+            return len(self._tags)
+
+    def add_new_tags(self, new_tags):
+        with self._lock:
+            self.manager.add_new_tags(new_tags)
+            self._publish()
+            return len(self._tags)
+
+    # -------------------------------------------------
+    # Inference
+    # -------------------------------------------------
+    def embed_image(self, file_bytes):
+        """Returns (float32 embedding array or None, timings)."""
+        emb, timings = self.manager.embed_image_async(file_bytes).result()
+        if emb is None:
+            return None, timings
+        return emb.detach().float().cpu().numpy(), timings
+
+    def rank_tags(self, img_emb, **rank_args):
+        """ANN ranking runs here, next to the index."""
+        emb = torch.from_numpy(img_emb).to(self.manager.device, self.manager.dtype)
+        return self.manager.rank_tags(emb, **rank_args)
+
+    def inference_stats(self):
+        return self.manager.inference_stats()
+
+    def close(self):
+        self.manager.batcher.stop()
+        if self.shared is not None:
+            self.shared.close()
+
+
+class CLIPServerManager(BaseManager):
+    pass
+
+
+# =====================================================
+# CLIENT: CLIPManager API backed by the server
+# =====================================================
+class _RemoteTagStore:
+    """
+    Read-only stand-in for TagEmbeddingStore over the shared segment.
+    Tag names are fetched from the server once, as rows are published.
+
+    A segment replaced by a bigger one is not closed straight away: views
+    handed out by snapshot() may still be read on other threads, so it is
+    kept until the segment after it is attached.
+    """
+
+    def __init__(self, service):
+        self._service = service
+        self._lock = threading.Lock()
+        self._shared = None
+        self._retired = None
+        self._tags = []
+        self._rows = {}
+
+    def _attach(self):
+        info = self._service.segment()
+        if self._retired is not None:
+            self._retired.close()
+        self._retired = self._shared
+        self._shared = None
+        if info is not None:
+            self._shared = SharedTagMatrix.attach(info["name"], info["capacity"], info["dim"])
+
+    def refresh(self):
+        with self._lock:
+            if self._shared is None or self._shared.retired:
+                self._attach()
+            if self._shared is None:
+                return
+            rows = self._shared.rows
+            if rows > len(self._tags):
+                new_tags = self._service.tags(len(self._tags), rows)
+                for i, t in enumerate(new_tags, start=len(self._tags)):
+                    self._rows[t] = i
+                self._tags.extend(new_tags)
+
+    def snapshot(self):
+        self.refresh()
+        with self._lock:
+            if self._shared is None:
+                return None, self._tags, 0
+            n = min(self._shared.rows, len(self._tags))
+            return self._shared.view(n), self._tags, n
+
+    def __len__(self):
+        return self.snapshot()[2]
+
+    def __contains__(self, tag):
+        self.refresh()
+        with self._lock:
+            return tag in self._rows
+
+    @property
+    def capacity(self):
+        with self._lock:
+            return self._shared.capacity if self._shared is not None else 0
+
+
+class RemoteCLIPManager(CLIPManager):
+    """
+    CLIPManager for web workers when the model lives in clip_server.py.
+
+    Images are embedded by the server; exact tag ranking runs locally
+    against the shared-memory matrix, ANN ranking is delegated to the
+    server that holds the index. No model is loaded in this process.
+    """
+
+    def __init__(self, address=None, authkey=None, connect_timeout=None):
+        settings = CLIP_SERVER_SETTINGS
+        address = address or tuple(settings.get('address'))
+        authkey = server_authkey(authkey)
+        connect_timeout = connect_timeout if connect_timeout is not None else settings.get('connect_timeout', 120)
+
+        self.device = "cpu"
+        self.dtype = torch.float32
+        self.ann_index = None
+        self._has_ann_index = False
+        self.image_cache = None  # cached server-side
+
+        self._service = self._connect(address, authkey, connect_timeout)
+        self.tag_store = _RemoteTagStore(self._service)
+        self.request_pool = ThreadPoolExecutor(
+            max_workers=settings.get('client_threads', 32),
+            thread_name_prefix="clip-remote",
+        )
+
+    @staticmethod
+    def _connect(address, authkey, timeout):
+        CLIPServerManager.register("clip")
+        deadline = time.time() + timeout
+        while True:
+            try:
+                client = CLIPServerManager(address=address, authkey=authkey)
+                client.connect()
+                print(f"[CLIP] Connected to CLIP server at {address[0]}:{address[1]}")
+                return client.clip()
+            except (ConnectionError, OSError) as e:
+                if time.time() >= deadline:
+                    raise ConnectionError(f"CLIP server at {address} not reachable: {e}")
+                time.sleep(1.0)
+
+    # -------------------------------------------------
+    # Tags
+    # -------------------------------------------------
+    def initialize_tags(self, unique_tags):
+        count = self._service.ensure_tags(list(unique_tags or []))
+        self._has_ann_index = self._service.has_ann_index()
+        self.tag_store.refresh()
+        print(f"[CLIP] Server has {count} tag embeddings.")
+
+    def add_new_tags(self, new_tags):
+        if not new_tags:
+            return
+        self._service.add_new_tags(list(new_tags))
+        self.tag_store.refresh()
+
+    # -------------------------------------------------
+    # Images
+    # -------------------------------------------------
+    def _remote_embed(self, file_bytes):
+        emb, timings = self._service.embed_image(file_bytes)
+        if emb is None:
+            return None, timings
+        return torch.from_numpy(emb), timings
+
+    def embed_image_async(self, file_bytes, on_stage=None):
+        """
+        Future resolving to (embedding or None, timings) from the server.
+        on_stage is not called: decode and inference happen remotely.
+        """
+        return self.request_pool.submit(self._remote_embed, file_bytes)
+
+    def rank_tags(self, img_emb, top_k=None, min_score=None, offset=0, batch_size=1024,
+                  search=None, n_probe=None):
+        if self._has_ann_index and search != "exact":
+            return self._service.rank_tags(
+                img_emb.float().cpu().numpy(), top_k=top_k, min_score=min_score,
+                offset=offset, batch_size=batch_size, search=search, n_probe=n_probe)
+        return super().rank_tags(img_emb.float(), top_k=top_k, min_score=min_score, offset=offset,
+                                 batch_size=batch_size, search="exact")
+
+    def inference_stats(self):
+        stats = self._service.inference_stats()
+        stats["mode"] = "remote"
+        return stats
+
+
+# =====================================================
+# ENTRY POINT
+# =====================================================
+def main():
+    parser = argparse.ArgumentParser(description="Dedicated CLIP inference server")
+    parser.add_argument("--no-es", action="store_true",
+                        help="Do not load tags from Elasticsearch; web workers send them on connect")
+    args = parser.parse_args()
+
+    try:
+        authkey = server_authkey()
+    except RuntimeError as e:
+        print(f"[CLIP] {e}")
+        sys.exit(1)
+
+    manager = CLIPManager()
+    if not args.no_es:
+        from elasticsearch_utils import get_es_client, fetch_unique_tags
+        manager.initialize_tags(fetch_unique_tags(get_es_client()))
+
+    service = CLIPService(manager)
+    CLIPServerManager.register("clip", callable=lambda: service)
+
+    address = tuple(CLIP_SERVER_SETTINGS.get('address'))
+    server = CLIPServerManager(address=address, authkey=authkey).get_server()
+    print(f"[CLIP] Server listening on {address[0]}:{address[1]}")
+
+    # Exit through serve_forever's cleanup so the shared segment is unlinked
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
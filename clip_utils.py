@@ -5,7 +5,17 @@ import clip
 import torch
 from PIL import Image
 import io
-from config import CLIP_MODEL, DEVICE
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import (CLIP_MODEL, DEVICE, CLIP_BATCH_SETTINGS, CLIP_CPU_SETTINGS,
+                    IMAGE_DECODE_SETTINGS, TAG_EMBEDDING_CACHE, ANN_SETTINGS,
+                    IMAGE_EMBEDDING_CACHE_DB, IMAGE_CACHE_SETTINGS)
+from inference_queue import InferenceBatcher
+from ann_index import IVFTagIndex
+from embedding_store import TagEmbeddingStore
+from image_cache import ImageEmbeddingCache
 
 
 # =====================================================
@@ -19,22 +29,114 @@ class CLIPManager:
       - empty tag sets
       - dynamic addition of tags
       - GPU memory (half precision, batching)
-      - corrupted images
+      - CPU-only hosts (float32/bfloat16, int8 dynamic quantization)
+      - corrupted or oversized images (rejected before full decode)
+      - repeated images (content-hash embedding cache)
       - tags added before initialization
+      - concurrent image requests (micro-batched on one inference thread)
+      - large vocabularies (optional IVF index, cached tag embeddings)
     """
 
-    def __init__(self):
-        self.device = DEVICE
+    def __init__(self, device=None, cpu_settings=None):
+        self.device = device or DEVICE
+        self.cpu_settings = dict(CLIP_CPU_SETTINGS, **(cpu_settings or {}))
 
         # Load CLIP model
         self.model, self.preprocess = clip.load(CLIP_MODEL, device=self.device)
         self.model.eval()
-        self.model = self.model.half()  # reduce VRAM usage
+
+        if self.device == "cpu":
+            self._configure_cpu_inference()
+        else:
+            self.model = self.model.half()  # reduce VRAM usage
+            self.dtype = torch.float16
+            self.inference_profile = f"{self.device}-float16"
 
         # Embedding storage
-        self.tag_embeddings = {}        # tag -> tensor
-        self.tag_list_ordered = []      # list of tags in same order as matrix
-        self.tag_embedding_matrix = None  # single stacked tensor
+        self.tag_store = TagEmbeddingStore()  # growable matrix + append-only tag index
+        self.ann_index = None                 # optional IVFTagIndex over matrix rows
+        self._tag_write_lock = threading.Lock()  # serializes tag additions only
+
+        # Image inference worker: concurrent requests share encode_image calls
+        self.batcher = InferenceBatcher(
+            self._encode_image_batch,
+            max_batch_size=CLIP_BATCH_SETTINGS.get('max_batch_size', 16),
+            max_wait_ms=CLIP_BATCH_SETTINGS.get('max_wait_ms', 10),
+            name="CLIP",
+        )
+
+        # Decode + preprocess pool: overlaps CPU image work with inference
+        self.decode_pool = ThreadPoolExecutor(
+            max_workers=IMAGE_DECODE_SETTINGS.get('workers', 4),
+            thread_name_prefix="clip-decode",
+        )
+
+        # Content-hash image embedding cache (memory LRU + SQLite)
+        self.image_cache = None
+        if IMAGE_CACHE_SETTINGS.get('enabled', True):
+            self.image_cache = ImageEmbeddingCache(
+                IMAGE_EMBEDDING_CACHE_DB, f"{CLIP_MODEL}/{self.inference_profile}",
+                memory_items=IMAGE_CACHE_SETTINGS.get('memory_items', 10000),
+                disk_items=IMAGE_CACHE_SETTINGS.get('disk_items', 200000),
+                prune_every=IMAGE_CACHE_SETTINGS.get('prune_every', 500),
+            )
+
+    # -------------------------------------------------
+    # CPU inference profile
+    # -------------------------------------------------
+    @staticmethod
+    def _cpu_supports_bf16():
+        """True if the CPU has native bfloat16 matmul (AVX512-BF16 / AMX)."""
+        try:
+            with open("/proc/cpuinfo") as f:
+                flags = f.read()
+        except OSError:
+            return False
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+
+    def _configure_cpu_inference(self):
+        """
+        fp16 matmuls are slow or unsupported on CPU. Pick float32 or
+        bfloat16 by capability, optionally quantize Linear layers to int8
+        (float32 only) and set the intra-op thread count.
+        """
+        settings = self.cpu_settings
+
+        num_threads = settings.get('num_threads')
+        if num_threads:
+            torch.set_num_threads(int(num_threads))
+
+        dtype = settings.get('dtype', 'auto')
+        if dtype == 'auto':
+            dtype = 'bfloat16' if self._cpu_supports_bf16() else 'float32'
+
+        profile = dtype
+        self.inference_profile = f"cpu-{dtype}"  # part of the image cache key
+        if dtype == 'bfloat16':
+            self.model = self.model.to(torch.bfloat16)
+            self.dtype = torch.bfloat16
+        else:
+            self.model = self.model.float()
+            self.dtype = torch.float32
+            if settings.get('quantize_int8', True):
+                self.model = torch.ao.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8)
+                profile += " + int8 dynamic quantization"
+                self.inference_profile += "-int8"
+
+        print(f"[CLIP] CPU inference: {profile}, {torch.get_num_threads()} threads")
+
+    # -------------------------------------------------
+    # Read-only views of the current tag snapshot
+    # -------------------------------------------------
+    @property
+    def tag_embedding_matrix(self):
+        return self.tag_store.snapshot()[0]
+
+    @property
+    def tag_list_ordered(self):
+        _, tags, n = self.tag_store.snapshot()
+        return tags[:n]
 
     # -------------------------------------------------
     # Internal — safe normalization
@@ -56,13 +158,13 @@ class CLIPManager:
 
         embeddings = {}
 
-        with torch.no_grad():
+        with torch.inference_mode():
             for i in range(0, len(tags_list), batch_size):
                 batch = tags_list[i:i + batch_size]
-                tokens = clip.tokenize(batch).to(self.device)
+                tokens = clip.tokenize(batch).to(self.device)  # token ids stay integer
 
                 # Text → embedding
-                emb = self.model.encode_text(tokens.half())
+                emb = self.model.encode_text(tokens)
                 emb = self._normalize(emb)
 
                 for t, e in zip(batch, emb):
@@ -76,29 +178,118 @@ class CLIPManager:
     def initialize_tags(self, unique_tags):
         """
         Build initial tag embedding matrix. Safe against empty lists.
+        Embeddings (and the ANN index) are reused from TAG_EMBEDDING_CACHE
+        when possible; only tags missing from the cache are encoded.
         """
         if not unique_tags:
             print("[CLIP] No tags provided. Initialized empty tag set.")
-            self.tag_embeddings = {}
-            self.tag_list_ordered = []
-            self.tag_embedding_matrix = None
+            self.tag_store.reset([], None)
+            self.ann_index = None
             return
 
-        # Compute embeddings
-        self.tag_embeddings = self.precompute_tag_embeddings(unique_tags)
-        self.tag_list_ordered = list(self.tag_embeddings.keys())
-
-        if not self.tag_list_ordered:
+        # Reuse cached embeddings for tags that still exist
+        embeddings = {}
+        cache = self._load_tag_cache()
+        cached_tags = []
+        if cache is not None:
+            wanted = set(unique_tags)
+            cached_tags = cache["tags"]
+            cached_matrix = cache["embeddings"].to(self.device, self.dtype)
+            for i, t in enumerate(cached_tags):
+                if t in wanted:
+                    embeddings[t] = cached_matrix[i]
+
+        # Compute embeddings for the rest
+        missing = [t for t in dict.fromkeys(unique_tags) if t not in embeddings]
+        if missing:
+            embeddings.update(self.precompute_tag_embeddings(missing))
+
+        if not embeddings:
             print("[CLIP] Tag list was provided but produced no embeddings.")
-            self.tag_embedding_matrix = None
+            self.tag_store.reset([], None)
+            self.ann_index = None
             return
 
         # Build matrix
-        self.tag_embedding_matrix = torch.stack(
-            [self.tag_embeddings[t] for t in self.tag_list_ordered]
+        tags = list(embeddings.keys())
+        self.tag_store.reset(tags, torch.stack([embeddings[t] for t in tags]))
+
+        # Cached index is still valid if no cached tag was dropped (row ids unchanged)
+        cache_prefix_intact = cache is not None and len(cached_tags) == len(embeddings) - len(missing)
+        index_changed = self._init_ann_index(
+            cache.get("ann") if cache_prefix_intact else None,
+            cached_rows=len(cached_tags) if cache_prefix_intact else 0,
+        )
+
+        if missing or not cache_prefix_intact or index_changed:
+            self._save_tag_cache()
+
+        print(f"[CLIP] Loaded {len(embeddings)} tag embeddings "
+              f"({len(embeddings) - len(missing)} from cache).")
+
+    # -------------------------------------------------
+    # ANN index
+    # -------------------------------------------------
+    def _init_ann_index(self, cached_state=None, cached_rows=0):
+        """
+        Load the cached IVF index (extending it with rows added since) or
+        build a new one. Returns True if the index differs from the cache.
+        """
+        matrix, _, n = self.tag_store.snapshot()
+        if not ANN_SETTINGS.get('enabled', True) or n < ANN_SETTINGS.get('min_tags', 20000):
+            self.ann_index = None
+            return cached_state is not None
+
+        if cached_state is not None:
+            index = IVFTagIndex.from_state_dict(cached_state, device=self.device,
+                                                dtype=matrix.dtype)
+            if cached_rows < n:
+                index.add(matrix[cached_rows:], start=cached_rows)
+            self.ann_index = index
+            print(f"[CLIP] Loaded ANN index ({index.n_lists} lists) from cache.")
+            return cached_rows < n
+
+        start = time.time()
+        self.ann_index = IVFTagIndex.build(
+            matrix,
+            n_lists=ANN_SETTINGS.get('n_lists'),
+            iters=ANN_SETTINGS.get('kmeans_iters', 10),
         )
+        print(f"[CLIP] Built ANN index ({self.ann_index.n_lists} lists) in {time.time() - start:.2f}s.")
+        return True
+
+    # -------------------------------------------------
+    # Tag embedding cache (disk)
+    # -------------------------------------------------
+    def _load_tag_cache(self):
+        if not TAG_EMBEDDING_CACHE or not os.path.exists(TAG_EMBEDDING_CACHE):
+            return None
+        try:
+            cache = torch.load(TAG_EMBEDDING_CACHE, map_location="cpu")
+        except Exception as e:
+            print(f"[CLIP] Ignoring unreadable tag embedding cache: {e}")
+            return None
+        if cache.get("model") != CLIP_MODEL:
+            print(f"[CLIP] Tag embedding cache is for {cache.get('model')}, rebuilding.")
+            return None
+        return cache
 
-        print(f"[CLIP] Loaded {len(self.tag_embeddings)} tag embeddings.")
+    def _save_tag_cache(self):
+        matrix, tags, n = self.tag_store.snapshot()
+        if not TAG_EMBEDDING_CACHE or matrix is None:
+            return
+        state = {
+            "model": CLIP_MODEL,
+            "tags": tags[:n],
+            "embeddings": matrix.cpu(),
+            "ann": self.ann_index.state_dict() if self.ann_index is not None else None,
+        }
+        tmp_path = TAG_EMBEDDING_CACHE + ".tmp"
+        try:
+            torch.save(state, tmp_path)
+            os.replace(tmp_path, TAG_EMBEDDING_CACHE)
+        except Exception as e:
+            print(f"[CLIP] Failed to write tag embedding cache: {e}")
 
     # -------------------------------------------------
     # Add new tags at runtime
@@ -106,90 +297,316 @@ class CLIPManager:
     def add_new_tags(self, new_tags):
         """
         Add new tags to the embedding table. Safe with empty / duplicates.
+        Costs O(new tags): rows are appended to the growable store and
+        assigned to the ANN index, if one is built. Concurrent readers keep
+        using the snapshot they already hold.
         """
         if not new_tags:
             return
 
         # Normalize input
         new_tags = [t.lower() for t in new_tags]
-        new_tags = [t for t in new_tags if t not in self.tag_embeddings]
 
-        if not new_tags:
-            return  # nothing new
+        with self._tag_write_lock:
+            new_tags = [t for t in dict.fromkeys(new_tags) if t not in self.tag_store]
 
-        # Compute new embeddings
-        new_embs = self.precompute_tag_embeddings(new_tags)
+            if not new_tags:
+                return  # nothing new
 
-        # Merge into system
-        for t, e in new_embs.items():
-            self.tag_embeddings[t] = e
+            # Compute new embeddings
+            new_embs = self.precompute_tag_embeddings(new_tags)
+            if not new_embs:
+                return
 
-        self.tag_list_ordered = list(self.tag_embeddings.keys())
-        self.tag_embedding_matrix = torch.stack(
-            [self.tag_embeddings[t] for t in self.tag_list_ordered]
-        )
+            # Merge into system
+            tags = list(new_embs.keys())
+            new_matrix = torch.stack([new_embs[t] for t in tags])
+            start_row = self.tag_store.append(tags, new_matrix)
+
+            if self.ann_index is not None:
+                self.ann_index.add(new_matrix, start=start_row)
 
         print(f"[CLIP] Added {len(new_embs)} new tags.")
 
     # -------------------------------------------------
-    # Image → embedding
+    # Image → preprocessed tensor
     # -------------------------------------------------
-    def _embed_image(self, file_bytes):
+    def _load_image(self, file_bytes):
         """
-        Convert uploaded image → CLIP embedding.
-        Returns None on failure.
+        Decode and preprocess uploaded image bytes (CPU, decode pool).
+        Oversized files are rejected before decoding, and JPEGs are decoded
+        in draft mode directly at ~draft_size px. Returns None on failure.
         """
+        max_bytes = IMAGE_DECODE_SETTINGS.get('max_bytes')
+        if max_bytes and len(file_bytes) > max_bytes:
+            print(f"[CLIP] Rejected image: {len(file_bytes):,} bytes exceeds {max_bytes:,}")
+            return None
+
         try:
-            img = Image.open(io.BytesIO(file_bytes)).convert("RGB")
+            img = Image.open(io.BytesIO(file_bytes))  # reads the header only
+
+            max_pixels = IMAGE_DECODE_SETTINGS.get('max_pixels')
+            if max_pixels and img.width * img.height > max_pixels:
+                print(f"[CLIP] Rejected image: {img.width}x{img.height} exceeds {max_pixels:,} pixels")
+                return None
+
+            # JPEG: let libjpeg downscale by 1/2..1/8 while decoding
+            draft_size = IMAGE_DECODE_SETTINGS.get('draft_size', 224)
+            if img.format == "JPEG" and draft_size:
+                img.draft("RGB", (draft_size, draft_size))
+
+            img = img.convert("RGB")
         except Exception as e:
             print(f"[CLIP] Failed to load image: {e}")
             return None
 
-        image_tensor = self.preprocess(img).unsqueeze(0).to(self.device).half()
+        return self.preprocess(img)
+
+    def _timed_load_image(self, file_bytes):
+        start = time.perf_counter()
+        tensor = self._load_image(file_bytes)
+        return tensor, time.perf_counter() - start
 
-        with torch.no_grad():
-            emb = self.model.encode_image(image_tensor)
+    # -------------------------------------------------
+    # Batch of tensors → embeddings (inference thread)
+    # -------------------------------------------------
+    def _encode_image_batch(self, image_tensors):
+        """
+        Run one encode_image call over a list of preprocessed tensors.
+        Returns a (B,512) tensor of normalized embeddings.
+        """
+        batch = torch.stack(image_tensors).to(self.device, self.dtype)
+
+        with torch.inference_mode():
+            emb = self.model.encode_image(batch)
             emb = self._normalize(emb)
 
-        return emb.squeeze(0)
+        return emb
+
+    # -------------------------------------------------
+    # Image → embedding
+    # -------------------------------------------------
+    def embed_image_async(self, file_bytes, on_stage=None):
+        """
+        Decode on the decode pool, then queue for batched inference.
+        Returns a Future resolving to (embedding or None, timings), where
+        timings holds decode_ms, queue_wait_ms and inference_ms, or
+        cache = 'memory' / 'disk' when the image was seen before.
+
+        on_stage(stage) is called with "decoded" once the image is queued
+        for inference. Cancelling the returned future drops the image from
+        the pipeline if it has not reached the model yet.
+        """
+        result = Future()
+
+        cache_key = None
+        if self.image_cache is not None:
+            cache_key = self.image_cache.key_for(file_bytes)
+            emb, tier = self.image_cache.get(cache_key)
+            if emb is not None:
+                result.set_result((emb.to(self.device, self.dtype), {"cache": tier}))
+                return result
+
+        def resolve(value=None, error=None):
+            if result.done():
+                return  # cancelled by the caller
+            try:
+                if error is not None:
+                    result.set_exception(error)
+                else:
+                    result.set_result(value)
+            except Exception:
+                pass  # cancelled concurrently
+
+        def on_encoded(encoded, timings):
+            if encoded.cancelled():
+                return
+            try:
+                emb = encoded.result()
+            except Exception as e:
+                resolve(error=e)
+                return
+            if cache_key is not None:
+                # Memory tier now; keep the SQLite write off the inference thread
+                self.image_cache.remember(cache_key, emb)
+                self.decode_pool.submit(self.image_cache.persist, cache_key, emb)
+            timings.update(getattr(encoded, "timings", {}))
+            resolve((emb, timings))
+
+        def on_decoded(decoded):
+            try:
+                tensor, decode_seconds = decoded.result()
+            except Exception as e:
+                resolve(error=e)
+                return
+
+            self.batcher.stages.record("decode", decode_seconds)
+            timings = {"decode_ms": round(decode_seconds * 1000.0, 2)}
+            if tensor is None:
+                resolve((None, timings))  # failed to read or rejected
+                return
+            if result.cancelled():
+                return
+
+            encoded = self.batcher.submit(tensor)
+            result.add_done_callback(lambda f: encoded.cancel() if f.cancelled() else None)
+            encoded.add_done_callback(lambda f: on_encoded(f, timings))
+            if on_stage is not None:
+                on_stage("decoded")
+
+        decode = self.decode_pool.submit(self._timed_load_image, file_bytes)
+        result.add_done_callback(lambda f: decode.cancel() if f.cancelled() else None)
+        decode.add_done_callback(on_decoded)
+        return result
+
+    def _embed_image(self, file_bytes, timings=None):
+        """
+        Convert uploaded image → CLIP embedding.
+        Decode runs on the decode pool; the model call is batched with
+        other pending requests. Returns None on failure.
+        """
+        emb, image_timings = self.embed_image_async(file_bytes).result()
+        if timings is not None:
+            timings.update(image_timings)
+        return emb
+
+    def inference_stats(self):
+        """Queue depth, batch sizes, per-stage latency and image cache hits."""
+        stats = self.batcher.stats()
+        if self.image_cache is not None:
+            stats["image_cache"] = self.image_cache.stats()
+        return stats
+
+    # -------------------------------------------------
+    # Embedding → top-k tags
+    # -------------------------------------------------
+    def rank_tags(self, img_emb, top_k=None, min_score=None, offset=0, batch_size=1024,
+                  search=None, n_probe=None):
+        """
+        Rank tags against an image embedding using partial selection.
+        Only the requested slice [offset, offset + top_k) is materialized.
+        top_k=None returns every tag (optionally cut at min_score).
+
+        search: "exact" scores every tag, "ann" only the tags in the n_probe
+        closest IVF lists; None uses the index whenever one is built.
+        """
+        matrix, tags, n = self.tag_store.snapshot()
+        index = self.ann_index
+        if matrix is None or n == 0:
+            return []
+
+        if index is not None and search != "exact":
+            # Approximate: score only the probed lists' tags
+            similarities, row_ids = index.search(
+                matrix, img_emb, n_probe or ANN_SETTINGS.get('n_probe', 8))
+        else:
+            img_emb = img_emb.unsqueeze(0)  # shape: (1,512)
+
+            # Compute similarity in batches to fit GPU memory
+            similarities = []
+
+            with torch.inference_mode():
+                for i in range(0, matrix.shape[0], batch_size):
+                    batch_emb = matrix[i:i + batch_size]  # (B,512)
+                    sim = (img_emb @ batch_emb.T).squeeze(0)  # (B,)
+                    similarities.append(sim)
+
+            similarities = torch.cat(similarities)
+            row_ids = None
+
+        # How many of the best tags are needed to serve this page
+        k = similarities.shape[0]
+        if min_score is not None:
+            k = int((similarities >= min_score).sum().item())
+        if top_k is not None:
+            k = min(k, offset + top_k)
+        if k <= offset:
+            return []
+
+        top_scores, top_idxs = torch.topk(similarities, k)  # sorted descending
+        if row_ids is not None:
+            top_idxs = row_ids[top_idxs]
+        top_scores = top_scores[offset:].float().cpu().tolist()
+        top_idxs = top_idxs[offset:].cpu().tolist()
+
+        return [
+            {"tag": tags[i], "score": float(s)}
+            for i, s in zip(top_idxs, top_scores)
+        ]
+
+    # -------------------------------------------------
+    # Bulk API: tag many images, yielding as they finish
+    # -------------------------------------------------
+    def iter_tag_images(self, named_images, concurrency=32, **rank_args):
+        """
+        Tag a stream of (name, bytes-or-callable) images with at most
+        `concurrency` in flight. Callables are read only when submitted, so
+        memory stays bounded. Yields (name, tags, timings) in completion
+        order; tags is None when the image could not be read.
+        """
+        pending = {}
+        images = iter(named_images)
+        exhausted = False
+
+        while pending or not exhausted:
+            # Top up the in-flight window
+            while not exhausted and len(pending) < max(1, concurrency):
+                try:
+                    name, data = next(images)
+                except StopIteration:
+                    exhausted = True
+                    break
+                file_bytes = data() if callable(data) else data
+                pending[self.embed_image_async(file_bytes)] = name
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    emb, timings = future.result()
+                except Exception as e:
+                    print(f"[CLIP] Failed to embed {name}: {e}")
+                    yield name, None, {"error": str(e)}
+                    continue
+
+                if emb is None:
+                    yield name, None, timings
+                    continue
+
+                start = time.perf_counter()
+                tags = self.rank_tags(emb, **rank_args)
+                timings["ranking_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+                yield name, tags, timings
 
     # -------------------------------------------------
     # Main API: return sorted tag suggestions
     # -------------------------------------------------
-    def process_image(self, file_bytes, batch_size=1024):
+    def process_image(self, file_bytes, top_k=None, min_score=None, offset=0, batch_size=1024,
+                      search=None, n_probe=None, timings=None):
         """
         Given an image (bytes), return tags sorted by similarity.
+        top_k / min_score / offset select one page of the ranking;
+        search / n_probe choose exact or ANN scoring (see rank_tags).
+        If a timings dict is passed it receives the per-image stage times.
         Returns empty list if no tags are available.
         """
 
         # Safety: no tags available
-        if self.tag_embedding_matrix is None or len(self.tag_list_ordered) == 0:
+        if len(self.tag_store) == 0:
             return []
 
         # Image embedding
-        img_emb = self._embed_image(file_bytes)
+        img_emb = self._embed_image(file_bytes, timings)
         if img_emb is None:
             return []  # failed to read or process image
 
-        img_emb = img_emb.unsqueeze(0)  # shape: (1,512)
-
-        # Compute similarity in batches to fit GPU memory
-        similarities = []
-
-        with torch.no_grad():
-            for i in range(0, self.tag_embedding_matrix.shape[0], batch_size):
-                batch_emb = self.tag_embedding_matrix[i:i + batch_size]  # (B,512)
-                sim = (img_emb @ batch_emb.T).squeeze(0)  # (B,)
-                similarities.append(sim)
-
-        similarities = torch.cat(similarities)
-
-        # Sort descending
-        sorted_idxs = torch.argsort(similarities, descending=True)
-        sorted_tags = [self.tag_list_ordered[i] for i in sorted_idxs.cpu().numpy()]
-        sorted_scores = similarities[sorted_idxs].cpu().numpy().tolist()
-
-        return [
-            {"tag": t, "score": float(s)}
-            for t, s in zip(sorted_tags, sorted_scores)
-        ]
+        start = time.perf_counter()
+        result = self.rank_tags(img_emb, top_k=top_k, min_score=min_score,
+                                offset=offset, batch_size=batch_size,
+                                search=search, n_probe=n_probe)
+        if timings is not None:
+            timings["ranking_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+        return result
@@ -13,12 +13,101 @@ ES_INDEX = "objects"
 # Database Configuration
 OBJECTS_DB = "objects.db"
 RELATIONS_DB = "tag_relations.db"
+TAG_CONTEXT_CACHE = "tag_contexts.npz"  # Tag co-occurrence contexts (rebuilt when the index changes)
+
+# SQLite connections (persistent, reused across requests)
+SQLITE_SETTINGS = {
+    'max_idle': 8,                  # Idle connections kept open per database
+    'cached_statements': 256,       # Prepared statements cached per connection
+    'synchronous': 'NORMAL',        # Safe with WAL; FULL also syncs on every commit
+    'cache_size_kb': 16384,         # Page cache per connection
+    'mmap_size': 256 * 1024 * 1024, # Memory-mapped I/O for reads (0 = off)
+    'temp_store': 'MEMORY',         # Temp tables / sort spills in memory
+    'busy_timeout': 10.0,           # Seconds a writer waits for the lock
+}
 
 # Application Configuration
 PAGE_SIZE = 50
 CLIP_MODEL = "ViT-B/32"
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
+# CLIP image inference batching
+CLIP_BATCH_SETTINGS = {
+    'max_batch_size': 16,  # Max images per encode_image call
+    'max_wait_ms': 10,     # Max time the first queued image waits for a batch to fill
+}
+
+# CPU inference profile (applies when DEVICE == "cpu"; CUDA always uses fp16)
+CLIP_CPU_SETTINGS = {
+    'dtype': 'auto',          # 'auto' = bfloat16 if the CPU supports it natively, else float32
+    'quantize_int8': True,    # Dynamic int8 quantization of Linear layers (float32 only)
+    'num_threads': None,      # Intra-op threads for torch; None = torch default
+}
+
+# Dedicated CLIP model-server process (python clip_server.py)
+CLIP_SERVER_SETTINGS = {
+    'mode': 'local',                   # 'local' = load CLIP in the web process, 'remote' = use clip_server.py
+    'address': ('127.0.0.1', 50055),   # Local IPC endpoint of the server
+    'authkey_env': 'CLIP_SERVER_AUTHKEY',  # Env var with the shared secret (required, same for server and web workers)
+    'connect_timeout': 120,            # Seconds a web worker waits for the server to come up
+    'client_threads': 32,              # Concurrent embedding requests per web worker
+}
+IMAGE_TAGS_TOP_K = 10  # Default number of tags returned per image
+
+# Fused image + co-occurrence suggestions (/suggest_from_image_fused)
+IMAGE_FUSION_SETTINGS = {
+    'shortlist_size': 50,        # CLIP top-N tags scored for co-occurrence
+    'seed_tags': 5,              # Top CLIP tags added to the input tags as co-occurrence seeds
+    'rrf_k': 60,                 # Reciprocal-rank-fusion constant (higher = flatter)
+    'clip_weight': 1.0,
+    'cooccurrence_weight': 1.0,
+}
+
+# Image decode / preprocess pool
+IMAGE_DECODE_SETTINGS = {
+    'workers': 4,                      # Decode threads (PIL releases the GIL while decoding)
+    'max_bytes': 50 * 1024 * 1024,     # Reject uploads larger than this
+    'max_pixels': 100_000_000,         # Reject images larger than this (checked from the header)
+    'draft_size': 224,                 # JPEG draft-mode target size (CLIP input resolution)
+}
+
+# Background image tasks (/submit_image)
+IMAGE_TASK_SETTINGS = {
+    'workers': 4,          # Tasks processed concurrently
+    'queue_size': 64,      # Tasks waiting beyond the running ones; more returns HTTP 429
+    'ttl_seconds': 600,    # Finished tasks are evicted this long after finishing
+    'max_top_k': 100,      # Max tags stored per task
+}
+
+# Bulk image tagging endpoint (/bulk_tag_images)
+BULK_TAG_SETTINGS = {
+    'concurrency': 32,        # Images in flight per request (decode + inference)
+    'max_concurrency': 128,   # Upper bound for the per-request override
+    'max_files': 20000,       # Max images per request / archive
+}
+
+# Image embedding cache, keyed by a hash of the model name, the inference
+# profile (device/precision) and the image bytes
+IMAGE_EMBEDDING_CACHE_DB = "image_embeddings.db"
+IMAGE_CACHE_SETTINGS = {
+    'enabled': True,
+    'memory_items': 10000,   # In-memory LRU size
+    'disk_items': 200000,    # SQLite tier size; oldest rows are evicted past it
+    'prune_every': 500,      # Check the SQLite tier size every N writes
+}
+
+# Tag embedding cache (tags, CLIP text embeddings and ANN index)
+TAG_EMBEDDING_CACHE = "tag_embeddings.pt"
+
+# Approximate nearest-neighbor (IVF) index over tag embeddings
+ANN_SETTINGS = {
+    'enabled': True,
+    'min_tags': 20000,   # Only build the index for vocabularies at least this large
+    'n_lists': None,     # None = auto (~sqrt(number of tags))
+    'n_probe': 8,        # Default lists scanned per query (higher = better recall, slower)
+    'kmeans_iters': 10,
+}
+
 # Suggestion Algorithm Parameters
 ALPHA = 1.0  # Co-occurrence weight
 BETA = 0.7   # Rarity weight
@@ -38,7 +127,34 @@ PERF_SETTINGS = {
     'skip_sparse_objects': True,  # Skip objects with < min_tags_per_object
     'min_tags_per_object': 3,  # Only process objects with at least N tags
     'preload_suggestions_on_page_load': False,  # If False, only load on demand
+    'use_sparse_engine': True,  # Score all pairs at once with sparse X^T X (ignores max_tags_to_analyze)
+    'sparse_band_max_ratio': None,  # Skip tags on more than this fraction of objects (None = no upper bound)
+    'sparse_max_antonym_tags': 5000,  # Antonym candidates are dense: scan only the N most frequent tags
+    'context_minhash_error': 0.1,  # MinHash error for antonym context similarity (uses 1/error^2 hashes); None = exact only
+    'contextual_max_contexts': 50,  # Contextual antonyms: most common tags used as contexts
+    'contextual_min_context_count': 1000,  # Min occurrences for a tag to serve as a context
+    'contextual_min_overlap': 50,  # Min objects a tag shares with the context to be a candidate
+    'contextual_min_pair_count': 100,  # Min in-context occurrences of the rarer tag of a pair
+    'contextual_max_cooccur_rate': 0.05,  # Max in-context co-occurrence rate for a contextual antonym
+    'candidate_count_tolerance': 0.05,  # Stored relation candidates: re-mine a tag when its count moved by more than this fraction
+    'candidate_min_count_delta': 5,  # ...and by more than this many objects
+    'candidate_max_refresh_tags': 500,  # More changed tags than this re-mines everything
 }
 
 # Default settings (for reset)
-PERF_SETTINGS_DEFAULTS = PERF_SETTINGS.copy()
\ No newline at end of file
+PERF_SETTINGS_DEFAULTS = PERF_SETTINGS.copy()
+
+# Precomputed relation suggestion queue (/suggest_relations without force_tag)
+RELATION_QUEUE_SETTINGS = {
+    'enabled': True,
+    'refill_below': 20,     # Re-mine in the background when fewer suggestions are queued
+    'max_size': 5000,       # Suggestions kept per relation type
+}
+
+# Relation mining jobs (/suggest_relations queries not served from the queue)
+RELATION_JOB_SETTINGS = {
+    'workers': 2,           # Mining jobs run concurrently
+    'queue_size': 16,       # Jobs waiting beyond the running ones; more returns HTTP 429
+    'ttl_seconds': 600,     # Finished jobs are evicted this long after finishing
+    'wait_seconds': 2.0,    # /suggest_relations waits this long before answering 202 with the job
+}
@@ -0,0 +1,883 @@
+# ==========================================
+# FILE: cooccurrence.py
+# ==========================================
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+
+# =====================================================
+# SPARSE CO-OCCURRENCE ENGINE
+# =====================================================
+def build_outside(lock, version, build, publish, attempts=3):
+    """
+    Run a heavy build() without holding `lock` and hand the result to
+    publish() under it, provided version() did not move meanwhile (no
+    object update landed while the build read the index). A raced build
+    is retried; the last attempt holds the lock so it always completes.
+    Returns what publish() returns.
+    """
+    for _ in range(attempts - 1):
+        with lock:
+            before = version()
+        try:
+            built = build()
+        except RuntimeError:  # a posting set changed size while it was read
+            continue
+        with lock:
+            if version() == before:
+                return publish(built)
+    with lock:
+        return publish(build())
+
+
+def frequency_band(counts, single, min_count, max_ratio=None, total_objects=0):
+    """
+    Ids of single-word tags with min_count <= count (<= max_ratio of all
+    objects), most frequent first; ties keep tag order.
+    """
+    mask = single & (counts >= min_count)
+    if max_ratio is not None and total_objects:
+        mask &= counts <= max_ratio * total_objects
+    ids = np.nonzero(mask)[0]
+    return ids[np.argsort(-counts[ids], kind="stable")]
+
+
+class CooccurrenceEngine:
+    """
+    Tag relation mining over a sparse object × tag incidence matrix X.
+
+    Pair co-occurrence counts for a band of tags come from one sparse
+    product Xᵀ·X instead of a Python set intersection per pair, and the
+    synonym / antonym heuristics of RelationAnalyzer run as vectorized
+    filters over those counts. Only surviving pairs become Python dicts.
+
+    Tag ids are positions in `tags`; counts come from tag_counts, as in
+    the per-pair heuristics.
+
+    Pair counts are read from PairStatistics (built on first use from the
+    current objects) so that add_object / remove_object keep mining
+    current without rebuilding X. tag_to_objects must already reflect an
+    update when it is applied here. lock is held only to fold an update
+    or read built statistics; builds run outside it (build_outside) and
+    are checked against `version`, bumped by every update.
+    """
+
+    def __init__(self, tags, tag_counts, tag_to_objects, total_objects, min_count=10, lock=None):
+        start_time = time.time()
+        self.tags = tags
+        self.tag_to_objects = tag_to_objects
+        self.total_objects = total_objects
+        self.min_count = min_count  # pair statistics floor
+        self._lock = lock or threading.RLock()
+        self._build_lock = threading.Lock()  # one PairStatistics build at a time
+        self.version = 0
+        self.counts = np.array([tag_counts.get(t, 0) for t in tags], dtype=np.int64)
+        self.single = np.array([' ' not in t for t in tags], dtype=bool)
+
+        # Incidence: one column per tag, one row per object index
+        sizes = np.array([len(tag_to_objects.get(t, ())) for t in tags], dtype=np.int64)
+        rows = np.fromiter((o for t in tags for o in tag_to_objects.get(t, ())),
+                           dtype=np.int64, count=int(sizes.sum()))
+        cols = np.repeat(np.arange(len(tags), dtype=np.int64), sizes)
+        n_objects = int(rows.max()) + 1 if rows.size else 0
+        self.X = sp.csc_matrix((np.ones(rows.size, dtype=np.int32), (rows, cols)),
+                               shape=(n_objects, len(tags)))
+
+        self._rows = None           # CSR copy of X (object -> tags), built on first use
+        self._bands = {}
+        self._stats = None          # PairStatistics, built on first use (read without the lock)
+        self._added = {}            # object row -> tag ids, for objects added after X was built
+        self._removed = set()       # rows of X whose objects were removed since
+
+        print(f"[PERF] Built {n_objects:,} x {len(tags):,} incidence matrix "
+              f"({self.X.nnz:,} entries) in {time.time() - start_time:.2f}s")
+
+    # -------------------------------------------------
+    # Tag selection
+    # -------------------------------------------------
+    def band(self, min_count, max_ratio=None, limit=None):
+        """
+        Single-word tag ids with min_count <= count (<= max_ratio of all
+        objects), most frequent first; ties keep tag order.
+        """
+        key = (min_count, max_ratio)
+        ids = self._bands.get(key)
+        if ids is None:
+            ids = self._bands[key] = frequency_band(self.counts, self.single, min_count,
+                                                    max_ratio, self.total_objects)
+        return ids[:limit] if limit else ids
+
+    # -------------------------------------------------
+    # Postings
+    # -------------------------------------------------
+    def rows(self):
+        """X as CSR (tags of each object), built once."""
+        if self._rows is None:
+            self._rows = self.X.tocsr()
+            self._rows.sort_indices()
+        return self._rows
+
+    def postings(self, tag_id):
+        """Sorted object rows carrying tag_id in X (as built)."""
+        return self.X.indices[self.X.indptr[tag_id]:self.X.indptr[tag_id + 1]]
+
+    def objects(self, tag_id):
+        """Current object rows carrying tag_id (from tag_to_objects)."""
+        return np.fromiter(self.tag_to_objects.get(self.tags[tag_id], ()), dtype=np.int64)
+
+    def current_rows(self):
+        """Tags of every current object as CSR: rows of X minus removed objects, plus added ones."""
+        base = self.rows()  # X never changes after the build
+        with self._lock:
+            removed = np.fromiter(self._removed, dtype=np.int64, count=len(self._removed))
+            added = list(self._added.values())
+        if removed.size:
+            keep = np.ones(base.shape[0], dtype=np.int32)
+            keep[removed] = 0
+            base = (sp.diags(keep, dtype=np.int32) @ base).tocsr()
+            base.eliminate_zeros()
+        if not added:
+            return base
+        indptr = np.concatenate(([0], np.cumsum([len(ids) for ids in added])))
+        indices = np.concatenate(added).astype(base.indices.dtype)
+        extra = sp.csr_matrix((np.ones(indices.size, dtype=np.int32), indices, indptr),
+                              shape=(len(added), len(self.tags)))
+        return sp.vstack([base, extra], format="csr")
+
+    def incidence(self, objects, added=None):
+        """
+        Current tags of the given object rows, one CSR row each (rows of X,
+        then added ones). added: tag ids of the added rows among objects,
+        as read under the lock by a caller building outside it.
+        """
+        objects = np.sort(np.asarray(objects, dtype=np.int64))
+        n = self.X.shape[0]
+        base = self.rows()[objects[objects < n]]
+        if added is None:
+            added = self.added_rows(objects)
+        added = [added[o] for o in objects[objects >= n].tolist() if o in added]
+        if not added:
+            return base
+        indptr = np.concatenate(([0], np.cumsum([len(ids) for ids in added])))
+        indices = np.concatenate(added)
+        extra = sp.csr_matrix((np.ones(indices.size, dtype=np.int32), indices, indptr),
+                              shape=(len(added), len(self.tags)))
+        return sp.vstack([base, extra], format="csr")
+
+    def added_rows(self, objects):
+        """Tag ids of the objects among `objects` added after X was built"""
+        n = self.X.shape[0]
+        with self._lock:
+            return {o: self._added[o] for o in objects[objects >= n].tolist() if o in self._added}
+
+    # -------------------------------------------------
+    # Pair statistics
+    # -------------------------------------------------
+    def statistics(self):
+        """
+        PairStatistics over tags with at least min_count occurrences, built
+        once from the current objects, outside the lock.
+        """
+        stats = self._stats
+        if stats is not None:
+            return stats
+        with self._build_lock:
+            if self._stats is not None:
+                return self._stats
+
+            def build():
+                with self._lock:
+                    counts = self.counts.copy()
+                    updated = bool(self._added or self._removed)
+                return PairStatistics(self, self.min_count, self.current_rows() if updated else self.X, counts)
+
+            def publish(stats):
+                self._stats = stats
+                return stats
+
+            return build_outside(self._lock, lambda: self.version, build, publish)
+
+    def add_object(self, row, ids, counts):
+        """Object row with tag ids was added; counts are the tags' new totals."""
+        self._update(row, ids, counts, 1)
+
+    def remove_object(self, row, ids, counts):
+        """Object row with tag ids was removed; counts are the tags' new totals."""
+        self._update(row, ids, counts, -1)
+
+    def _update(self, row, ids, counts, step):
+        ids, first = np.unique(np.asarray(ids, dtype=np.int64), return_index=True)
+        counts = np.asarray(counts, dtype=np.int64)[first]
+        with self._lock:
+            if step > 0:
+                self._added[row] = ids
+            elif self._added.pop(row, None) is None and row < self.X.shape[0]:
+                self._removed.add(row)
+            self.counts[ids] = counts
+            self.total_objects += step
+            self._bands.clear()
+            self.version += 1
+            if self._stats is not None:  # statistics built later start from the current objects
+                self._stats.update(ids, step)
+
+    def context_overlaps(self, context_id, ids):
+        """Objects each tag of ids shares with context_id."""
+        return self.statistics().context_overlap(context_id)[np.asarray(ids, dtype=np.int64)]
+
+    def context_matrix(self, min_tags_per_object=0):
+        """
+        Tag × tag co-occurrence counts (CSR, zero diagonal) over the current
+        objects with at least min_tags_per_object tags.
+        """
+        X = self.current_rows()
+        if min_tags_per_object > 0:
+            X = X[np.diff(X.indptr) >= min_tags_per_object]
+        C = (X.T @ X).tocsr()
+        C.setdiag(0)
+        C.eliminate_zeros()
+        C.sort_indices()
+        return C
+
+    def fingerprint(self, *extra):
+        """Hash of the tag list and current incidence structure (cache validation)."""
+        h = hashlib.sha1()
+        h.update("\n".join(self.tags).encode("utf-8"))
+        if self._added or self._removed:
+            X = self.current_rows()
+            h.update(X.indptr.tobytes())
+            h.update(X.indices.tobytes())
+        else:
+            h.update(self.X.indptr.tobytes())
+            h.update(self.X.indices.tobytes())
+        h.update(repr(extra).encode("utf-8"))
+        return h.hexdigest()
+
+    # -------------------------------------------------
+    # Synonyms
+    # -------------------------------------------------
+    def synonym_pairs(self, band, force_id=None, skip=None):
+        """
+        Synonym suggestions among band (ids, most frequent first); with
+        force_id only pairs containing that tag. skip(tag1, tag2) drops
+        known pairs. Same heuristic as _calculate_synonym_pair.
+        """
+        band = np.asarray(band)
+        stats = self.statistics()
+
+        if force_id is not None:
+            pos = np.nonzero(band == force_id)[0]
+            if pos.size == 0:
+                return []
+            row = stats.row(force_id)[band]
+            j = np.nonzero(row)[0]
+            j = j[j != pos[0]]
+            i = np.full(j.size, pos[0], dtype=np.int64)
+            co = row[j].astype(np.int64)
+            i, j = np.minimum(i, j), np.maximum(i, j)
+        else:
+            C = sp.triu(stats.matrix()[band][:, band], k=1).tocoo()
+            i, j, co = C.row.astype(np.int64), C.col.astype(np.int64), C.data.astype(np.int64)
+
+        c1, c2 = self.counts[band[i]], self.counts[band[j]]
+        min_count, max_count = np.minimum(c1, c2), np.maximum(c1, c2)
+        rate = co / np.maximum(min_count, 1)
+        ratio = min_count / np.maximum(max_count, 1)
+
+        subset = co == min_count
+        fuzzy = ~subset & (rate > 0.7) & (ratio > 0.4)
+        keep = (c1 >= 10) & (c2 >= 10) & (subset | fuzzy)
+
+        confidence = np.where(subset, 1.0, rate * ratio * np.minimum(1.0, (min_count / 1000) ** 0.5))
+        bidirectional = np.where(subset, co == max_count, (rate > 0.9) & (ratio > 0.8))
+
+        suggestions = []
+        for k in self._ordered(i, j, keep):
+            tag1, tag2 = self.tags[band[i[k]]], self.tags[band[j[k]]]
+            if skip is not None and skip(tag1, tag2):
+                continue
+            first, second = (tag1, tag2) if c1[k] < c2[k] else (tag2, tag1)
+            suggestions.append({
+                "tag1": first,
+                "tag2": second,
+                "tag1_count": int(min_count[k]),
+                "tag2_count": int(max_count[k]),
+                "relation_type": "synonym",
+                "confidence": round(float(confidence[k]) * 100, 1),
+                "context_tags": "",
+                "cooccurrence": int(co[k]),
+                "calculation": f"Co-occur: {co[k]}/{min_count[k]} ({rate[k]:.1%}), Freq ratio: {ratio[k]:.2f}",
+                "suggested_direction": "bidirectional" if bidirectional[k] else "one_way"
+            })
+        return suggestions
+
+    # -------------------------------------------------
+    # Antonyms
+    # -------------------------------------------------
+    def antonym_pairs(self, band, contexts=None, force_id=None, skip=None, block_size=1024, progress=None):
+        """
+        Antonym suggestions among band. Antonyms rarely co-occur, so the
+        candidate set is dense: rows of the band are scanned in blocks.
+        contexts is a TagContexts; without it the stricter no-context
+        heuristic of _calculate_antonym_pair_fast is used. With MinHash
+        signatures, context similarity is estimated for pairs that pass the
+        cheap filters and computed exactly only for likely survivors.
+        progress(fraction, block_suggestions) is called after each block.
+        """
+        band = np.asarray(band)
+        m = band.size
+        if m < 2:
+            return []
+
+        counts = self.counts[band]
+        stats = self.statistics()
+        N = None
+        use_minhash = contexts is not None and contexts.minhash is not None
+        if contexts is not None and not use_minhash:
+            N = contexts.matrix[band].astype(bool).astype(np.int32).tocsr()  # band × vocabulary neighbor sets
+            degree = np.diff(N.indptr)
+
+        if force_id is not None:
+            pos = np.nonzero(band == force_id)[0]
+            if pos.size == 0:
+                return []
+            blocks = [(int(pos[0]), int(pos[0]) + 1)]
+            force_row = stats.row(force_id)[band][None, :]
+        else:
+            blocks = [(r, min(r + block_size, m)) for r in range(0, m, block_size)]
+            C = stats.matrix()[band]
+
+        suggestions = []
+        for n, (r0, r1) in enumerate(blocks):
+            found = len(suggestions)
+            if force_id is not None:
+                co = force_row
+            else:
+                co = C[r0:r1][:, band].toarray().astype(np.int64)
+            i = np.arange(r0, r1)[:, None]
+            j = np.arange(m)[None, :]
+            pair = (j > i) if force_id is None else (j != i)
+
+            c1, c2 = counts[r0:r1, None], counts[None, :]
+            min_count, max_count = np.minimum(c1, c2), np.maximum(c1, c2)
+            rate = co / np.maximum(min_count, 1)
+            ratio = min_count / np.maximum(max_count, 1)
+            coverage = (c1 + c2) / (2 * self.total_objects)
+            weight = np.minimum(1.0, (min_count / 1000) ** 0.3)
+
+            keep = pair & (c1 >= 50) & (c2 >= 50)
+            if use_minhash:
+                keep &= (rate < 0.08) & (ratio > 0.25) & (coverage > 0.008)
+                bi, bj = np.nonzero(keep)
+                ids1, ids2 = band[bi + r0], band[bj]
+                likely = contexts.minhash.may_exceed(ids1, ids2, 0.35)
+                context_sim = np.zeros(keep.shape)
+                for a, b, t1, t2 in zip(bi[likely], bj[likely], ids1[likely], ids2[likely]):
+                    context_sim[a, b] = contexts.similarity_ids(t1, t2)
+                keep &= context_sim > 0.35
+            elif N is not None:
+                inter = (N[r0:r1] @ N.T).toarray().astype(np.int64)
+                union = degree[r0:r1, None] + degree[None, :] - inter
+                context_sim = np.where((degree[r0:r1, None] > 0) & (degree[None, :] > 0),
+                                       inter / np.maximum(union, 1), 0.0)
+                keep &= (rate < 0.08) & (ratio > 0.25) & (context_sim > 0.35) & (coverage > 0.008)
+            else:
+                keep &= (rate < 0.05) & (ratio > 0.3) & (coverage > 0.01)
+
+            bi, bj = np.nonzero(keep)
+            order = np.lexsort((np.maximum(bi + r0, bj), np.minimum(bi + r0, bj)))
+            for k in order:
+                a, b = bi[k], bj[k]
+                ia, ib = (a + r0, b) if a + r0 < b else (b, a + r0)  # pair in band order
+                tag1, tag2 = self.tags[band[ia]], self.tags[band[ib]]
+                if skip is not None and skip(tag1, tag2):
+                    continue
+                r, q, lo = rate[a, b], ratio[a, b], min_count[a, b]
+                if contexts is not None:
+                    confidence = (1 - r) * q * context_sim[a, b] * weight[a, b] * 0.7
+                    calculation = f"Co-occur: {co[a, b]}/{lo} ({r:.1%}), Context sim: {context_sim[a, b]:.2f}"
+                else:
+                    confidence = (1 - r) * q * weight[a, b] * 0.6
+                    calculation = f"Co-occur: {co[a, b]}/{lo} ({r:.1%}) [fast mode]"
+                suggestions.append({
+                    "tag1": tag1 if counts[ia] < counts[ib] else tag2,
+                    "tag2": tag2 if counts[ia] < counts[ib] else tag1,
+                    "tag1_count": int(lo),
+                    "tag2_count": int(max_count[a, b]),
+                    "relation_type": "antonym",
+                    "confidence": round(float(confidence) * 100, 1),
+                    "context_tags": "",
+                    "cooccurrence": int(co[a, b]),
+                    "calculation": calculation,
+                    "suggested_direction": "none"
+                })
+            if progress is not None:
+                progress((n + 1) / len(blocks), suggestions[found:])
+        return suggestions
+
+    # -------------------------------------------------
+    # Contextual antonyms
+    # -------------------------------------------------
+    def name_rank(self):
+        """Position of each tag id in string order (tag1 < tag2 comparisons)."""
+        if getattr(self, '_name_rank', None) is None:
+            order = sorted(range(len(self.tags)), key=self.tags.__getitem__)
+            rank = np.empty(len(self.tags), dtype=np.int64)
+            rank[order] = np.arange(len(self.tags))
+            self._name_rank = rank
+        return self._name_rank
+
+    def contextual_antonym_pairs(self, context_id, candidates, min_overlap=50,
+                                 min_pair_count=100, max_rate=0.05, force_id=None, either_side=False):
+        """
+        Candidate pairs that rarely co-occur on the objects of one context
+        tag. Co-occurrence among the candidates on the context's objects
+        comes from PairStatistics (Xᵀ·X over the candidate columns
+        restricted to the context's object rows). Returns arrays (i, j, cooccur,
+        overlap_i, overlap_j) of kept pairs, tag ids i < j by name, in
+        candidate order. Same heuristic as the per-pair contextual loop.
+        With force_id (other than the context), only pairs starting with
+        that tag are scored, from the objects it shares with the context;
+        either_side also returns the pairs where it is the second tag.
+        """
+        candidates = np.asarray(candidates, dtype=np.int64)
+        candidates = candidates[candidates != context_id]
+        empty = np.zeros(0, dtype=np.int64)
+        if candidates.size < 2:
+            return empty, empty, empty, empty, empty
+
+        if force_id is not None and force_id != context_id:
+            return self._contextual_force_pairs(context_id, candidates, force_id, min_overlap,
+                                                min_pair_count, max_rate, either_side)
+
+        stats = self.statistics()
+        overlap = stats.context_overlap(context_id)[candidates]
+
+        keep = overlap >= min_overlap
+        candidates, overlap = candidates[keep], overlap[keep]
+        if candidates.size < 2:
+            return empty, empty, empty, empty, empty
+
+        co = stats.context_matrix(context_id, candidates)[candidates][:, candidates].toarray().astype(np.int64)
+        rank = self.name_rank()[candidates]
+        lo = np.minimum(overlap[:, None], overlap[None, :])
+        mask = ((rank[:, None] < rank[None, :]) & (lo >= min_pair_count) &
+                (co / np.maximum(lo, 1) < max_rate))
+        a, b = np.nonzero(mask)
+        return candidates[a], candidates[b], co[a, b], overlap[a], overlap[b]
+
+    def _contextual_force_pairs(self, context_id, candidates, force_id, min_overlap,
+                                min_pair_count, max_rate, either_side=False):
+        empty = np.zeros(0, dtype=np.int64)
+        overlap = self.context_overlaps(context_id, candidates)
+        force_overlap = int(self.context_overlaps(context_id, [force_id])[0])
+        if force_overlap < min_overlap or not np.any(candidates == force_id):
+            return empty, empty, empty, empty, empty
+
+        eligible = candidates[overlap >= min_overlap]
+        co = self.statistics().context_row(context_id, force_id, eligible)[candidates]
+
+        rank = self.name_rank()
+        first = rank[force_id] < rank[candidates]
+        lo = np.minimum(force_overlap, overlap)
+        mask = ((overlap >= min_overlap) & (candidates != force_id) & (lo >= min_pair_count) &
+                (co / np.maximum(lo, 1) < max_rate))
+        if not either_side:
+            mask &= first
+        b = np.nonzero(mask)[0]
+        forced = np.full(b.size, force_id, dtype=np.int64)
+        forced_overlap = np.full(b.size, force_overlap, dtype=np.int64)
+        return (np.where(first[b], forced, candidates[b]), np.where(first[b], candidates[b], forced),
+                co[b].astype(np.int64), np.where(first[b], forced_overlap, overlap[b]),
+                np.where(first[b], overlap[b], forced_overlap))
+
+    @staticmethod
+    def _ordered(i, j, keep):
+        """Indices of kept pairs in (i, j) order, matching the per-pair loops."""
+        idx = np.nonzero(keep)[0]
+        return idx[np.lexsort((j[idx], i[idx]))]
+
+
+# =====================================================
+# INCREMENTAL PAIR STATISTICS
+# =====================================================
+class PairCounts:
+    """
+    Symmetric tag × tag counts over vocabulary ids under point updates:
+    an immutable CSR base plus per-row deltas, folded into a new base
+    when the whole matrix is read or the deltas pass fold_at entries.
+    """
+
+    def __init__(self, base, fold_at=500_000):
+        self.base = base
+        self.fold_at = fold_at
+        self._delta = {}    # i -> {j: change}, kept for both (i, j) and (j, i)
+        self._entries = 0
+
+    @classmethod
+    def from_incidence(cls, X, ids, size):
+        """Pair counts among the columns ids of incidence matrix X (zero diagonal)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        Xt = X[:, ids]
+        C = (Xt.T @ Xt).tocoo()
+        off = C.row != C.col
+        base = sp.csr_matrix((C.data[off].astype(np.int32), (ids[C.row[off]], ids[C.col[off]])),
+                             shape=(size, size))
+        base.sort_indices()
+        return cls(base)
+
+    def add(self, ids, step):
+        """Add step to every pair among ids (distinct tag ids)."""
+        ids = list(ids)
+        for a, i in enumerate(ids):
+            row = self._delta.setdefault(i, {})
+            for j in ids[:a] + ids[a + 1:]:
+                row[j] = row.get(j, 0) + step
+        self._entries += len(ids) * (len(ids) - 1)
+        if self._entries > self.fold_at:
+            self.fold()
+
+    def add_row(self, i, ids, values):
+        """Add values to the pairs (i, j) for j in ids (a tag that was not counted before)."""
+        row = self._delta.setdefault(i, {})
+        for j, value in zip(ids, values):
+            row[j] = row.get(j, 0) + value
+            other = self._delta.setdefault(j, {})
+            other[i] = other.get(i, 0) + value
+        self._entries += 2 * len(ids)
+        if self._entries > self.fold_at:
+            self.fold()
+
+    def row(self, i):
+        """Counts of tag i with every tag (length = vocabulary)."""
+        vector = np.zeros(self.base.shape[1], dtype=np.int64)
+        start, end = self.base.indptr[i], self.base.indptr[i + 1]
+        vector[self.base.indices[start:end]] = self.base.data[start:end]
+        for j, change in self._delta.get(i, {}).items():
+            vector[j] += change
+        return vector
+
+    def matrix(self):
+        """Current counts as CSR."""
+        if self._delta:
+            self.fold()
+        return self.base
+
+    def fold(self):
+        rows = np.fromiter((i for i, row in self._delta.items() for _ in row), dtype=np.int64)
+        cols = np.fromiter((j for row in self._delta.values() for j in row), dtype=np.int64)
+        values = np.fromiter((v for row in self._delta.values() for v in row.values()), dtype=np.int32)
+        delta = sp.csr_matrix((values, (rows, cols)), shape=self.base.shape)
+        base = (self.base + delta).tocsr()
+        base.eliminate_zeros()
+        base.sort_indices()
+        self.base = base
+        self._delta = {}
+        self._entries = 0
+
+
+class PairStatistics:
+    """
+    Co-occurrence statistics of the analyzed tag band, kept current as
+    objects are added and removed instead of being recomputed:
+
+    - pair co-occurrence among tracked tags (single-word tags with at
+      least min_count occurrences; a tag reaching min_count later is
+      counted from its objects at that point, tags falling below stay);
+    - per context tag, the overlap of every tag with the context and the
+      co-occurrence of the context's candidates on its objects (built on
+      first use for a context, candidates added as they are asked for).
+
+    Per-tag counts live in the engine. An update touches only the pairs
+    among the object's tags: O(k²) for k tags, per context on the object.
+    Built from `incidence` (objects × tags) and the tag `counts` it was
+    read with; context entries are (re)built outside the engine lock.
+    """
+
+    def __init__(self, engine, min_count, incidence, counts):
+        start_time = time.time()
+        self.engine = engine
+        self.min_count = min_count
+        self._lock = engine._lock
+        self.tracked = engine.single & (counts >= min_count)
+        self.pairs = PairCounts.from_incidence(incidence, np.nonzero(self.tracked)[0], len(engine.tags))
+        self.contexts = {}  # context id -> [overlap vector, candidate mask, PairCounts]
+        print(f"[PERF] Built pair statistics for {int(self.tracked.sum()):,} tags "
+              f"({self.pairs.base.nnz // 2:,} pairs) in {time.time() - start_time:.2f}s")
+
+    # -------------------------------------------------
+    # Reads
+    # -------------------------------------------------
+    def row(self, tag_id):
+        with self._lock:
+            return self.pairs.row(tag_id)
+
+    def matrix(self):
+        with self._lock:
+            return self.pairs.matrix()
+
+    def context_overlap(self, context_id):
+        """Objects each tag shares with context_id (length = vocabulary)."""
+        return self._context(context_id, (), lambda entry: entry[0].copy())
+
+    def context_matrix(self, context_id, candidates):
+        """Co-occurrence on the context's objects, covering at least candidates."""
+        return self._context(context_id, candidates, lambda entry: entry[2].matrix())
+
+    def context_row(self, context_id, tag_id, candidates):
+        """Co-occurrence of tag_id with every tag on the context's objects, covering candidates."""
+        return self._context(context_id, np.append(candidates, tag_id), lambda entry: entry[2].row(tag_id))
+
+    def _context(self, context_id, candidates, read, max_added=16):
+        """
+        read(entry) under the lock, for the statistics entry of a context
+        whose counted candidates include candidates. A few missing
+        candidates are counted from the objects they share with the
+        context; more (or a new context) rebuild the entry outside the lock.
+        """
+        engine = self.engine
+        candidates = np.asarray(candidates, dtype=np.int64)
+        candidates = candidates[candidates != context_id]
+        with self._lock:
+            entry = self.contexts.get(context_id)
+            missing = candidates if entry is None else np.unique(candidates[~entry[1][candidates]])
+            if entry is not None and missing.size <= max_added:
+                self._count_missing(context_id, entry, missing)
+                return read(entry)
+
+        def build():
+            with self._lock:
+                objects = engine.objects(context_id)
+                members = np.zeros(len(engine.tags), dtype=bool)
+                if context_id in self.contexts:
+                    members |= self.contexts[context_id][1]
+                added = engine.added_rows(objects)
+            members[candidates] = True
+            Xc = engine.incidence(objects, added)
+            overlap = np.bincount(Xc.indices, minlength=len(engine.tags)).astype(np.int64)
+            return [overlap, members, PairCounts.from_incidence(Xc, np.nonzero(members)[0], len(engine.tags))]
+
+        def publish(entry):
+            self.contexts[context_id] = entry
+            return read(entry)
+
+        return build_outside(self._lock, lambda: engine.version, build, publish)
+
+    def _count_missing(self, context_id, entry, missing):
+        """Count a few candidates the context entry lacks (under the lock)"""
+        engine = self.engine
+        _, members, counts = entry
+        in_context = engine.tag_to_objects.get(engine.tags[context_id], set())
+        for tag_id in missing.tolist():
+            shared = engine.tag_to_objects.get(engine.tags[tag_id], set()) & in_context
+            others = np.bincount(engine.incidence(list(shared)).indices, minlength=len(engine.tags))
+            ids = np.nonzero(members & (others > 0))[0]
+            counts.add_row(tag_id, ids.tolist(), others[ids].tolist())
+            members[tag_id] = True
+
+    # -------------------------------------------------
+    # Updates
+    # -------------------------------------------------
+    def update(self, ids, step):
+        """An object with tag ids (distinct) was added (step 1) or removed (step -1)."""
+        engine = self.engine
+        self.pairs.add([i for i in ids.tolist() if self.tracked[i]], step)
+        for context_id in ids.tolist():
+            entry = self.contexts.get(context_id)
+            if entry is None:
+                continue
+            overlap, members, counts = entry
+            overlap[ids] += step
+            counts.add([i for i in ids.tolist() if members[i] and i != context_id], step)
+
+        # Tags that just reached the floor: counted from their objects, which include this one
+        for tag_id in ids.tolist():
+            if not self.tracked[tag_id] and engine.single[tag_id] and engine.counts[tag_id] >= self.min_count:
+                others = np.bincount(engine.incidence(engine.objects(tag_id)).indices,
+                                     minlength=len(engine.tags))
+                others[tag_id] = 0
+                tracked = np.nonzero(self.tracked & (others > 0))[0]
+                self.pairs.add_row(tag_id, tracked.tolist(), others[tracked].tolist())
+                self.tracked[tag_id] = True
+
+
+# =====================================================
+# TAG CONTEXTS (CSR)
+# =====================================================
+class TagContexts:
+    """
+    Tag → co-occurring tags as a CSR count matrix over tag ids: row t
+    holds, for each tag seen with t, the number of objects they share.
+    Replaces the nested tag -> {tag: count} dicts at a fraction of the
+    memory, and pickles cheaply for worker processes. Optional MinHash
+    signatures screen out dissimilar pairs before the exact Jaccard.
+    """
+
+    def __init__(self, matrix, tag_ids, minhash=None):
+        self.matrix = matrix
+        self.tag_ids = tag_ids
+        self.minhash = minhash
+
+    def neighbors(self, tag):
+        """Sorted ids of the tags that co-occur with tag."""
+        i = self.tag_ids.get(tag)
+        if i is None:
+            return np.empty(0, dtype=self.matrix.indices.dtype)
+        return self._row(i)
+
+    def _row(self, i):
+        if i >= self.matrix.shape[0]:
+            return np.empty(0, dtype=self.matrix.indices.dtype)
+        return self.matrix.indices[self.matrix.indptr[i]:self.matrix.indptr[i + 1]]
+
+    def similarity(self, tag1, tag2, threshold=None):
+        """
+        Jaccard similarity of the two tags' context sets. With a threshold
+        and MinHash signatures, pairs that clearly fall below it return the
+        estimate instead of the exact value.
+        """
+        i, j = self.tag_ids.get(tag1), self.tag_ids.get(tag2)
+        if i is None or j is None:
+            return 0.0
+        if threshold is not None and self.minhash is not None:
+            estimate = self.minhash.estimate(np.array([i]), np.array([j]))[0]
+            if estimate <= threshold - self.minhash.margin:
+                return float(estimate)
+        return self.similarity_ids(i, j)
+
+    def similarity_ids(self, i, j):
+        context1, context2 = self._row(i), self._row(j)
+        if context1.size == 0 or context2.size == 0:
+            return 0.0
+        intersection = np.intersect1d(context1, context2, assume_unique=True).size
+        union = context1.size + context2.size - intersection
+        return intersection / union if union > 0 else 0.0
+
+    # -------------------------------------------------
+    # Disk cache
+    # -------------------------------------------------
+    def save(self, path, fingerprint):
+        tmp_path = path + ".tmp"
+        try:
+            arrays = {}
+            if self.minhash is not None:
+                arrays = {"minhash": self.minhash.signatures, "minhash_valid": self.minhash.valid,
+                          "minhash_error": np.array(self.minhash.error)}
+            with open(tmp_path, "wb") as f:
+                np.savez(f, data=self.matrix.data, indices=self.matrix.indices,
+                         indptr=self.matrix.indptr, shape=np.array(self.matrix.shape),
+                         fingerprint=np.array(fingerprint), **arrays)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[PERF] Failed to write tag context cache: {e}")
+
+    @classmethod
+    def load(cls, path, fingerprint, tag_ids):
+        """Cached contexts, or None if missing or built from a different index."""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as cache:
+                if str(cache["fingerprint"]) != fingerprint:
+                    print("[PERF] Tag context cache is stale, rebuilding.")
+                    return None
+                matrix = sp.csr_matrix((cache["data"], cache["indices"], cache["indptr"]),
+                                       shape=tuple(cache["shape"]))
+                minhash = None
+                if "minhash" in cache:
+                    minhash = MinHashSignatures(cache["minhash"], cache["minhash_valid"],
+                                                float(cache["minhash_error"]))
+        except Exception as e:
+            print(f"[PERF] Ignoring unreadable tag context cache: {e}")
+            return None
+        return cls(matrix, tag_ids, minhash)
+
+
+# =====================================================
+# MINHASH SIGNATURES
+# =====================================================
+class MinHashSignatures:
+    """
+    Fixed-width MinHash signatures of CSR rows (tag context sets).
+
+    The fraction of equal entries in two signatures estimates the Jaccard
+    similarity of the rows with standard error at most 1 / (2 sqrt(k)),
+    so k = ceil(1 / error²) keeps the estimate within `error` of the truth
+    at two standard deviations. Screening keeps pairs estimated within
+    three standard deviations of a threshold. Rows that were not signed
+    (empty, or filtered out at build time) are marked invalid and always
+    need the exact computation.
+    """
+
+    PRIME = 4294967291  # largest prime below 2**32: hashes fit uint32
+
+    def __init__(self, signatures, valid, error):
+        self.signatures = signatures    # (rows, k) uint32
+        self.valid = valid              # (rows,) bool
+        self.error = error
+
+    @property
+    def num_perm(self):
+        return self.signatures.shape[1]
+
+    @staticmethod
+    def num_perm_for(error):
+        return max(1, int(np.ceil(1.0 / (error * error))))
+
+    @classmethod
+    def build(cls, matrix, error, rows=None, seed=1, chunk_elements=1 << 24):
+        """
+        Sign the rows of a CSR matrix (only where rows is True, if given).
+        Hash functions are (a·x + b) mod PRIME over column ids.
+        """
+        start_time = time.time()
+        num_perm = cls.num_perm_for(error)
+        gen = np.random.default_rng(seed)
+        a = gen.integers(1, cls.PRIME, num_perm, dtype=np.uint64)
+        b = gen.integers(0, cls.PRIME, num_perm, dtype=np.uint64)
+
+        lengths = np.diff(matrix.indptr)
+        valid = lengths > 0
+        if rows is not None:
+            valid &= rows[:matrix.shape[0]]
+        signatures = np.full((matrix.shape[0], num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+
+        # Sign rows in chunks of about chunk_elements hash values
+        ids = np.nonzero(valid)[0]
+        cum = np.cumsum(lengths[ids])
+        budget = max(1, chunk_elements // num_perm)
+        start = 0
+        while start < ids.size:
+            base = cum[start - 1] if start else 0
+            end = max(start + 1, int(np.searchsorted(cum, base + budget, side="right")))
+            chunk = matrix[ids[start:end]]
+            hashes = (a[None, :] * chunk.indices.astype(np.uint64)[:, None] + b[None, :]) % cls.PRIME
+            signatures[ids[start:end]] = np.minimum.reduceat(hashes, chunk.indptr[:-1], axis=0)
+            start = end
+
+        print(f"[PERF] MinHash: {ids.size:,} tags x {num_perm} hashes "
+              f"(error {error}) in {time.time() - start_time:.2f}s")
+        return cls(signatures, valid, error)
+
+    def estimate(self, ids1, ids2, chunk=65536):
+        """Estimated Jaccard for each (ids1[k], ids2[k]); 1.0 where a row is unsigned."""
+        out = np.empty(len(ids1))
+        for s in range(0, len(ids1), chunk):
+            a, b = ids1[s:s + chunk], ids2[s:s + chunk]
+            out[s:s + chunk] = (self.signatures[a] == self.signatures[b]).mean(axis=1)
+        out[~(self.valid[ids1] & self.valid[ids2])] = 1.0
+        return out
+
+    def may_exceed(self, ids1, ids2, threshold):
+        """Pairs whose similarity may be above threshold."""
+        if len(ids1) == 0:
+            return np.zeros(0, dtype=bool)
+        return self.estimate(ids1, ids2) > threshold - self.margin
+
+    @property
+    def margin(self):
+        return 1.5 * self.error  # three standard deviations
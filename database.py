@@ -1,15 +1,104 @@
 # ==========================================
 # FILE: database.py
 # ==========================================
+import atexit
+import base64
+import json
 import sqlite3
+import threading
 from datetime import datetime
-from config import OBJECTS_DB, RELATIONS_DB
+from config import OBJECTS_DB, RELATIONS_DB, SQLITE_SETTINGS
+
+
+# =====================================================
+# CONNECTION POOL
+# =====================================================
+class PooledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection whose close() hands it back to its pool instead of
+    closing it. An open transaction is rolled back first, as a real close
+    would discard it.
+    """
+    pool = None
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+        if self.pool is None or not self.pool.release(self):
+            super().close()
+
+    def discard(self):
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Persistent connections to one database, configured once (WAL, pragmas,
+    statement cache) and reused. A connection belongs to one thread between
+    get_db_connection() and close(); the most recently released one is
+    handed out first, so long-lived threads keep reusing theirs.
+    """
+
+    def __init__(self, db_path, settings=SQLITE_SETTINGS):
+        self.db_path = db_path
+        self.settings = settings
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, conn):
+        """Keep conn for reuse. Returns False if the pool is full."""
+        with self._lock:
+            if len(self._idle) < self.settings.get('max_idle', 8):
+                self._idle.append(conn)
+                return True
+        return False
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.discard()
+
+    def _connect(self):
+        s = self.settings
+        conn = sqlite3.connect(self.db_path, timeout=s.get('busy_timeout', 10.0), check_same_thread=False,
+                               cached_statements=s.get('cached_statements', 256), factory=PooledConnection)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={s.get('synchronous', 'NORMAL')}")
+        conn.execute(f"PRAGMA cache_size={-int(s.get('cache_size_kb', 16384))}")
+        conn.execute(f"PRAGMA mmap_size={int(s.get('mmap_size', 0))}")
+        conn.execute(f"PRAGMA temp_store={s.get('temp_store', 'MEMORY')}")
+        conn.pool = self
+        return conn
+
+
+_pools = {}
+_pools_lock = threading.Lock()
 
 def get_db_connection(db_path):
-    """Get a database connection with proper settings"""
-    conn = sqlite3.connect(db_path, timeout=10.0, check_same_thread=False)
-    conn.execute("PRAGMA journal_mode=WAL")
-    return conn
+    """
+    Get a database connection with proper settings. Connections are
+    persistent: close() returns it for reuse by the next caller.
+    """
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(db_path, ConnectionPool(db_path))
+    return pool.acquire()
+
+@atexit.register
+def close_db_connections():
+    """Close every idle pooled connection"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
 
 def init_databases():
     """Initialize both objects and relations databases"""
@@ -64,9 +153,144 @@ def init_databases():
         # Set created_date to modified_date for existing records
         c.execute("UPDATE tag_relations SET created_date = modified_date WHERE created_date IS NULL")
     
+    # Relations version: bumped by triggers on every write, from any process
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS relations_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    """)
+    c.execute("INSERT OR IGNORE INTO relations_meta (key, value) VALUES ('version', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS tag_relations_version_{event.lower()}
+        AFTER {event} ON tag_relations
+        BEGIN
+            UPDATE relations_meta SET value = value + 1 WHERE key = 'version';
+        END
+        """)
+    
+    # Lookup / filter / sort indexes for the relations manager
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tag_relations_type ON tag_relations(relation_type)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tag_relations_reverse ON tag_relations(tag2, tag1)")
+    for column in ("created_date", "modified_date", "tag1_count", "tag2_count"):
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_tag_relations_{column} ON tag_relations({column})")
+    
+    # Gap sort key as an indexed generated column. ALTER TABLE can only add
+    # VIRTUAL generated columns; the index stores the computed values.
+    c.execute("PRAGMA table_xinfo(tag_relations)")
+    if 'gap_ratio' not in [col[1] for col in c.fetchall()]:
+        try:
+            c.execute(f"ALTER TABLE tag_relations ADD COLUMN gap_ratio REAL GENERATED ALWAYS AS ({GAP_EXPRESSION}) VIRTUAL")
+        except sqlite3.OperationalError as e:
+            print(f"[DB] Generated gap column unavailable, sorting on the expression: {e}")
+    c.execute("PRAGMA table_xinfo(tag_relations)")
+    if 'gap_ratio' in [col[1] for col in c.fetchall()]:
+        c.execute("CREATE INDEX IF NOT EXISTS idx_tag_relations_gap_ratio ON tag_relations(gap_ratio)")
+    
+    _init_relation_type_counts(c)
+    _init_relations_fts(c)
+    
+    # Planner statistics: without them the type index wins over the sort indexes
+    if c.execute("SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'").fetchone():
+        c.execute("PRAGMA optimize")
+    else:
+        c.execute("ANALYZE")
+    
     conn.commit()
     conn.close()
 
+GAP_EXPRESSION = "ABS((CAST(cooccurrence AS FLOAT) / NULLIF(MIN(tag1_count, tag2_count), 0)) - 1)"
+
+def _init_relation_type_counts(c):
+    """Per-type relation totals, maintained by triggers (filled from the table the first time)"""
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE name='relation_type_counts'").fetchone()
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS relation_type_counts (
+        relation_type TEXT PRIMARY KEY,
+        count INTEGER NOT NULL
+    )
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS relation_type_counts_insert AFTER INSERT ON tag_relations
+    BEGIN
+        INSERT INTO relation_type_counts (relation_type, count) VALUES (new.relation_type, 1)
+        ON CONFLICT(relation_type) DO UPDATE SET count = count + 1;
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS relation_type_counts_delete AFTER DELETE ON tag_relations
+    BEGIN
+        UPDATE relation_type_counts SET count = count - 1 WHERE relation_type = old.relation_type;
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS relation_type_counts_update AFTER UPDATE OF relation_type ON tag_relations
+    WHEN old.relation_type IS NOT new.relation_type
+    BEGIN
+        UPDATE relation_type_counts SET count = count - 1 WHERE relation_type = old.relation_type;
+        INSERT INTO relation_type_counts (relation_type, count) VALUES (new.relation_type, 1)
+        ON CONFLICT(relation_type) DO UPDATE SET count = count + 1;
+    END
+    """)
+    if not exists:
+        c.execute("""
+        INSERT INTO relation_type_counts (relation_type, count)
+        SELECT relation_type, COUNT(*) FROM tag_relations GROUP BY relation_type
+        """)
+
+_relations_fts = None  # trigram index available (None = not checked yet)
+
+def _init_relations_fts(c):
+    """
+    Trigram full-text index over tag1 / tag2 for substring search, kept in
+    sync with tag_relations by triggers. Built from the table the first
+    time. Skipped when SQLite lacks FTS5 or the trigram tokenizer (3.34+).
+    """
+    global _relations_fts
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE name='tag_relations_fts'").fetchone()
+    try:
+        c.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS tag_relations_fts USING fts5(
+            tag1, tag2, content='tag_relations', content_rowid='id', tokenize='trigram'
+        )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"[DB] Full-text relation search unavailable, using LIKE: {e}")
+        _relations_fts = False
+        return
+    
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS tag_relations_fts_insert AFTER INSERT ON tag_relations
+    BEGIN
+        INSERT INTO tag_relations_fts (rowid, tag1, tag2) VALUES (new.id, new.tag1, new.tag2);
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS tag_relations_fts_delete AFTER DELETE ON tag_relations
+    BEGIN
+        INSERT INTO tag_relations_fts (tag_relations_fts, rowid, tag1, tag2)
+        VALUES ('delete', old.id, old.tag1, old.tag2);
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS tag_relations_fts_update AFTER UPDATE OF tag1, tag2 ON tag_relations
+    BEGIN
+        INSERT INTO tag_relations_fts (tag_relations_fts, rowid, tag1, tag2)
+        VALUES ('delete', old.id, old.tag1, old.tag2);
+        INSERT INTO tag_relations_fts (rowid, tag1, tag2) VALUES (new.id, new.tag1, new.tag2);
+    END
+    """)
+    if not exists:
+        c.execute("INSERT INTO tag_relations_fts (tag_relations_fts) VALUES ('rebuild')")
+    _relations_fts = True
+
+def _has_relations_fts(c):
+    global _relations_fts
+    if _relations_fts is None:
+        _relations_fts = c.execute("SELECT 1 FROM sqlite_master WHERE name='tag_relations_fts'").fetchone() is not None
+    return _relations_fts
+
 # Tag Relations Functions
 def get_confirmed_synonyms():
     """
@@ -117,6 +341,41 @@ def get_confirmed_antonyms():
     
     return antonyms
 
+def get_relations_version():
+    """Counter that changes whenever tag_relations is written"""
+    conn = get_db_connection(RELATIONS_DB)
+    row = conn.execute("SELECT value FROM relations_meta WHERE key='version'").fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+def get_relation_sets():
+    """
+    One pass over tag_relations for in-memory filtering of suggestions.
+    Returns (existing, unrelated, linked):
+      existing  - (tag1, tag2, context) of every relation, both orders
+      unrelated - (tag1, tag2) marked unrelated, both orders
+      linked    - (tag1, tag2) pairs get_relation() finds (stored direction,
+                  plus the reverse when bidirectional)
+    """
+    conn = get_db_connection(RELATIONS_DB)
+    c = conn.cursor()
+    c.execute("SELECT tag1, tag2, context_tags, relation_type, bidirectional FROM tag_relations")
+    rows = c.fetchall()
+    conn.close()
+    
+    existing, unrelated, linked = set(), set(), set()
+    for tag1, tag2, context, relation_type, bidirectional in rows:
+        context = context or ""
+        existing.add((tag1, tag2, context))
+        existing.add((tag2, tag1, context))
+        if relation_type == 'unrelated':
+            unrelated.add((tag1, tag2))
+            unrelated.add((tag2, tag1))
+        linked.add((tag1, tag2))
+        if bidirectional:
+            linked.add((tag2, tag1))
+    return existing, unrelated, linked
+
 def get_unrelated_pairs():
     """Return set of (tag1, tag2) tuples marked as unrelated"""
     conn = get_db_connection(RELATIONS_DB)
@@ -223,11 +482,66 @@ def delete_tag_relation(relation_id):
     conn.commit()
     conn.close()
 
+SORT_COLUMNS = {
+    "created_date": "created_date",
+    "modified_date": "modified_date",
+    "tag1_count": "tag1_count",
+    "tag2_count": "tag2_count",
+    "gap": None,  # gap_ratio, or GAP_EXPRESSION without the generated column
+}
+
+_gap_column = None
+
+def _sort_column(c, sort_by):
+    """(column, descending) for a sort_by option such as "gap_desc"; unknown = created_date ASC"""
+    global _gap_column
+    name, _, direction = sort_by.rpartition("_")
+    if name not in SORT_COLUMNS or direction not in ("asc", "desc"):
+        return "created_date", False
+    if name != "gap":
+        return SORT_COLUMNS[name], direction == "desc"
+    if _gap_column is None:
+        has_column = 'gap_ratio' in [col[1] for col in c.execute("PRAGMA table_xinfo(tag_relations)").fetchall()]
+        _gap_column = "gap_ratio" if has_column else GAP_EXPRESSION
+    return _gap_column, direction == "desc"
+
+def _keyset_clauses(column, descending, key, inclusive=False):
+    """
+    WHERE clauses, in sort order, whose union is the rows at or after
+    key = (value, id) in ORDER BY column, id (both ASC or both DESC).
+    SQLite sorts NULLs first ascending and last descending; each clause is
+    an index range on its own, which an OR of them would not be.
+    """
+    value, row_id = key
+    op = ("<" if descending else ">") + ("=" if inclusive else "")
+    if value is None:
+        if descending:
+            return [(f"{column} IS NULL AND id {op} ?", [row_id])]
+        return [(f"{column} IS NULL AND id {op} ?", [row_id]), (f"{column} IS NOT NULL", [])]
+    clauses = [(f"({column}, id) {op} (?, ?)", [value, row_id])]
+    if descending:
+        clauses.append((f"{column} IS NULL", []))
+    return clauses
+
+def _encode_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+
 def list_tag_relations(page=1, page_size=30, search="", sort_by="created_date_asc", 
-                      filter_type=None, min_count=None, max_count=None):
+                      filter_type=None, min_count=None, max_count=None, cursor=None):
     """
     List all tag relations with pagination, sorting, and filtering
-    Returns: (relations, total, stats)
+    Returns: (relations, total, stats, cursor)
+    
+    cursor (from the previous call) marks the first / last rows of the page
+    it returned; pages near it are read with a keyset condition instead of
+    OFFSET. Without it (or when the filters changed) the page is read with
+    an OFFSET from whichever end of the result is nearer.
     """
     import time
     start_time = time.time()
@@ -235,16 +549,15 @@ def list_tag_relations(page=1, page_size=30, search="", sort_by="created_date_as
     conn = get_db_connection(RELATIONS_DB)
     c = conn.cursor()
     
-    # Add query timeout
-    conn.execute("PRAGMA busy_timeout = 5000")  # 5 second timeout
-    
-    offset = (page - 1) * page_size
-    
     # Build WHERE clause
     where_clauses = []
     params = []
     
-    if search:
+    if search and len(search) >= 3 and _has_relations_fts(c):
+        # Trigram index: substring match on tag1 or tag2 (needs 3+ characters)
+        where_clauses.append("id IN (SELECT rowid FROM tag_relations_fts WHERE tag_relations_fts MATCH ?)")
+        params.append('"' + search.replace('"', '""') + '"')
+    elif search:
         where_clauses.append("(tag1 LIKE ? OR tag2 LIKE ?)")
         params.extend([f"%{search}%", f"%{search}%"])
     
@@ -260,51 +573,67 @@ def list_tag_relations(page=1, page_size=30, search="", sort_by="created_date_as
         where_clauses.append("(tag1_count <= ? AND tag2_count <= ?)")
         params.extend([max_count, max_count])
     
-    where_clause = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+    # Per-type totals come from the trigger-maintained counter table
+    stats = dict(c.execute("SELECT relation_type, count FROM relation_type_counts WHERE count > 0").fetchall())
+    stats['total'] = sum(stats.values())
     
-    # Build ORDER BY clause with percentage calculation for gap
-    if sort_by == "gap_desc":
-        order_by = "ABS((CAST(cooccurrence AS FLOAT) / NULLIF(MIN(tag1_count, tag2_count), 0)) - 1) DESC"
-    elif sort_by == "gap_asc":
-        order_by = "ABS((CAST(cooccurrence AS FLOAT) / NULLIF(MIN(tag1_count, tag2_count), 0)) - 1) ASC"
+    # Total for the current filter
+    if search or min_count is not None or max_count is not None:
+        where_clause = "WHERE " + " AND ".join(where_clauses)
+        total = c.execute(f"SELECT COUNT(*) FROM tag_relations {where_clause}", params).fetchone()[0]
     else:
-        sort_mapping = {
-            "created_date_desc": "created_date DESC",
-            "created_date_asc": "created_date ASC",
-            "modified_date_desc": "modified_date DESC",
-            "modified_date_asc": "modified_date ASC",
-            "tag1_count_desc": "tag1_count DESC",
-            "tag1_count_asc": "tag1_count ASC",
-            "tag2_count_desc": "tag2_count DESC",
-            "tag2_count_asc": "tag2_count ASC",
-        }
-        order_by = sort_mapping.get(sort_by, "created_date ASC")
+        total = stats.get(filter_type, 0) if filter_type else stats['total']
+    
+    # Pick the cheapest way to reach the page: from the cursor's page, or an
+    # OFFSET from the start or the end of the result
+    column, descending = _sort_column(c, sort_by)
+    query_key = [search, filter_type, min_count, max_count, sort_by, page_size]
+    state = _decode_cursor(cursor) if cursor else None
+    if not isinstance(state, dict) or state.get("query") != query_key:
+        state = None
+    
+    first_row = (page - 1) * page_size
+    last_row = min(page * page_size, total)
+    plans = [(first_row, False, None, first_row, page_size)]
+    plans.append((total - last_row, True, None, total - last_row, max(0, last_row - first_row)))
+    if state is not None:
+        shown = state["page"]
+        if page > shown:
+            skip = (page - shown - 1) * page_size
+            plans.append((skip, False, _keyset_clauses(column, descending, state["last"]), skip, page_size))
+        elif page < shown:
+            skip = (shown - page - 1) * page_size
+            plans.append((skip, True, _keyset_clauses(column, not descending, state["first"]), skip, page_size))
+        else:
+            plans.append((0, False, _keyset_clauses(column, descending, state["first"], inclusive=True),
+                          0, page_size))
+    _, reverse, keyset, offset, limit = min(plans, key=lambda plan: plan[0])
+    order = "DESC" if descending != reverse else "ASC"
+    
+    # Keyset clauses become UNION ALL branches, merged in sort order
+    selects, query_params = [], []
+    for clause, clause_params in (keyset or [(None, [])]):
+        clauses = where_clauses + ([clause] if clause else [])
+        where_clause = "WHERE " + " AND ".join(clauses) if clauses else ""
+        selects.append(f"""
+        SELECT id, tag1, tag2, context_tags, relation_type, confidence, 
+               tag1_count, tag2_count, bidirectional, cooccurrence, calculation, 
+               created_date, modified_date, {column} AS sort_key
+        FROM tag_relations 
+        {where_clause}""")
+        query_params.extend(params + clause_params)
     
     query = f"""
-    SELECT id, tag1, tag2, context_tags, relation_type, confidence, 
-           tag1_count, tag2_count, bidirectional, cooccurrence, calculation, 
-           created_date, modified_date
-    FROM tag_relations 
-    {where_clause}
-    ORDER BY {order_by}
+    {" UNION ALL ".join(selects)}
+    ORDER BY sort_key {order}, id {order}
     LIMIT ? OFFSET ?
     """
     
-    params.extend([page_size, offset])
-    c.execute(query, params)
+    query_params.extend([limit, offset])
+    c.execute(query, query_params)
     rows = c.fetchall()
-    
-    # Get total count for the current filter
-    count_query = f"SELECT COUNT(*) FROM tag_relations {where_clause}"
-    c.execute(count_query, params[:-2])
-    total = c.fetchone()[0]
-    
-    # Get total count by type for stats
-    stats = {}
-    c.execute("SELECT relation_type, COUNT(*) FROM tag_relations GROUP BY relation_type")
-    for rel_type, count in c.fetchall():
-        stats[rel_type] = count
-    stats['total'] = sum(stats.values())
+    if reverse:
+        rows.reverse()
     
     conn.close()
     
@@ -326,11 +655,20 @@ def list_tag_relations(page=1, page_size=30, search="", sort_by="created_date_as
             "modified_date": row[12]
         })
     
+    next_cursor = None
+    if rows:
+        next_cursor = _encode_cursor({
+            "query": query_key,
+            "page": page,
+            "first": [rows[0][13], rows[0][0]],
+            "last": [rows[-1][13], rows[-1][0]],
+        })
+    
     elapsed = time.time() - start_time
     if elapsed > 1.0:
         print(f"[DB WARNING] list_tag_relations took {elapsed:.2f}s")
     
-    return relations, total, stats
+    return relations, total, stats, next_cursor
 
 def update_relation_direction(relation_id, bidirectional, swap=False):
     """Update the directionality of an existing relation"""
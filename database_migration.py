@@ -2,8 +2,8 @@
 Database migration to add directionality to tag relations
 Run this once to update your existing database
 """
-import sqlite3
 from config import RELATIONS_DB
+from database import get_db_connection
 
 def migrate_relations_db():
     conn = get_db_connection(RELATIONS_DB)
@@ -23,17 +23,19 @@ def fetch_unique_tags(es):
     tags = [bucket["key"] for bucket in resp["aggregations"]["unique_tags"]["buckets"]]
     return tags
 
-def fetch_all_tags_from_es(es, max_docs=None, timeout_seconds=120):
+def fetch_all_tags_from_es(es, max_docs=None, timeout_seconds=120, with_ids=False):
     """
     Fetch all tag lists from Elasticsearch with timeout protection
     max_docs: if set, only fetch this many documents (for testing)
     timeout_seconds: abort if taking too long
+    with_ids: also return the document ids, as (tag_lists, ids)
     """
     from config import ES_INDEX
     import time
     
     start_time = time.time()
     tag_lists = []
+    ids = []
     batch_size = 1000
     
     # Use scroll API for large datasets
@@ -59,6 +61,7 @@ def fetch_all_tags_from_es(es, max_docs=None, timeout_seconds=120):
                 tags = hit['_source'].get('tags', [])
                 if tags:  # Skip empty tag lists
                     tag_lists.append(tags)
+                    ids.append(hit['_id'])
             
             # Progress indicator
             if len(tag_lists) % 10000 == 0:
@@ -89,4 +92,6 @@ def fetch_all_tags_from_es(es, max_docs=None, timeout_seconds=120):
         if not tag_lists:
             raise
     
+    if with_ids:
+        return tag_lists, ids
     return tag_lists
\ No newline at end of file
@@ -0,0 +1,106 @@
+# ==========================================
+# FILE: embedding_store.py
+# ==========================================
+import threading
+import torch
+
+
+# =====================================================
+# GROWABLE TAG EMBEDDING BUFFER
+# =====================================================
+class TagEmbeddingStore:
+    """
+    Append-only tag → row index over a preallocated embedding buffer.
+
+    The buffer doubles its capacity when full, so appending m tags costs
+    O(m) amortized instead of re-stacking the whole vocabulary. Writers
+    are serialized by a lock; readers call snapshot() and never lock:
+    rows below the published length are never written again, and the tag
+    list is only ever appended to.
+    """
+
+    def __init__(self, initial_capacity=1024):
+        self.initial_capacity = max(1, initial_capacity)
+        self._lock = threading.Lock()
+        self._buffer = None             # (capacity, D) tensor, rows [0, n) valid
+        self._tags = []                 # row -> tag (append-only)
+        self._rows = {}                 # tag -> row
+        self._snapshot = (None, self._tags, 0)
+
+    # -------------------------------------------------
+    # Readers
+    # -------------------------------------------------
+    def snapshot(self):
+        """
+        Consistent (matrix, tags, length) view. matrix is a (length, D)
+        view of the buffer (None when empty); only tags[:length] belong to it.
+        """
+        return self._snapshot
+
+    def __len__(self):
+        return self._snapshot[2]
+
+    def __contains__(self, tag):
+        return tag in self._rows
+
+    @property
+    def capacity(self):
+        return 0 if self._buffer is None else self._buffer.shape[0]
+
+    # -------------------------------------------------
+    # Writers
+    # -------------------------------------------------
+    def reset(self, tags, matrix):
+        """Replace the contents with tags and their (N, D) embedding matrix."""
+        with self._lock:
+            self._buffer = None
+            self._tags = []
+            self._rows = {}
+            self._snapshot = (None, self._tags, 0)
+            if tags:
+                self._append_locked(list(tags), matrix)
+
+    def append(self, tags, embeddings):
+        """
+        Append tags with their (M, D) embeddings; tags already present are
+        skipped. Returns the row of the first appended tag.
+        """
+        with self._lock:
+            keep = [i for i, t in enumerate(tags) if t not in self._rows]
+            if len(keep) < len(tags):
+                tags = [tags[i] for i in keep]
+                embeddings = embeddings[keep]
+            return self._append_locked(tags, embeddings)
+
+    def _append_locked(self, tags, embeddings):
+        n = self._snapshot[2]
+        m = len(tags)
+        if m == 0:
+            return n
+
+        self._ensure_capacity(n + m, embeddings)
+        self._buffer[n:n + m] = embeddings
+
+        for i, t in enumerate(tags):
+            self._rows[t] = n + i
+        self._tags.extend(tags)
+
+        # Publish after the rows are written: readers see old or new, never partial
+        self._snapshot = (self._buffer[:n + m], self._tags, n + m)
+        return n
+
+    def _ensure_capacity(self, needed, like):
+        capacity = self.capacity
+        if capacity >= needed:
+            return
+
+        new_capacity = max(self.initial_capacity, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+
+        new_buffer = torch.empty((new_capacity, like.shape[1]), dtype=like.dtype, device=like.device)
+        n = self._snapshot[2]
+        if n:
+            new_buffer[:n] = self._buffer[:n]
+        # Existing readers keep their view of the old buffer
+        self._buffer = new_buffer
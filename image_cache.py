@@ -0,0 +1,170 @@
+# ==========================================
+# FILE: image_cache.py
+# ==========================================
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import torch
+
+from database import get_db_connection
+
+
+# =====================================================
+# CONTENT-HASH IMAGE EMBEDDING CACHE
+# =====================================================
+class ImageEmbeddingCache:
+    """
+    Image embeddings keyed by a hash of the model name and the image bytes.
+
+    Two tiers: a bounded in-memory LRU in front of a SQLite table. Repeat
+    uploads, retries and re-tagging after vocabulary changes skip decode
+    and encode_image and only redo the similarity step.
+
+    model_name must identify the inference profile too (e.g.
+    "ViT-B/32/cpu-bfloat16"): fp16, bf16 and int8 models give different
+    embeddings for the same image. The SQLite tier holds at most
+    disk_items rows; the oldest are evicted first.
+    """
+
+    def __init__(self, db_path, model_name, memory_items=10000, disk_items=200000, prune_every=500):
+        self.db_path = db_path
+        self.model_name = model_name
+        self.memory_items = max(0, memory_items)
+        self.disk_items = max(0, disk_items or 0)  # 0 = unbounded
+        self.prune_every = max(1, prune_every)
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> embedding tensor
+        self._writes = 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evicted = 0
+
+        self._init_db()
+
+    def _init_db(self):
+        conn = get_db_connection(self.db_path)
+        try:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                embedding BLOB NOT NULL,
+                created_date TIMESTAMP
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_image_embeddings_created ON image_embeddings(created_date)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    # -------------------------------------------------
+    # Keys
+    # -------------------------------------------------
+    def key_for(self, file_bytes):
+        digest = hashlib.sha256(file_bytes).hexdigest()
+        return f"{self.model_name}:{digest}"
+
+    # -------------------------------------------------
+    # Lookup / store
+    # -------------------------------------------------
+    def get(self, key):
+        """
+        Return (embedding, tier) with tier 'memory' or 'disk', or (None, None).
+        Disk embeddings come back as float32 CPU tensors.
+        """
+        with self._lock:
+            emb = self._memory.get(key)
+            if emb is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return emb, "memory"
+
+        conn = get_db_connection(self.db_path)
+        try:
+            row = conn.execute("SELECT embedding FROM image_embeddings WHERE key=?", (key,)).fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        emb = torch.from_numpy(np.frombuffer(row[0], dtype=np.float32).copy())
+        with self._lock:
+            self.hits_disk += 1
+        self.remember(key, emb)
+        return emb, "disk"
+
+    def put(self, key, embedding):
+        self.remember(key, embedding)
+        self.persist(key, embedding)
+
+    def persist(self, key, embedding):
+        """Write one embedding to the SQLite tier."""
+        data = embedding.detach().float().cpu().numpy().astype(np.float32).tobytes()
+        conn = get_db_connection(self.db_path)
+        try:
+            conn.execute("""
+            INSERT OR REPLACE INTO image_embeddings (key, model, dim, embedding, created_date)
+            VALUES (?, ?, ?, ?, ?)
+            """, (key, self.model_name, embedding.shape[-1], data, datetime.now()))
+            conn.commit()
+            if self._count_write():
+                self._prune(conn)
+        except Exception as e:
+            print(f"[CLIP] Failed to persist image embedding: {e}")
+        finally:
+            conn.close()
+
+    def _count_write(self):
+        """True every prune_every writes, when the SQLite tier is bounded."""
+        if not self.disk_items:
+            return False
+        with self._lock:
+            self._writes += 1
+            return self._writes % self.prune_every == 0
+
+    def _prune(self, conn):
+        """Evict the oldest rows past disk_items."""
+        total = conn.execute("SELECT COUNT(*) FROM image_embeddings").fetchone()[0]
+        excess = total - self.disk_items
+        if excess <= 0:
+            return
+        conn.execute("""
+        DELETE FROM image_embeddings WHERE key IN (
+            SELECT key FROM image_embeddings ORDER BY created_date LIMIT ?
+        )
+        """, (excess,))
+        conn.commit()
+        with self._lock:
+            self.evicted += excess
+        print(f"[PERF] Image cache: evicted {excess:,} embeddings past {self.disk_items:,}")
+
+    def remember(self, key, embedding):
+        """Insert into the in-memory LRU tier only."""
+        if self.memory_items == 0:
+            return
+        with self._lock:
+            self._memory[key] = embedding
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_items": len(self._memory),
+                "memory_capacity": self.memory_items,
+                "disk_capacity": self.disk_items,
+                "evicted": self.evicted,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+            }
@@ -0,0 +1,189 @@
+# ==========================================
+# FILE: inference_queue.py
+# ==========================================
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+# =====================================================
+# STAGE LATENCY STATS
+# =====================================================
+class StageStats:
+    """
+    Thread-safe running latency totals per named stage (milliseconds).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}  # stage -> [count, total_ms, max_ms, last_ms]
+
+    def record(self, stage, seconds):
+        ms = seconds * 1000.0
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0.0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += ms
+            entry[2] = max(entry[2], ms)
+            entry[3] = ms
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                stage: {
+                    "count": count,
+                    "avg_ms": round(total / count, 2) if count else 0.0,
+                    "max_ms": round(max_ms, 2),
+                    "last_ms": round(last_ms, 2),
+                }
+                for stage, (count, total, max_ms, last_ms) in self._stages.items()
+            }
+
+
+# =====================================================
+# MICRO-BATCHING INFERENCE WORKER
+# =====================================================
+class InferenceBatcher:
+    """
+    Collects inputs submitted from concurrent request threads into batches
+    and runs them through a single encode call on one worker thread.
+
+    A batch is closed when it reaches max_batch_size or when max_wait_ms has
+    passed since its first item arrived, whichever comes first. Each caller
+    gets a Future resolved with its own row of the batch output; the
+    future's .timings dict holds its queue wait and batch inference time.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=16, max_wait_ms=10, name="inference"):
+        self.encode_fn = encode_fn          # list of inputs -> sequence of outputs
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.name = name
+
+        self._queue = queue.Queue()
+        self.stages = StageStats()
+
+        self._stats_lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._batches = 0
+        self._batched_items = 0
+        self._last_batch_size = 0
+        self._max_batch_seen = 0
+        self._max_queue_depth = 0
+
+        self._thread = threading.Thread(target=self._run, name=f"{name}-batcher", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def submit(self, item):
+        """
+        Queue one input for batched inference. Returns a Future.
+        """
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+
+        with self._stats_lock:
+            self._submitted += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+
+        return future
+
+    def stop(self):
+        """Stop the worker once already queued items are processed."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "batches": self._batches,
+                "last_batch_size": self._last_batch_size,
+                "max_batch_size_seen": self._max_batch_seen,
+                "avg_batch_size": round(self._batched_items / self._batches, 2) if self._batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "stages": self.stages.snapshot(),
+            }
+
+    # -------------------------------------------------
+    # Worker loop
+    # -------------------------------------------------
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            stopping = False
+            deadline = time.perf_counter() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stopping = True
+                    break
+                batch.append(nxt)
+
+            self._process(batch)
+
+            if stopping:
+                return
+
+    def _process(self, batch):
+        # Drop callers that cancelled while waiting in the queue
+        live = [(item, fut, t) for item, fut, t in batch if fut.set_running_or_notify_cancel()]
+        if not live:
+            return
+
+        started = time.perf_counter()
+        for _, _, submitted_at in live:
+            self.stages.record("queue_wait", started - submitted_at)
+
+        try:
+            outputs = self.encode_fn([item for item, _, _ in live])
+        except Exception as e:
+            print(f"[{self.name}] Batch of {len(live)} failed: {e}")
+            for _, fut, _ in live:
+                fut.set_exception(e)
+            with self._stats_lock:
+                self._failed += len(live)
+            return
+
+        finished = time.perf_counter()
+        self.stages.record("inference", finished - started)
+
+        # Per-caller timings ride along on the future
+        inference_ms = round((finished - started) * 1000.0, 2)
+        for (_, fut, submitted_at), out in zip(live, outputs):
+            fut.timings = {
+                "queue_wait_ms": round((started - submitted_at) * 1000.0, 2),
+                "inference_ms": inference_ms,
+                "batch_size": len(live),
+            }
+            fut.set_result(out)
+
+        with self._stats_lock:
+            self._completed += len(live)
+            self._batches += 1
+            self._batched_items += len(live)
+            self._last_batch_size = len(live)
+            self._max_batch_seen = max(self._max_batch_seen, len(live))
@@ -1,14 +1,21 @@
 # ==========================================
 # FILE: relation_analyzer.py
 # ==========================================
-from database import get_unrelated_pairs, get_relation
-from config import RELATIONS_DB
-import sqlite3
-from collections import defaultdict
+from database import get_relation_sets, get_relations_version
+from config import TAG_CONTEXT_CACHE
+from cooccurrence import CooccurrenceEngine, TagContexts, MinHashSignatures, build_outside, frequency_band
+from collections import OrderedDict
+import hashlib
+import json
 from itertools import combinations
-from multiprocessing import Pool, cpu_count
-from functools import partial
+import multiprocessing
+from multiprocessing import cpu_count
+import threading
+import atexit
 import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+import numpy as np
 
 import os
 import sys
@@ -23,39 +30,238 @@ if 'WERKZEUG_RUN_MAIN' not in os.environ and sys.platform == 'win32':
     print("\n⚠ First run detected on Windows")
     print("  Multiprocessing will initialize on server reload...")
 
+# =====================================================
+# PERSISTENT WORKER POOL
+# =====================================================
+class RelationWorkerPool:
+    """
+    Long-lived worker processes for pair scoring.
+
+    The index (tag ids, counts, object sets, contexts) is handed to the
+    workers once, when the pool starts: inherited copy-on-write where fork
+    is available, pickled once per worker otherwise. Tasks only carry
+    (tag id, tag id) pairs. The pool is restarted when the index it was
+    started with changes (different key). One run uses the pool at a time
+    (`running`), so a cancelled run can terminate the workers mid-batch.
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._key = None
+        self._lock = threading.Lock()
+        self.running = threading.Lock()
+        atexit.register(self.shutdown)
+
+    @staticmethod
+    def _context():
+        if "fork" in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context("fork")
+        return multiprocessing.get_context()
+
+    def get(self, key, make_state, num_workers):
+        """Pool started with make_state(); reused while key is unchanged."""
+        with self._lock:
+            key = (key, num_workers)
+            if self._pool is not None and self._key == key:
+                return self._pool
+
+            self._shutdown_locked()
+            start_time = time.time()
+            self._pool = self._context().Pool(
+                processes=num_workers,
+                initializer=_init_relation_worker,
+                initargs=(make_state(),),
+            )
+            self._key = key
+            print(f"[PERF] Started {num_workers} relation workers in {time.time() - start_time:.2f}s")
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            self._shutdown_locked()
+
+    def _shutdown_locked(self):
+        if self._pool is None:
+            return
+        self._pool.terminate()
+        self._pool.join()
+        self._pool = None
+        self._key = None
+
+
+_worker_pool = RelationWorkerPool()
+
+# =====================================================
+# MINING PROGRESS
+# =====================================================
+class MiningProgress:
+    """
+    Progress and cancellation hook handed down a mining run.
+
+    Calling it with the fraction (0-1) of the current step that is done,
+    and optionally the suggestions that step just found, reports both to
+    on_progress(fraction of the whole run, stage, partial) and raises
+    CancelledError once is_cancelled() is true. span() gives the hook for
+    a sub-step. MiningProgress() does nothing.
+    """
+
+    def __init__(self, on_progress=None, is_cancelled=None, start=0.0, end=1.0, stage=None):
+        self.on_progress = on_progress
+        self.is_cancelled = is_cancelled
+        self.start = start
+        self.end = end
+        self.stage = stage
+
+    def __call__(self, fraction=0.0, partial=None):
+        if self.is_cancelled is not None and self.is_cancelled():
+            raise CancelledError()
+        if self.on_progress is not None:
+            fraction = min(max(fraction, 0.0), 1.0)
+            self.on_progress(self.start + (self.end - self.start) * fraction, self.stage, partial)
+
+    def span(self, start, end, stage=None):
+        """Hook for a sub-step covering [start, end] of this step"""
+        width = self.end - self.start
+        return MiningProgress(self.on_progress, self.is_cancelled, self.start + width * start,
+                              self.start + width * end, stage or self.stage)
+
+
 class RelationAnalyzer:
-    def __init__(self, tag_counts, tag_to_objects):
+    def __init__(self, tag_counts, tag_to_objects, candidate_store=None, lock=None):
         self.tag_counts = tag_counts
         self.tag_to_objects = tag_to_objects
         self.total_objects = len(set().union(*tag_to_objects.values())) if tag_to_objects else 0
-        self._seen_suggestions = set()  # Track what we've already suggested
+        self.candidate_store = candidate_store  # RelationCandidateStore, or None to mine in memory only
+        self._candidates = None  # (settings key, relation-independent candidates)
+        self._candidates_lock = threading.Lock()
+        
+        # Track what we've already suggested (persisted with the candidate store)
+        self._seen_suggestions = candidate_store.seen() if candidate_store is not None else set()
+        self._suggestion_cache = OrderedDict()  # cache key -> (time, ranked suggestions)
+        self._suggestion_cache_lock = threading.Lock()  # job worker threads vs. request threads
+        self.index_version = 0  # bumped when tag_counts / tag_to_objects change
+        self._index_lock = lock or threading.RLock()  # object updates vs. engine / statistics reads (SuggestionEngine.lock)
+        self._engine_build_lock = threading.Lock()  # one engine build at a time, outside _index_lock
+        self._dirty_tags = set()  # tags of added / removed objects, re-mined on the next read
+        
+        # Stable tag ids: worker tasks reference tags by position. Tags first
+        # seen in objects added later are counted but not mined until restart.
+        self._tags = list(tag_counts.keys())
+        self._tag_ids = {tag: i for i, tag in enumerate(self._tags)}
     
     def calculate_suggested_relations(self, limit=5, offset=0, relation_type=None, force_tag=None):
+        """
+        Page [offset, offset + limit) of the ranked suggestions. The full
+        ranking is cached per (relation_type, force_tag, settings, index
+        version, relations version), so paging only slices it.
+        """
+        return self.take_page(self.ranked_suggestions(relation_type, force_tag), offset, limit)
+    
+    def query_key(self, relation_type=None, force_tag=None):
+        """Cache key of a suggestion query; equal keys always rank the same suggestions"""
+        force_tag = force_tag.lower() if force_tag else None
+        return (relation_type, force_tag, self._settings_hash(), self.index_version, get_relations_version())
+    
+    def ranked_suggestions(self, relation_type=None, force_tag=None, progress=None):
+        """
+        Every suggestion for the query not yet seen, best first, from the
+        cache or mined (and cached). progress: MiningProgress for the run.
+        """
         from config import PERF_SETTINGS
         cache_duration = PERF_SETTINGS.get('suggestion_cache_duration', 30)
         
-        # Cache results for common queries
-        cache_key = f"{limit}_{offset}_{relation_type}_{force_tag}"
-        if hasattr(self, '_suggestion_cache') and cache_key in self._suggestion_cache:
-            cached_time, cached_results = self._suggestion_cache[cache_key]
-            from datetime import datetime
-            if (datetime.now() - cached_time).total_seconds() < cache_duration:
-                print(f"[PERF] Using cached results for query: {cache_key}")
-                return cached_results[offset:offset + limit]
-        
-        if not hasattr(self, '_suggestion_cache'):
-            self._suggestion_cache = {}
+        force_tag = force_tag.lower() if force_tag else None
+        cache_key = self.query_key(relation_type, force_tag)
+        with self._suggestion_cache_lock:
+            cached = self._suggestion_cache.get(cache_key)
+            if cached is not None and time.time() - cached[0] < cache_duration:
+                self._suggestion_cache.move_to_end(cache_key)
+            else:
+                cached = None
+        if cached is not None:
+            print(f"[PERF] Using cached results for query: {relation_type} {force_tag or ''}")
+            return cached[1]
+        
+        suggestions = self.mine_suggestions(relation_type, force_tag, progress)
+        
+        # Remove duplicates we've already seen in this session
+        suggestions = [s for s in suggestions if self._make_suggestion_key(s) not in self._seen_suggestions]
+        
+        with self._suggestion_cache_lock:
+            self._suggestion_cache[cache_key] = (time.time(), suggestions)
+            self._suggestion_cache.move_to_end(cache_key)
+            while len(self._suggestion_cache) > 20:
+                self._suggestion_cache.popitem(last=False)
+        return suggestions
+    
+    def clear_suggestion_cache(self):
+        with self._suggestion_cache_lock:
+            self._suggestion_cache.clear()
+    
+    def invalidate(self):
+        """
+        Drop everything derived from the settings: the co-occurrence engine,
+        the tag contexts and the suggestion cache. Rebuilt on next use.
+        """
+        with self._index_lock:
+            self._cooccurrence = None
+            self._tag_contexts_cache = None
+            self._tag_contexts_version = None
+        self.clear_suggestion_cache()
+    
+    def take_page(self, suggestions, offset, limit):
+        """suggestions[offset:offset + limit], marked as seen"""
+        page = suggestions[offset:offset + limit]
+        new_keys = [self._make_suggestion_key(s) for s in page]
+        new_keys = [k for k in new_keys if k not in self._seen_suggestions]
+        self._seen_suggestions.update(new_keys)
+        if self.candidate_store is not None:
+            self.candidate_store.add_seen(new_keys)
+        return page
+    
+    @staticmethod
+    def _settings_hash():
+        from config import PERF_SETTINGS
+        return hash(tuple(sorted((k, repr(v)) for k, v in PERF_SETTINGS.items())))
+    
+    def _relation_sets(self):
+        """(existing, unrelated, linked) from get_relation_sets(), reloaded when relations change"""
+        version = get_relations_version()
+        cached = getattr(self, '_relation_sets_cache', None)
+        if cached is None or cached[0] != version:
+            cached = self._relation_sets_cache = (version, get_relation_sets())
+        return cached[1]
+    
+    def filter_known(self, suggestions):
+        """Drop suggestions whose pair is already related or marked unrelated (one set pass)."""
+        _, unrelated, linked = self._relation_sets()
+        return [s for s in suggestions
+                if (s['tag1'], s['tag2']) not in unrelated and (s['tag1'], s['tag2']) not in linked]
+    
+    def mine_suggestions(self, relation_type=None, force_tag=None, progress=None):
         """
         Calculate likely synonym/antonym pairs with enhanced heuristics
         relation_type: 'synonym', 'antonym', or None for all
         force_tag: if provided, only find relations involving this tag
+        progress: MiningProgress reporting the run (raises CancelledError to stop it)
+        Returns every candidate, best first (no session filtering, no cache).
         """
+        from config import PERF_SETTINGS
+        
+        progress = progress or MiningProgress()
         suggestions = []
-        unrelated = get_unrelated_pairs()
-        existing_relations = self._get_existing_relations()
+        existing_relations, unrelated, _ = self._relation_sets()
+        
+        # Unforced sparse mining is served from the persisted candidate store
+        if not force_tag and self.candidate_store is not None and PERF_SETTINGS.get('use_sparse_engine', True):
+            suggestions = [dict(s) for s in self._stored_candidates(progress)
+                           if (relation_type is None or s['relation_type'] == relation_type)
+                           and not self._is_known(s, existing_relations, unrelated)]
+            suggestions.sort(key=lambda x: (x["confidence"], min(x["tag1_count"], x["tag2_count"])), reverse=True)
+            return suggestions
         
         # Limit search space but prioritize high-occurrence tags
-        tags_list = sorted(self.tag_counts.keys(), key=lambda t: self.tag_counts[t], reverse=True)[:1000]
+        tags_list = self._top_tags(1000)
         
         if force_tag:
             force_tag = force_tag.lower()
@@ -64,38 +270,61 @@ class RelationAnalyzer:
             tags_list = [force_tag] if force_tag in tags_list else [force_tag] + tags_list[:999]
         
         # Calculate synonyms (NEVER multi-tag)
+        split = 0.5 if relation_type is None else 1.0
         if relation_type is None or relation_type == 'synonym':
-            synonym_suggestions = self._calculate_synonyms(tags_list, unrelated, existing_relations, force_tag)
+            synonym_suggestions = self._calculate_synonyms(tags_list, unrelated, existing_relations, force_tag,
+                                                           progress.span(0.0, split, "synonyms"))
             suggestions.extend(synonym_suggestions)
         
         # Calculate antonyms (including contextual, only for very common tags)
         if relation_type is None or relation_type == 'antonym':
-            antonym_suggestions = self._calculate_antonyms(tags_list, unrelated, existing_relations, force_tag)
+            antonym_suggestions = self._calculate_antonyms(tags_list, unrelated, existing_relations, force_tag,
+                                                           progress.span(1.0 - split, 1.0, "antonyms"))
             suggestions.extend(antonym_suggestions)
         
-        # Remove duplicates we've already seen in this session
-        suggestions = [s for s in suggestions if self._make_suggestion_key(s) not in self._seen_suggestions]
-        
         # Sort by confidence and occurrence weight
         suggestions.sort(key=lambda x: (x["confidence"], min(x["tag1_count"], x["tag2_count"])), reverse=True)
-        
-        # Mark suggestions as seen
-        for s in suggestions[offset:offset + limit]:
-            self._seen_suggestions.add(self._make_suggestion_key(s))
-        
-        # Store in cache
-        from datetime import datetime
-        self._suggestion_cache[cache_key] = (datetime.now(), suggestions)
-        
-        # Limit cache size
-        if len(self._suggestion_cache) > 20:
-            oldest_keys = sorted(self._suggestion_cache.keys(), 
-                               key=lambda k: self._suggestion_cache[k][0])[:10]
-            for k in oldest_keys:
-                del self._suggestion_cache[k]
-        
-        # Apply offset and limit
-        return suggestions[offset:offset + limit]
+        return suggestions
+    
+    def _top_tags(self, n):
+        """The n most frequent tags (sorted once per index version)."""
+        if getattr(self, '_tags_by_count', None) is None:
+            self._tags_by_count = sorted(self._tags, key=lambda t: self.tag_counts.get(t, 0), reverse=True)
+        return self._tags_by_count[:n]
+    
+    # -------------------------------------------------
+    # Object updates
+    # -------------------------------------------------
+    def add_object(self, row, tags):
+        """
+        Object `row` with `tags` was added to the index. tag_counts and
+        tag_to_objects must already include it (SuggestionEngine.add_object
+        updates them); the engine's pair statistics are updated only for
+        the object's tags, and candidates involving those tags are
+        re-scored on the next read.
+        """
+        self._apply_object(row, tags, 1)
+    
+    def remove_object(self, row, tags):
+        """Object `row` with `tags` was removed from the index (see add_object)."""
+        self._apply_object(row, tags, -1)
+    
+    def _apply_object(self, row, tags, step):
+        with self._index_lock:
+            self.total_objects += step
+            
+            known = sorted({tag for tag in tags if tag in self._tag_ids})
+            engine = getattr(self, '_cooccurrence', None)
+            if engine is not None:
+                ids = [self._tag_ids[t] for t in known]
+                counts = [self.tag_counts.get(t, 0) for t in known]
+                if step > 0:
+                    engine.add_object(row, ids, counts)
+                else:
+                    engine.remove_object(row, ids, counts)
+            self._dirty_tags.update(known)
+            self._tags_by_count = None
+            self.index_version += 1
     
     def _make_suggestion_key(self, suggestion):
         """Create unique key for suggestion to prevent repeats"""
@@ -103,32 +332,24 @@ class RelationAnalyzer:
     
     def _get_existing_relations(self):
         """Get all existing relations to avoid duplicates"""
-        existing = set()
-        conn = sqlite3.connect(RELATIONS_DB, timeout=10.0)
-        try:
-            c = conn.cursor()
-            c.execute("SELECT tag1, tag2, context_tags FROM tag_relations")
-            for row in c.fetchall():
-                # Store both single tags and normalized multi-tag forms
-                tag1 = row[0]
-                tag2 = row[1]
-                context = row[2] or ""
-                existing.add((tag1, tag2, context))
-                existing.add((tag2, tag1, context))
-        finally:
-            conn.close()
-        return existing
+        return self._relation_sets()[0]
     
-    def _calculate_synonyms(self, tags_list, unrelated, existing_relations, force_tag=None):
+    def _calculate_synonyms(self, tags_list, unrelated, existing_relations, force_tag=None, progress=None):
         """Calculate synonym suggestions - ONLY single tags - PARALLELIZED"""
         from config import PERF_SETTINGS
         
+        progress = progress or MiningProgress()
         min_freq = PERF_SETTINGS.get('min_tag_frequency_synonym', 10)
         max_analyze = PERF_SETTINGS.get('max_tags_to_analyze', 800)
         enable_parallel = PERF_SETTINGS.get('enable_parallel_processing', True)
         
+        if PERF_SETTINGS.get('use_sparse_engine', True):
+            suggestions = self._sparse_synonyms(min_freq, unrelated, existing_relations, force_tag)
+            progress(1.0, suggestions)
+            return suggestions
+        
         # Filter to single tags only
-        single_tags = [t for t in tags_list if ' ' not in t and self.tag_counts[t] >= min_freq]
+        single_tags = [t for t in tags_list if ' ' not in t and self.tag_counts.get(t, 0) >= min_freq]
         
         if force_tag:
             force_tag = force_tag.lower()
@@ -149,10 +370,14 @@ class RelationAnalyzer:
         if not enable_parallel:
             # Single-threaded fallback
             results = []
-            for pair in pairs_to_check:
+            for n, pair in enumerate(pairs_to_check):
                 result = _calculate_synonym_pair(pair, self.tag_counts, self.tag_to_objects)
                 if result:
                     results.append(result)
+                    progress(n / len(pairs_to_check), [result])
+                elif n % 5000 == 0:
+                    progress(n / len(pairs_to_check))
+            progress(1.0)
             return results
         
         # Parallel processing
@@ -160,18 +385,10 @@ class RelationAnalyzer:
         if num_workers is None:
             num_workers = max(1, cpu_count() - 1)
         
-        chunk_size = max(10, len(pairs_to_check) // (num_workers * 4))
-        
         print(f"[PERF] Calculating {len(pairs_to_check)} synonym pairs using {num_workers} workers...")
         start_time = time.time()
         
-        with Pool(processes=num_workers) as pool:
-            worker_func = partial(
-                _calculate_synonym_pair,
-                tag_counts=self.tag_counts,
-                tag_to_objects=self.tag_to_objects
-            )
-            results = pool.map(worker_func, pairs_to_check, chunksize=chunk_size)
+        results = self._map_pairs("synonym", pairs_to_check, num_workers, progress=progress)
         
         elapsed = time.time() - start_time
         print(f"[PERF] Synonym calculation completed in {elapsed:.2f}s")
@@ -180,14 +397,22 @@ class RelationAnalyzer:
         suggestions = [r for r in results if r is not None]
         return suggestions
     
-    def _calculate_antonyms(self, tags_list, unrelated, existing_relations, force_tag=None):
+    def _calculate_antonyms(self, tags_list, unrelated, existing_relations, force_tag=None, progress=None):
         """Calculate antonym suggestions - PARALLELIZED"""
         from config import PERF_SETTINGS
         
+        progress = progress or MiningProgress()
         min_freq = PERF_SETTINGS.get('min_tag_frequency_antonym', 50)
         max_analyze = PERF_SETTINGS.get('max_tags_to_analyze', 800)
         enable_parallel = PERF_SETTINGS.get('enable_parallel_processing', True)
 
+        if PERF_SETTINGS.get('use_sparse_engine', True):
+            suggestions = self._sparse_antonyms(min_freq, unrelated, existing_relations, force_tag,
+                                                progress.span(0.0, 0.8))
+            suggestions.extend(self._find_contextual_antonyms(tags_list, existing_relations, force_tag,
+                                                              progress=progress.span(0.8, 1.0, "contextual antonyms")))
+            return suggestions
+
         # Build tag context map ONLY if needed (lazy loading)
         # Check if we even need context similarity (many antonyms don't require it)
         # For force_tag queries, we can skip context building for speed
@@ -196,14 +421,11 @@ class RelationAnalyzer:
             tag_contexts = {}
             print(f"[PERF] Skipping context building for force_tag query (faster)")
         else:
-            # Build context only if not cached
-            if not hasattr(self, '_tag_contexts_cache'):
-                print(f"[PERF] Building tag contexts for antonym detection...")
-                self._tag_contexts_cache = self._build_tag_contexts()
-            tag_contexts = self._tag_contexts_cache
+            # Build context only if not cached for the current index
+            tag_contexts = self._tag_contexts()
         
         # Filter to single tags only with minimum frequency
-        single_tags = [t for t in tags_list if ' ' not in t and self.tag_counts[t] >= min_freq]
+        single_tags = [t for t in tags_list if ' ' not in t and self.tag_counts.get(t, 0) >= min_freq]
         
         if force_tag:
             force_tag = force_tag.lower()
@@ -223,11 +445,14 @@ class RelationAnalyzer:
         if not enable_parallel:
             # Single-threaded fallback
             results = []
-            for pair in pairs_to_check:
+            for n, pair in enumerate(pairs_to_check):
                 result = _calculate_antonym_pair(pair, self.tag_counts, self.tag_to_objects, 
                                                tag_contexts, self.total_objects)
                 if result:
                     results.append(result)
+                    progress(0.8 * n / len(pairs_to_check), [result])
+                elif n % 5000 == 0:
+                    progress(0.8 * n / len(pairs_to_check))
             suggestions = results
         else:
             # Parallel processing
@@ -235,29 +460,13 @@ class RelationAnalyzer:
             if num_workers is None:
                 num_workers = max(1, cpu_count() - 1)
             
-            chunk_size = max(10, len(pairs_to_check) // (num_workers * 4))
-            
             print(f"[PERF] Calculating {len(pairs_to_check)} antonym pairs using {num_workers} workers...")
             start_time = time.time()
             
-            with Pool(processes=num_workers) as pool:
-                # Use fast path if no context available
-                if force_tag and not tag_contexts:
-                    worker_func = partial(
-                        _calculate_antonym_pair_fast,
-                        tag_counts=self.tag_counts,
-                        tag_to_objects=self.tag_to_objects,
-                        total_objects=self.total_objects
-                    )
-                else:
-                    worker_func = partial(
-                        _calculate_antonym_pair,
-                        tag_counts=self.tag_counts,
-                        tag_to_objects=self.tag_to_objects,
-                        tag_contexts=tag_contexts,
-                        total_objects=self.total_objects
-                    )
-                    results = pool.map(worker_func, pairs_to_check, chunksize=chunk_size)
+            # Use fast path if no context available
+            kind = "antonym_fast" if (force_tag and not tag_contexts) else "antonym"
+            results = self._map_pairs(kind, pairs_to_check, num_workers, tag_contexts,
+                                      progress=progress.span(0.0, 0.8))
             
             elapsed = time.time() - start_time
             print(f"[PERF] Antonym calculation completed in {elapsed:.2f}s")
@@ -265,131 +474,495 @@ class RelationAnalyzer:
             suggestions = [r for r in results if r is not None]
         
         # Add contextual antonyms (still single-threaded as it's less common)
-        contextual = self._find_contextual_antonyms(tags_list, existing_relations, force_tag)
+        contextual = self._find_contextual_antonyms(tags_list, existing_relations, force_tag,
+                                                    progress=progress.span(0.8, 1.0, "contextual antonyms"))
         suggestions.extend(contextual)
         
         return suggestions
     
-    def _find_contextual_antonyms(self, tags_list, existing_relations, force_tag=None):
-        """Find pairs that are antonyms only in specific contexts - ONLY for very common tags"""
-        suggestions = []
+    # -------------------------------------------------
+    # Sparse co-occurrence engine
+    # -------------------------------------------------
+    def _cooccurrence_engine(self):
+        """
+        Incidence matrix over the whole vocabulary, built once and kept
+        current by add_object / remove_object. Rebuilt only when a lower
+        minimum frequency needs pair statistics for more tags. The build
+        runs outside _index_lock and is published only if no object was
+        added or removed meanwhile.
+        """
+        from config import PERF_SETTINGS
+        
+        min_count = min(max(PERF_SETTINGS.get('min_tag_frequency_synonym', 10), 10),
+                        max(PERF_SETTINGS.get('min_tag_frequency_antonym', 50), 50))
+        engine = getattr(self, '_cooccurrence', None)
+        if engine is not None and engine.min_count <= min_count:
+            return engine
+        with self._engine_build_lock:
+            engine = getattr(self, '_cooccurrence', None)
+            if engine is not None and engine.min_count <= min_count:
+                return engine
+            
+            def build():
+                return CooccurrenceEngine(self._tags, self.tag_counts, self.tag_to_objects, self.total_objects,
+                                          min_count=min_count, lock=self._index_lock)
+            
+            def publish(engine):
+                self._cooccurrence = engine
+                return engine
+            
+            return build_outside(self._index_lock, lambda: self.index_version, build, publish)
+    
+    @staticmethod
+    def _is_known(suggestion, existing_relations, unrelated):
+        """Same checks as the mining filters, for stored (unfiltered) candidates"""
+        tag1, tag2, context = suggestion['tag1'], suggestion['tag2'], suggestion['context_tags']
+        if context:
+            return (tag1, tag2, context) in existing_relations
+        return (tag1, tag2, "") in existing_relations or (tag1, tag2) in unrelated
+    
+    @staticmethod
+    def _known_pair_filter(unrelated, existing_relations):
+        return lambda tag1, tag2: ((tag1, tag2, "") in existing_relations or
+                                   (tag1, tag2) in unrelated or (tag2, tag1) in unrelated)
+    
+    def _sparse_synonyms(self, min_freq, unrelated, existing_relations, force_tag=None):
+        """Synonyms over every single-word tag in the frequency band (no max_tags_to_analyze cap)"""
+        from config import PERF_SETTINGS
         
-        # CRITICAL: Only use very high-frequency tags as contexts (min 200 occurrences)
-        context_candidates = [t for t in tags_list if self.tag_counts[t] >= 1000 and ' ' not in t][:50]
+        engine = self._cooccurrence_engine()
+        band = engine.band(max(min_freq, 10), PERF_SETTINGS.get('sparse_band_max_ratio'))
+        force_id = self._tag_ids.get(force_tag.lower()) if force_tag else None
         
-        for context_tag in context_candidates:
-            context_objs = self.tag_to_objects[context_tag]
+        print(f"[PERF] Sparse synonym scan over {len(band):,} tags...")
+        start_time = time.time()
+        suggestions = engine.synonym_pairs(band, force_id=force_id,
+                                           skip=self._known_pair_filter(unrelated, existing_relations))
+        print(f"[PERF] Synonym calculation completed in {time.time() - start_time:.2f}s "
+              f"({len(suggestions)} candidates)")
+        return suggestions
+    
+    def _sparse_antonyms(self, min_freq, unrelated, existing_relations, force_tag=None, progress=None):
+        """
+        Antonyms over the sparse_max_antonym_tags most frequent tags of the band.
+        A force_tag query walks only that tag's postings, so it covers the whole band.
+        """
+        from config import PERF_SETTINGS
+        
+        engine = self._cooccurrence_engine()
+        band = engine.band(max(min_freq, 50), PERF_SETTINGS.get('sparse_band_max_ratio'),
+                           limit=None if force_tag else PERF_SETTINGS.get('sparse_max_antonym_tags', 5000))
+        
+        # force_tag queries use the no-context heuristic, like the per-pair fast path
+        force_id = None
+        contexts = None
+        if force_tag:
+            force_id = self._tag_ids.get(force_tag.lower())
+        else:
+            contexts = self._tag_contexts()
+        
+        print(f"[PERF] Sparse antonym scan over {len(band):,} tags...")
+        start_time = time.time()
+        suggestions = engine.antonym_pairs(band, contexts=contexts, force_id=force_id,
+                                           skip=self._known_pair_filter(unrelated, existing_relations),
+                                           progress=progress)
+        print(f"[PERF] Antonym calculation completed in {time.time() - start_time:.2f}s "
+              f"({len(suggestions)} candidates)")
+        return suggestions
+    
+    # -------------------------------------------------
+    # Persisted candidates
+    # -------------------------------------------------
+    MINING_SETTINGS = ('min_tag_frequency_synonym', 'min_tag_frequency_antonym', 'skip_sparse_objects',
+                       'min_tags_per_object', 'sparse_band_max_ratio', 'sparse_max_antonym_tags',
+                       'context_minhash_error', 'contextual_max_contexts', 'contextual_min_context_count',
+                       'contextual_min_overlap', 'contextual_min_pair_count', 'contextual_max_cooccur_rate')
+    
+    def _mining_settings_key(self):
+        from config import PERF_SETTINGS
+        return json.dumps({k: PERF_SETTINGS.get(k) for k in self.MINING_SETTINGS}, sort_keys=True)
+    
+    def _index_digest(self, counts):
+        """Hash of the tag counts the candidates are mined from"""
+        h = hashlib.sha1()
+        for tag in self._tags:
+            h.update(f"{tag}\t{counts.get(tag, 0)}\n".encode("utf-8"))
+        return h.hexdigest()
+    
+    def _stored_candidates(self, progress=None):
+        """
+        Relation-independent synonym / antonym candidates, best kept in the
+        candidate store. Only mined tags whose counts moved beyond
+        candidate_count_tolerance / candidate_min_count_delta since they
+        were mined, and mined tags of objects added / removed since the
+        last read, are re-mined from the
+        maintained pair statistics; a settings change, an empty store or
+        more than candidate_max_refresh_tags such tags trigger a full run.
+        A cancelled run (progress) leaves the store as it was.
+        """
+        from config import PERF_SETTINGS
+        
+        progress = progress or MiningProgress()
+        settings_key = self._mining_settings_key()
+        with self._candidates_lock:
+            if (self._candidates is not None and self._candidates[0] == settings_key
+                    and not self._dirty_tags):
+                return self._candidates[1]
+            
+            start_time = time.time()
+            store = self.candidate_store
+            snapshot = store.counts() if store.meta().get("settings") == settings_key else {}
+            with self._index_lock:
+                dirty, self._dirty_tags = self._dirty_tags, set()
+                counts = dict(self.tag_counts)
+            index_version = self._index_digest(counts)
+            changed = self._changed_tags(snapshot, dirty, counts) if snapshot else None
             
-            # Find tags that commonly appear with this context
-            context_tags = {}
-            for tag in tags_list:
-                if tag == context_tag or ' ' in tag:  # Skip multi-tags
-                    continue
-                tag_objs = self.tag_to_objects[tag]
-                overlap = len(tag_objs & context_objs)
-                # CRITICAL: Require high minimum overlap (50)
-                if overlap >= 50:
-                    context_tags[tag] = (tag_objs & context_objs, overlap)
+            if changed is not None and not changed:
+                candidates = store.load()
+                print(f"[PERF] Loaded {len(candidates):,} stored relation candidates in {time.time() - start_time:.2f}s")
+            elif changed is not None and len(changed) <= PERF_SETTINGS.get('candidate_max_refresh_tags', 500):
+                try:
+                    refreshed = self._mine_candidates(changed, progress)
+                except BaseException:
+                    with self._index_lock:
+                        self._dirty_tags |= dirty
+                    raise
+                store.replace_tags(changed, refreshed, counts, index_version, settings_key)
+                candidates = store.load()
+                print(f"[PERF] Re-mined relation candidates for {len(changed)} changed tags in "
+                      f"{time.time() - start_time:.2f}s ({len(candidates):,} stored)")
+            else:
+                try:
+                    candidates = self._mine_candidates(progress=progress)
+                except BaseException:
+                    with self._index_lock:
+                        self._dirty_tags |= dirty
+                    raise
+                store.replace_all(candidates, counts, index_version, settings_key)
+                print(f"[PERF] Mined and stored {len(candidates):,} relation candidates in "
+                      f"{time.time() - start_time:.2f}s")
             
-            # Look for pairs that don't co-occur within this context
-            for tag1, (tag1_ctx_objs, tag1_overlap) in context_tags.items():
-                if force_tag and tag1 != force_tag and context_tag != force_tag:
-                    continue
-                    
-                for tag2, (tag2_ctx_objs, tag2_overlap) in context_tags.items():
-                    if tag1 >= tag2:
-                        continue
-                    
-                    # Check not already related
-                    if (context_tag, tag1, tag2, "") in existing_relations or (context_tag, tag2, tag1, "") in existing_relations:
-                        continue
-                    
-                    # Check if they co-occur in this context
-                    ctx_cooccur = len(tag1_ctx_objs & tag2_ctx_objs)
-                    min_ctx_count = min(tag1_overlap, tag2_overlap)
-                    
-                    # CRITICAL: Require substantial overlap (100+)
-                    if min_ctx_count < 100:
-                        continue
-                    
-                    ctx_cooccur_rate = ctx_cooccur / min_ctx_count
-                    
-                    # They should NOT co-occur in context but should appear separately
-                    if ctx_cooccur_rate < 0.05 and tag1_overlap > 80 and tag2_overlap > 80:
-                        confidence = (1 - ctx_cooccur_rate) * min(1.0, min_ctx_count / 150) * 0.5
-                        
-                        suggestions.append({
-                            "tag1": f"{context_tag} {tag1}",
-                            "tag2": tag2,
-                            "tag1_count": tag1_overlap,
-                            "tag2_count": tag2_overlap,
-                            "relation_type": "antonym",
-                            "confidence": round(confidence * 100, 1),
-                            "context_tags": context_tag,
-                            "cooccurrence": ctx_cooccur,
-                            "calculation": f"Contextual: {ctx_cooccur}/{min_ctx_count} in '{context_tag}' context",
-                            "suggested_direction": "none"
-                        })
+            self._candidates = (settings_key, candidates)
+            return candidates
+    
+    def _changed_tags(self, snapshot, dirty=(), counts=None):
+        """
+        Mined tags (in a band for the snapshot or the current counts) whose
+        count moved by more than the tolerance, or that are dirty, plus
+        tags that entered or left a mined band. Tags mined in neither have
+        no candidates, so their churn never forces a re-mine. counts: the
+        current counts (a copy taken under the lock; tag_counts by default).
+        """
+        from config import PERF_SETTINGS
+        tolerance = PERF_SETTINGS.get('candidate_count_tolerance', 0.05)
+        min_delta = PERF_SETTINGS.get('candidate_min_count_delta', 5)
+        counts = self.tag_counts if counts is None else counts
+        
+        previous = {t: snapshot.get(t, 0) for t in self._tags}
+        previous.update((t, c) for t, c in snapshot.items() if t not in previous)
+        changed, mined = set(), set()
+        for now, then in zip(self._candidate_scope(counts), self._candidate_scope(previous)):
+            changed.update(now ^ then)
+            mined.update(now, then)
+        
+        for t in mined:
+            old = snapshot.get(t, 0)
+            if abs(counts.get(t, 0) - old) > max(old * tolerance, min_delta):
+                changed.add(t)
+        changed.update(mined.intersection(dirty))
+        return changed
+    
+    def _candidate_scope(self, counts):
+        """Tag sets mined for the given counts: synonym band, antonym band, contextual candidates and contexts"""
+        from config import PERF_SETTINGS
+        
+        tags = list(counts.keys())
+        values = np.array([counts[t] for t in tags], dtype=np.int64)
+        single = np.array([' ' not in t for t in tags], dtype=bool)
+        ratio = PERF_SETTINGS.get('sparse_band_max_ratio')
+        
+        synonym_band = frequency_band(values, single, max(PERF_SETTINGS.get('min_tag_frequency_synonym', 10), 10),
+                                      ratio, self.total_objects)
+        antonym_band = frequency_band(values, single, max(PERF_SETTINGS.get('min_tag_frequency_antonym', 50), 50),
+                                      ratio, self.total_objects)[:PERF_SETTINGS.get('sparse_max_antonym_tags', 5000)]
+        top = np.argsort(-values, kind="stable")[:1000]
+        contextual = [tags[i] for i in top if single[i]]
+        contexts = [t for t in contextual
+                    if counts[t] >= PERF_SETTINGS.get('contextual_min_context_count', 1000)]
+        contexts = contexts[:PERF_SETTINGS.get('contextual_max_contexts', 50)]
+        return ({tags[i] for i in synonym_band}, {tags[i] for i in antonym_band}, set(contextual), set(contexts))
+    
+    def _mine_candidates(self, tags=None, progress=None):
+        """
+        Synonym, antonym and contextual-antonym candidates from the sparse
+        engine, unfiltered by confirmed / unrelated pairs. With tags, only
+        pairs involving those tags are mined.
+        """
+        from config import PERF_SETTINGS
+        
+        progress = progress or MiningProgress()
+        engine = self._cooccurrence_engine()
+        ratio = PERF_SETTINGS.get('sparse_band_max_ratio')
+        synonym_band = engine.band(max(PERF_SETTINGS.get('min_tag_frequency_synonym', 10), 10), ratio)
+        antonym_band = engine.band(max(PERF_SETTINGS.get('min_tag_frequency_antonym', 50), 50), ratio,
+                                   limit=PERF_SETTINGS.get('sparse_max_antonym_tags', 5000))
+        # A full run always re-validates the contexts against the current index and settings
+        contexts = self._tag_contexts(rebuild=tags is None)
+        
+        if tags is None:
+            synonyms = engine.synonym_pairs(synonym_band)
+            progress.span(0.0, 0.2, "synonyms")(1.0, synonyms)
+            antonyms = engine.antonym_pairs(antonym_band, contexts=contexts,
+                                            progress=progress.span(0.2, 0.8, "antonyms"))
+            return synonyms + antonyms + self._find_contextual_antonyms(
+                self._top_tags(1000), set(), progress=progress.span(0.8, 1.0, "contextual antonyms"))
+        
+        ids = sorted({self._tag_ids[t] for t in tags if t in self._tag_ids})
+        candidates = []
+        step = progress.span(0.0, 0.8, "changed tags")
+        for n, tag_id in enumerate(ids):
+            found = (engine.synonym_pairs(synonym_band, force_id=tag_id) +
+                     engine.antonym_pairs(antonym_band, contexts=contexts, force_id=tag_id))
+            candidates.extend(found)
+            step((n + 1) / len(ids), found)
+        if ids:
+            candidates.extend(self._find_contextual_antonyms(self._top_tags(1000), set(), changed_ids=set(ids),
+                                                             progress=progress.span(0.8, 1.0, "contextual antonyms")))
+        
+        # A pair of two changed tags is mined from both sides
+        unique = {}
+        for s in candidates:
+            unique.setdefault(self._make_suggestion_key(s), s)
+        return list(unique.values())
+    
+    def _map_pairs(self, kind, pairs, num_workers, tag_contexts=None, progress=None):
+        """
+        Score (tag1, tag2) pairs on the persistent worker pool.
+        kind: 'synonym', 'antonym' or 'antonym_fast'. Results keep pair order.
+        A cancelled run (progress) terminates the workers; the pool restarts on next use.
+        """
+        if not pairs:
+            return []
+        progress = progress or MiningProgress()
+        
+        ids = self._tag_ids
+        id_pairs = [(ids[tag1], ids[tag2]) for tag1, tag2 in pairs]
+        chunk_size = max(10, len(id_pairs) // (num_workers * 4))
+        tasks = [(kind, id_pairs[i:i + chunk_size]) for i in range(0, len(id_pairs), chunk_size)]
+        
+        # Contexts are part of the worker state; a rebuilt context map restarts the pool
+        contexts = tag_contexts or getattr(self, '_tag_contexts_cache', None)
+        with _worker_pool.running:
+            pool = _worker_pool.get(
+                key=(id(self), id(self.tag_to_objects), id(contexts), self.index_version),
+                make_state=lambda: {
+                    "tags": self._tags,
+                    "tag_counts": self.tag_counts,
+                    "tag_to_objects": self.tag_to_objects,
+                    "tag_contexts": contexts or {},
+                    "total_objects": self.total_objects,
+                },
+                num_workers=num_workers,
+            )
+            
+            results = []
+            try:
+                for n, chunk_results in enumerate(pool.imap(_score_pair_chunk, tasks)):
+                    results.extend(chunk_results)
+                    progress((n + 1) / len(tasks), [r for r in chunk_results if r is not None])
+            except CancelledError:
+                print(f"[PERF] Cancelled {kind} scoring, stopping relation workers")
+                _worker_pool.shutdown()
+                raise
+        return results
+    
+    def _find_contextual_antonyms(self, tags_list, existing_relations, force_tag=None, changed_ids=None,
+                                  progress=None):
+        """
+        Find pairs that are antonyms only in specific contexts - ONLY for very common tags.
+        Each context is one sparse product over the candidate tags restricted
+        to the context's objects; contexts are scored concurrently (scipy
+        releases the GIL). force_tag queries score one row per context.
+        changed_ids limits the scan to pairs involving those tag ids
+        (as either tag or as the context). progress is reported per context.
+        """
+        from config import PERF_SETTINGS
         
+        progress = progress or MiningProgress()
+        
+        single_tags = [t for t in tags_list if ' ' not in t]
+        context_candidates = [t for t in single_tags
+                              if self.tag_counts.get(t, 0) >= PERF_SETTINGS.get('contextual_min_context_count', 1000)]
+        context_candidates = context_candidates[:PERF_SETTINGS.get('contextual_max_contexts', 50)]
+        if force_tag:
+            force_tag = force_tag.lower()
+        if not context_candidates:
+            return []
+        
+        engine = self._cooccurrence_engine()
+        candidates = np.array([self._tag_ids[t] for t in single_tags], dtype=np.int64)
+        thresholds = {
+            "min_overlap": PERF_SETTINGS.get('contextual_min_overlap', 50),
+            "min_pair_count": PERF_SETTINGS.get('contextual_min_pair_count', 100),
+            "max_rate": PERF_SETTINGS.get('contextual_max_cooccur_rate', 0.05),
+        }
+        
+        force_id = self._tag_ids.get(force_tag) if force_tag else None
+        
+        def score_context(context_tag):
+            context_id = self._tag_ids[context_tag]
+            if changed_ids is None or context_id in changed_ids:
+                return engine.contextual_antonym_pairs(context_id, candidates, force_id=force_id, **thresholds)
+            rows = [engine.contextual_antonym_pairs(context_id, candidates, force_id=t, either_side=True,
+                                                    **thresholds)
+                    for t in candidates if t in changed_ids]
+            return tuple(np.concatenate(part) for part in zip(*rows)) if rows else ((np.zeros(0, dtype=np.int64),) * 5)
+        
+        start_time = time.time()
+        num_workers = 1
+        if PERF_SETTINGS.get('enable_parallel_processing', True):
+            num_workers = PERF_SETTINGS.get('num_worker_processes', None) or max(1, cpu_count() - 1)
+        if num_workers > 1 and len(context_candidates) > 1 and force_id is None and changed_ids is None:
+            executor = ThreadPoolExecutor(max_workers=min(num_workers, len(context_candidates)))
+            futures = [executor.submit(score_context, c) for c in context_candidates]
+            results = (f.result() for f in futures)
+        else:
+            executor = None
+            results = (score_context(c) for c in context_candidates)
+        
+        suggestions = []
+        try:
+            for n, (context_tag, result) in enumerate(zip(context_candidates, results)):
+                found = len(suggestions)
+                self._contextual_suggestions(context_tag, result, force_tag, existing_relations, suggestions)
+                progress((n + 1) / len(context_candidates), suggestions[found:])
+        finally:
+            if executor is not None:
+                # A cancelled run drops the contexts that have not started yet
+                executor.shutdown(wait=True, cancel_futures=True)
+        
+        print(f"[PERF] Contextual antonyms over {len(context_candidates)} contexts in "
+              f"{time.time() - start_time:.2f}s ({len(suggestions)} candidates)")
         return suggestions
     
+    def _contextual_suggestions(self, context_tag, result, force_tag, existing_relations, suggestions):
+        """Append the suggestions of one scored context to `suggestions`."""
+        ids1, ids2, cooccur, overlap1, overlap2 = result
+        for i, j, ctx_cooccur, tag1_overlap, tag2_overlap in zip(ids1.tolist(), ids2.tolist(), cooccur.tolist(),
+                                                                 overlap1.tolist(), overlap2.tolist()):
+            tag1, tag2 = self._tags[i], self._tags[j]
+            if force_tag and tag1 != force_tag and context_tag != force_tag:
+                continue
+            
+            # Confirmed contextual relations are stored as ("<context> <tag1>", tag2, context)
+            if (f"{context_tag} {tag1}", tag2, context_tag) in existing_relations:
+                continue
+            
+            min_ctx_count = min(tag1_overlap, tag2_overlap)
+            ctx_cooccur_rate = ctx_cooccur / min_ctx_count
+            confidence = (1 - ctx_cooccur_rate) * min(1.0, min_ctx_count / 150) * 0.5
+            
+            suggestions.append({
+                "tag1": f"{context_tag} {tag1}",
+                "tag2": tag2,
+                "tag1_count": tag1_overlap,
+                "tag2_count": tag2_overlap,
+                "relation_type": "antonym",
+                "confidence": round(confidence * 100, 1),
+                "context_tags": context_tag,
+                "cooccurrence": ctx_cooccur,
+                "calculation": f"Contextual: {ctx_cooccur}/{min_ctx_count} in '{context_tag}' context",
+                "suggested_direction": "none"
+            })
+    
+    def _tag_contexts(self, rebuild=False):
+        """
+        TagContexts for the current index: rebuilt (or reloaded from
+        TAG_CONTEXT_CACHE, whose fingerprint covers added / removed
+        objects) once index_version has moved, or on rebuild.
+        """
+        cached = getattr(self, '_tag_contexts_cache', None)
+        if rebuild or cached is None or getattr(self, '_tag_contexts_version', None) != self.index_version:
+            version = self.index_version
+            cached = self._tag_contexts_cache = self._build_tag_contexts()
+            self._tag_contexts_version = version
+        return cached
+    
     def _build_tag_contexts(self):
-        """Build a map of tag -> commonly co-occurring tags - FULL PRECISION"""
+        """
+        Build tag -> co-occurring tag counts as a CSR matrix (TagContexts).
+        Objects with fewer than min_tags_per_object tags are skipped when
+        skip_sparse_objects is set. Reused from TAG_CONTEXT_CACHE when it
+        was built from the same index and settings.
+        """
         from config import PERF_SETTINGS
         
-        print("[PERF] Building tag contexts (full precision)...")
         start_time = time.time()
+        engine = self._cooccurrence_engine()
+        min_tags = PERF_SETTINGS.get('min_tags_per_object', 3) if PERF_SETTINGS.get('skip_sparse_objects', True) else 0
+        minhash_error = PERF_SETTINGS.get('context_minhash_error', 0.1)
+        min_freq = PERF_SETTINGS.get('min_tag_frequency_antonym', 50)
+        fingerprint = engine.fingerprint(min_tags, minhash_error, min_freq if minhash_error else None)
         
-        tag_contexts = defaultdict(lambda: defaultdict(int))
+        contexts = TagContexts.load(TAG_CONTEXT_CACHE, fingerprint, self._tag_ids)
+        if contexts is not None:
+            print(f"[PERF] Loaded tag contexts from cache in {time.time() - start_time:.2f}s")
+            return contexts
         
-        # Build reverse mapping with optional sparse object filtering
-        obj_to_tags = defaultdict(set)
-        min_tags = PERF_SETTINGS.get('min_tags_per_object', 3) if PERF_SETTINGS.get('skip_sparse_objects', True) else 0
+        print("[PERF] Building tag contexts (full precision)...")
+        matrix = engine.context_matrix(min_tags)
         
-        processed_objects = 0
-        skipped_objects = 0
-        
-        for tag, obj_set in self.tag_to_objects.items():
-            for obj_idx in obj_set:
-                obj_to_tags[obj_idx].add(tag)
-        
-        # Filter sparse objects if enabled
-        if min_tags > 0:
-            filtered_obj_to_tags = {obj_idx: tags for obj_idx, tags in obj_to_tags.items() 
-                                   if len(tags) >= min_tags}
-            skipped_objects = len(obj_to_tags) - len(filtered_obj_to_tags)
-            obj_to_tags = filtered_obj_to_tags
-        
-        # Count co-occurrences - ALL objects (no sampling)
-        for obj_idx, tags in obj_to_tags.items():
-            tags_list = list(tags)
-            for i, tag1 in enumerate(tags_list):
-                for tag2 in tags_list[i+1:]:
-                    tag_contexts[tag1][tag2] += 1
-                    tag_contexts[tag2][tag1] += 1
-            processed_objects += 1
-            
-            # Progress indicator for large datasets
-            if processed_objects % 10000 == 0:
-                print(f"[PERF] Processed {processed_objects:,} objects...")
+        # Signatures only for tags frequent enough to be antonym candidates
+        minhash = None
+        if minhash_error:
+            minhash = MinHashSignatures.build(matrix, minhash_error, rows=engine.counts >= min_freq)
+        contexts = TagContexts(matrix, self._tag_ids, minhash)
         
         elapsed = time.time() - start_time
-        print(f"[PERF] Tag contexts built in {elapsed:.2f}s ({processed_objects:,} objects processed, {skipped_objects:,} skipped)")
+        print(f"[PERF] Tag contexts built in {elapsed:.2f}s "
+              f"({contexts.matrix.nnz:,} tag pairs, min {min_tags} tags per object)")
         
-        return tag_contexts
+        if TAG_CONTEXT_CACHE:
+            contexts.save(TAG_CONTEXT_CACHE, fingerprint)
+        return contexts
     
     def _calculate_context_similarity(self, tag1, tag2, tag_contexts):
         """Calculate how similar the contexts of two tags are"""
-        context1 = set(tag_contexts[tag1].keys())
-        context2 = set(tag_contexts[tag2].keys())
-        
-        if not context1 or not context2:
-            return 0.0
-        
-        intersection = len(context1 & context2)
-        union = len(context1 | context2)
-        
-        return intersection / union if union > 0 else 0.0
+        return tag_contexts.similarity(tag1, tag2)
+
+# =====================================================
+# WORKER-SIDE STATE
+# =====================================================
+_worker_state = None  # set once per worker process by _init_relation_worker
+
+
+def _init_relation_worker(state):
+    global _worker_state
+    _worker_state = state
+
+
+def _score_pair_chunk(task):
+    """Score a chunk of (tag id, tag id) pairs against the worker's index."""
+    kind, id_pairs = task
+    state = _worker_state
+    tags = state["tags"]
+    tag_counts = state["tag_counts"]
+    tag_to_objects = state["tag_to_objects"]
+    
+    results = []
+    for i, j in id_pairs:
+        pair = (tags[i], tags[j])
+        if kind == "synonym":
+            result = _calculate_synonym_pair(pair, tag_counts, tag_to_objects)
+        elif kind == "antonym":
+            result = _calculate_antonym_pair(pair, tag_counts, tag_to_objects,
+                                             state["tag_contexts"], state["total_objects"])
+        else:
+            result = _calculate_antonym_pair_fast(pair, tag_counts, tag_to_objects, state["total_objects"])
+        if result is not None:
+            results.append(result)
+    return results
 
 def _calculate_synonym_pair(pair, tag_counts, tag_to_objects):
     """Worker function to calculate synonym score for a single pair"""
@@ -466,21 +1039,16 @@ def _calculate_antonym_pair(pair, tag_counts, tag_to_objects, tag_contexts, tota
     cooccur_rate = cooccur / min_count if min_count > 0 else 0
     freq_ratio = min_count / max_count if max_count > 0 else 0
     
-    # Calculate context similarity
-    context1 = set(tag_contexts.get(tag1, {}).keys()) if tag1 in tag_contexts else set()
-    context2 = set(tag_contexts.get(tag2, {}).keys()) if tag2 in tag_contexts else set()
-    
-    if context1 and context2:
-        intersection = len(context1 & context2)
-        union = len(context1 | context2)
-        context_similarity = intersection / union if union > 0 else 0
-    else:
-        context_similarity = 0
-    
     # Antonym heuristic
     occurrence_weight = min(1.0, (min_count / 1000) ** 0.3)
     dataset_coverage = (tag1_count + tag2_count) / (2 * total_objects)
     
+    # Context similarity only for pairs that pass the cheap checks
+    # (MinHash-screened; exact Jaccard for pairs that may reach 0.35)
+    if cooccur_rate >= 0.08 or freq_ratio <= 0.25 or dataset_coverage <= 0.008:
+        return None
+    context_similarity = tag_contexts.similarity(tag1, tag2, threshold=0.35) if tag_contexts else 0
+    
     if (cooccur_rate < 0.08 and
         freq_ratio > 0.25 and
         context_similarity > 0.35 and
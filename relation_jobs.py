@@ -0,0 +1,205 @@
+# ==========================================
+# FILE: relation_jobs.py
+# ==========================================
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError
+
+from relation_analyzer import MiningProgress
+from task_queue import BoundedExecutor, TaskStore
+
+
+# =====================================================
+# RELATION MINING JOBS
+# =====================================================
+class RelationMiningJobs:
+    """
+    Relation suggestion queries (/suggest_relations) run as background jobs.
+
+    A job mines the full ranking of one query key (relation type, force
+    tag, settings and index / relations versions) and reports stage,
+    percent progress and the suggestions found so far. Identical queries
+    coalesce onto the running job, or onto a finished one for as long as
+    its ranking is fresh (suggestion_cache_duration).
+
+    Every request gets its own ticket on the shared job; status, results
+    and cancellation go through the ticket. Cancelling a ticket only
+    unsubscribes that requester; the job itself is cancelled when its last
+    ticket leaves, and stops at its next progress check (pair scoring on
+    the worker pool terminates the workers).
+    """
+
+    def __init__(self, analyzer, workers=2, queue_size=16, ttl_seconds=600):
+        self.analyzer = analyzer
+        self.tasks = TaskStore(ttl_seconds=ttl_seconds)
+        self.executor = BoundedExecutor(max_workers=workers, queue_size=queue_size, name="relation-job")
+        self._lock = threading.Lock()
+        self._by_key = {}     # query key -> job id
+        self._tickets = {}    # ticket -> job id
+        self._subscribers = {}  # job id -> {ticket: still subscribed}
+        self._results = {}    # job id -> ranked suggestions (completed jobs)
+        self._partial = {}    # job id -> suggestions found so far
+        self._done = {}       # job id -> threading.Event
+
+    # -------------------------------------------------
+    # Submission
+    # -------------------------------------------------
+    def submit(self, relation_type=None, force_tag=None):
+        """
+        A new ticket for the query's job, coalescing onto an existing job
+        when possible. Raises QueueFullError when no slot is free.
+        """
+        from config import PERF_SETTINGS
+        fresh_for = PERF_SETTINGS.get('suggestion_cache_duration', 30)
+
+        key = self.analyzer.query_key(relation_type, force_tag)
+        with self._lock:
+            self._prune()
+            job_id = self._by_key.get(key)
+            task = self.tasks.get(job_id) if job_id else None
+            if task is not None:
+                if task["status"] in ("pending", "running"):
+                    return self._subscribe(job_id)
+                if task["status"] == "completed" and time.time() - task["finished"] < fresh_for:
+                    return self._subscribe(job_id)
+            self._forget(key)
+
+            job_id = str(uuid.uuid4())
+            self.tasks.create(job_id, relation_type=relation_type, force_tag=force_tag, found=0)
+            self._by_key[key] = job_id
+            self._subscribers[job_id] = {}
+            self._partial[job_id] = []
+            self._done[job_id] = threading.Event()
+            try:
+                future = self.executor.submit(self._run, job_id, relation_type, force_tag)
+            except Exception:
+                self._forget(key)
+                raise
+            self.tasks.attach(job_id, future)
+            return self._subscribe(job_id)
+
+    def _subscribe(self, job_id):
+        ticket = str(uuid.uuid4())
+        self._tickets[ticket] = job_id
+        self._subscribers[job_id][ticket] = True
+        return ticket
+
+    def _prune(self):
+        """Drop the results of jobs the task store has evicted"""
+        for key, job_id in list(self._by_key.items()):
+            if self.tasks.get(job_id) is None:
+                self._forget(key)
+
+    def _forget(self, key):
+        job_id = self._by_key.pop(key, None)
+        if job_id is not None:
+            for ticket in self._subscribers.pop(job_id, ()):
+                self._tickets.pop(ticket, None)
+            self.tasks.remove(job_id)
+            self._results.pop(job_id, None)
+            self._partial.pop(job_id, None)
+            self._done.pop(job_id, None)
+
+    # -------------------------------------------------
+    # Worker
+    # -------------------------------------------------
+    def _run(self, job_id, relation_type, force_tag):
+        if not self.tasks.update(job_id, status="running", stage="mining"):
+            return
+        partial = self._partial.get(job_id, [])
+
+        def on_progress(fraction, stage, found):
+            if found:
+                partial.extend(s for s in found if relation_type is None or s['relation_type'] == relation_type)
+            self.tasks.update(job_id, stage=stage or "mining", progress=round(fraction * 100, 1),
+                              found=len(partial))
+
+        start_time = time.time()
+        try:
+            ranked = self.analyzer.ranked_suggestions(
+                relation_type, force_tag,
+                MiningProgress(on_progress, lambda: self.tasks.is_cancelled(job_id)))
+            self._results[job_id] = ranked
+            self.tasks.update(job_id, status="completed", stage="completed", progress=100,
+                              found=len(ranked), finished=time.time())
+            print(f"[PERF] Relation job {job_id} ({relation_type} {force_tag or ''}) finished in "
+                  f"{time.time() - start_time:.2f}s with {len(ranked)} suggestions")
+        except CancelledError:
+            print(f"[PERF] Relation job {job_id} cancelled after {time.time() - start_time:.2f}s")
+        except Exception as e:
+            print(f"[PERF] Relation job {job_id} failed: {e}")
+            self.tasks.update(job_id, status="error", stage="error", progress=100, error=str(e))
+        finally:
+            self._partial.pop(job_id, None)
+            done = self._done.get(job_id)
+            if done is not None:
+                done.set()
+
+    # -------------------------------------------------
+    # Reads
+    # -------------------------------------------------
+    def _task(self, ticket):
+        """
+        (job id, state) of a ticket's job, or (None, None). A ticket that
+        left an unfinished job reads as cancelled, whatever the job does.
+        """
+        with self._lock:
+            job_id = self._tickets.get(ticket)
+            subscribed = job_id is not None and self._subscribers.get(job_id, {}).get(ticket, False)
+        task = self.tasks.get(job_id) if job_id is not None else None
+        if task is None:
+            return None, None
+        if not subscribed and task["status"] in ("pending", "running"):
+            task.update(status="cancelled", stage="cancelled")
+        task["task_id"] = ticket
+        return job_id, task
+
+    def wait(self, ticket, timeout):
+        """Wait up to timeout seconds for the ticket's job to finish. Returns its state."""
+        done = self._done.get(self._tickets.get(ticket))
+        if done is not None:
+            done.wait(timeout)
+        return self._task(ticket)[1]
+
+    def result(self, ticket):
+        """Ranked suggestions of the ticket's completed job, or None"""
+        job_id = self._tickets.get(ticket)
+        return self._results.get(job_id) if job_id is not None else None
+
+    def status(self, ticket, limit=5):
+        """
+        The job's state with the best `limit` suggestions found so far
+        ("partial"). Partial suggestions are not marked as seen.
+        """
+        job_id, task = self._task(ticket)
+        if task is None:
+            return None
+        found = self._results.get(job_id)
+        if found is None:
+            found = list(self._partial.get(job_id, ()))
+        found = sorted(found, key=lambda s: s['confidence'], reverse=True)[:limit * 2]
+        task["partial"] = self.analyzer.filter_known(found)[:limit]
+        return task
+
+    def cancel(self, ticket):
+        """
+        Unsubscribe the ticket. The job is cancelled once no ticket is
+        subscribed; the mining run stops at its next progress check.
+        """
+        with self._lock:
+            job_id = self._tickets.get(ticket)
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is None:
+                return None
+            subscribers[ticket] = False
+            remaining = sum(subscribers.values())
+            if not remaining:
+                task = self.tasks.cancel(job_id)
+                done = self._done.get(job_id)
+                if done is not None and task is not None and task["status"] == "cancelled":
+                    done.set()  # a pending job never runs
+        task = self._task(ticket)[1]
+        if task is not None:
+            task["subscribers"] = remaining
+        return task
@@ -0,0 +1,292 @@
+# ==========================================
+# FILE: relation_queue.py
+# ==========================================
+import json
+import threading
+import time
+from collections import deque
+
+from database import get_db_connection
+
+
+# =====================================================
+# PRECOMPUTED RELATION SUGGESTION QUEUE
+# =====================================================
+class RelationSuggestionQueue:
+    """
+    Ranked relation suggestions per relation type, mined in the background
+    and persisted in the relations database.
+
+    Serving pops from the front of an in-memory deque. Confirming or
+    denying a pair drops it (and every other suggestion for the same two
+    tags) from all queues, so the queue stays current without re-mining.
+    Popped suggestions are remembered as served and are not queued again
+    by later rebuilds; rewind() puts served-but-unanswered ones back in
+    front. Pairs related or marked unrelated elsewhere (bulk import,
+    another worker) are dropped at pop time through analyzer.filter_known.
+    A rebuild starts in the background when a queue runs low, settings
+    change, or the index has moved since a queue was last mined in full.
+    """
+
+    TYPES = ("synonym", "antonym")
+
+    def __init__(self, analyzer, db_path, refill_below=20, max_size=5000):
+        self.analyzer = analyzer
+        self.db_path = db_path
+        self.refill_below = refill_below
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._pending = {t: deque() for t in self.TYPES}   # keys in rank order
+        self._served = {t: [] for t in self.TYPES}         # keys popped, awaiting an answer
+        self._items = {}                                   # key -> suggestion dict
+        self._by_pair = {}                                 # (tag_a, tag_b) -> set of keys
+        self._seen = set()                                 # keys ever served
+        self._resolved = set()                             # pairs answered in this process
+        self._building = set()
+        self._restart = set()                              # types to mine again once the current build ends
+        self._built_at = {}
+        self._complete = {}                                # type -> index_version of a build that queued every candidate
+
+        self._init_db()
+        self._load()
+
+    # -------------------------------------------------
+    # Keys
+    # -------------------------------------------------
+    @staticmethod
+    def _key(suggestion):
+        return (suggestion['tag1'], suggestion['tag2'], suggestion.get('context_tags') or "",
+                suggestion['relation_type'])
+
+    @staticmethod
+    def _pair(tag1, tag2):
+        return (tag1, tag2) if tag1 <= tag2 else (tag2, tag1)
+
+    def _index(self, key, suggestion):
+        self._items[key] = suggestion
+        self._by_pair.setdefault(self._pair(key[0], key[1]), set()).add(key)
+
+    def _unindex(self, key):
+        self._items.pop(key, None)
+        keys = self._by_pair.get(self._pair(key[0], key[1]))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_pair[self._pair(key[0], key[1])]
+
+    # -------------------------------------------------
+    # Persistence
+    # -------------------------------------------------
+    def _init_db(self):
+        conn = get_db_connection(self.db_path)
+        try:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS relation_suggestion_queue (
+                relation_type TEXT NOT NULL,
+                tag1 TEXT NOT NULL,
+                tag2 TEXT NOT NULL,
+                context_tags TEXT NOT NULL DEFAULT '',
+                rank INTEGER NOT NULL,
+                served INTEGER NOT NULL DEFAULT 0,
+                suggestion TEXT NOT NULL,
+                PRIMARY KEY (relation_type, tag1, tag2, context_tags)
+            )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _load(self):
+        conn = get_db_connection(self.db_path)
+        try:
+            rows = conn.execute("""
+            SELECT relation_type, served, suggestion FROM relation_suggestion_queue
+            ORDER BY relation_type, rank
+            """).fetchall()
+        finally:
+            conn.close()
+
+        for relation_type, served, payload in rows:
+            if relation_type not in self._pending:
+                continue
+            suggestion = json.loads(payload)
+            key = self._key(suggestion)
+            if served:
+                self._seen.add(key)
+                self._served[relation_type].append(key)
+            else:
+                self._pending[relation_type].append(key)
+            self._index(key, suggestion)
+
+        if rows:
+            print(f"[PERF] Loaded relation suggestion queue: " +
+                  ", ".join(f"{len(self._pending[t])} {t}" for t in self.TYPES))
+
+    def _execute(self, sql, rows):
+        conn = get_db_connection(self.db_path)
+        try:
+            conn.executemany(sql, rows)
+            conn.commit()
+        except Exception as e:
+            print(f"[PERF] Failed to update relation suggestion queue: {e}")
+        finally:
+            conn.close()
+
+    # -------------------------------------------------
+    # Serving
+    # -------------------------------------------------
+    def ready(self, relation_type):
+        return relation_type in self._built_at or bool(self._pending.get(relation_type))
+
+    def pop(self, relation_type, limit):
+        """Next `limit` unknown suggestions of relation_type, marked as served."""
+        taken, suggestions = [], []
+        while len(suggestions) < limit:
+            batch = []
+            with self._lock:
+                pending = self._pending[relation_type]
+                while pending and len(batch) < limit - len(suggestions):
+                    key = pending.popleft()
+                    if key in self._items:  # dropped keys are skipped lazily
+                        batch.append((key, dict(self._items[key])))
+            if not batch:
+                break
+            kept = self.analyzer.filter_known([s for _, s in batch])
+            kept_ids = {id(s) for s in kept}
+            for key, s in batch:
+                if id(s) in kept_ids:
+                    taken.append(key)
+                    suggestions.append(s)
+                else:
+                    self.resolve(key[0], key[1])  # answered outside this queue
+
+        with self._lock:
+            self._served[relation_type].extend(taken)
+            self._seen.update(taken)
+            # A complete queue has nothing more to mine until data or settings change
+            complete = self._complete.get(relation_type) == self.analyzer.index_version
+            low = len(self._pending[relation_type]) < self.refill_below and not complete
+
+        if taken:
+            self._execute("""
+            UPDATE relation_suggestion_queue SET served=1
+            WHERE relation_type=? AND tag1=? AND tag2=? AND context_tags=?
+            """, [(k[3], k[0], k[1], k[2]) for k in taken])
+        if low:
+            self.refresh(relation_type)
+        return suggestions
+
+    def rewind(self, relation_type):
+        """Put served suggestions that were never answered back in front."""
+        with self._lock:
+            served = [k for k in self._served[relation_type] if k in self._items]
+            self._served[relation_type] = []
+            self._pending[relation_type].extendleft(reversed(served))
+            for key in served:
+                self._seen.discard(key)
+
+        if served:
+            self._execute("""
+            UPDATE relation_suggestion_queue SET served=0
+            WHERE relation_type=? AND tag1=? AND tag2=? AND context_tags=?
+            """, [(k[3], k[0], k[1], k[2]) for k in served])
+
+    def resolve(self, tag1, tag2):
+        """A pair was confirmed or denied: drop every suggestion for it."""
+        with self._lock:
+            self._resolved.add(self._pair(tag1, tag2))
+            keys = list(self._by_pair.get(self._pair(tag1, tag2), ()))
+            for key in keys:
+                self._unindex(key)
+
+        if keys:
+            self._execute("""
+            DELETE FROM relation_suggestion_queue
+            WHERE relation_type=? AND tag1=? AND tag2=? AND context_tags=?
+            """, [(k[3], k[0], k[1], k[2]) for k in keys])
+
+    def stats(self):
+        with self._lock:
+            return {t: {
+                "pending": sum(1 for k in self._pending[t] if k in self._items),
+                "served": sum(1 for k in self._served[t] if k in self._items),
+                "building": t in self._building,
+                "built_at": self._built_at.get(t),
+            } for t in self.TYPES}
+
+    # -------------------------------------------------
+    # Background mining
+    # -------------------------------------------------
+    def refresh(self, relation_type=None, restart=False):
+        """
+        Rebuild the given queue (or all) in a background thread. With
+        restart (settings changed), a build already running is followed
+        by another one.
+        """
+        for t in ([relation_type] if relation_type else self.TYPES):
+            with self._lock:
+                if t in self._building:
+                    if restart:
+                        self._restart.add(t)
+                    continue
+                self._building.add(t)
+            threading.Thread(target=self._rebuild, args=(t,), daemon=True,
+                             name=f"relation-queue-{t}").start()
+
+    def _rebuild(self, relation_type):
+        try:
+            start_time = time.time()
+            index_version = self.analyzer.index_version
+            mined = self.analyzer.mine_suggestions(relation_type=relation_type)
+
+            with self._lock:
+                # Served suggestions keep their place; everything else is re-ranked.
+                # Pairs answered while mining ran are still in `mined`.
+                served = set(self._served[relation_type])
+                fresh = []
+                for s in mined:
+                    key = self._key(s)
+                    if key in self._seen or key in served or self._pair(key[0], key[1]) in self._resolved:
+                        continue
+                    fresh.append((key, s))
+                    if len(fresh) >= self.max_size:
+                        break
+
+                for key in self._pending[relation_type]:
+                    if key not in served:
+                        self._unindex(key)
+                self._pending[relation_type] = deque(k for k, _ in fresh)
+                for key, s in fresh:
+                    self._index(key, s)
+                self._built_at[relation_type] = time.time()
+                if len(fresh) < self.max_size:
+                    self._complete[relation_type] = index_version
+                else:
+                    self._complete.pop(relation_type, None)
+
+            conn = get_db_connection(self.db_path)
+            try:
+                conn.execute("DELETE FROM relation_suggestion_queue WHERE relation_type=? AND served=0",
+                             (relation_type,))
+                conn.executemany("""
+                INSERT OR REPLACE INTO relation_suggestion_queue
+                (relation_type, tag1, tag2, context_tags, rank, served, suggestion)
+                VALUES (?, ?, ?, ?, ?, 0, ?)
+                """, [(relation_type, k[0], k[1], k[2], rank, json.dumps(s))
+                      for rank, (k, s) in enumerate(fresh)])
+                conn.commit()
+            finally:
+                conn.close()
+
+            print(f"[PERF] Relation suggestion queue '{relation_type}' rebuilt with "
+                  f"{len(fresh)} suggestions in {time.time() - start_time:.2f}s")
+        except Exception as e:
+            print(f"[PERF] Relation suggestion queue '{relation_type}' rebuild failed: {e}")
+        finally:
+            with self._lock:
+                self._building.discard(relation_type)
+                restart = relation_type in self._restart
+                self._restart.discard(relation_type)
+            if restart:
+                self.refresh(relation_type)
@@ -0,0 +1,213 @@
+# ==========================================
+# FILE: relation_store.py
+# ==========================================
+import threading
+from datetime import datetime
+
+from database import get_db_connection
+
+
+# =====================================================
+# PERSISTED RELATION CANDIDATES
+# =====================================================
+class RelationCandidateStore:
+    """
+    Mined synonym / antonym candidates kept in the relations database so
+    they survive restarts.
+
+    Candidates are stored before filtering against confirmed / unrelated
+    pairs (that filter runs on every read), together with the index
+    version they were computed against and a snapshot of the tag counts
+    they were computed from. RelationAnalyzer compares the snapshot with
+    the live counts and re-mines only the tags that moved. Suggestions
+    already shown to the user are kept here as well.
+    """
+
+    FIELDS = ("relation_type", "tag1", "tag2", "context_tags", "confidence", "tag1_count",
+              "tag2_count", "cooccurrence", "calculation", "suggested_direction")
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        conn = get_db_connection(self.db_path)
+        try:
+            c = conn.cursor()
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS relation_candidates (
+                relation_type TEXT NOT NULL,
+                tag1 TEXT NOT NULL,
+                tag2 TEXT NOT NULL,
+                context_tags TEXT NOT NULL DEFAULT '',
+                confidence REAL,
+                tag1_count INTEGER,
+                tag2_count INTEGER,
+                cooccurrence INTEGER,
+                calculation TEXT,
+                suggested_direction TEXT,
+                base_tag1 TEXT NOT NULL,
+                base_tag2 TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                index_version TEXT,
+                computed_date TIMESTAMP,
+                PRIMARY KEY (relation_type, tag1, tag2, context_tags)
+            )
+            """)
+            c.execute("CREATE INDEX IF NOT EXISTS idx_relation_candidates_base1 ON relation_candidates(base_tag1)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_relation_candidates_base2 ON relation_candidates(base_tag2)")
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS relation_candidate_counts (
+                tag TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS relation_candidate_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+            """)
+            c.execute("""
+            CREATE TABLE IF NOT EXISTS relation_seen_suggestions (
+                tag1 TEXT NOT NULL,
+                tag2 TEXT NOT NULL,
+                context_tags TEXT NOT NULL DEFAULT '',
+                relation_type TEXT NOT NULL,
+                PRIMARY KEY (tag1, tag2, context_tags, relation_type)
+            )
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    # -------------------------------------------------
+    # Rows
+    # -------------------------------------------------
+    @staticmethod
+    def base_tags(candidate):
+        """The two plain tags of a candidate ("<context> <tag>" loses its context)."""
+        tag1 = candidate['tag1']
+        context = candidate.get('context_tags') or ""
+        if context and tag1.startswith(context + " "):
+            tag1 = tag1[len(context) + 1:]
+        return tag1, candidate['tag2']
+
+    def _row(self, candidate, rank, index_version, now):
+        values = [candidate.get(f) for f in self.FIELDS]
+        values[3] = values[3] or ""  # context_tags
+        return tuple(values) + self.base_tags(candidate) + (rank, index_version, now)
+
+    # -------------------------------------------------
+    # Reads
+    # -------------------------------------------------
+    def meta(self):
+        conn = get_db_connection(self.db_path)
+        try:
+            return dict(conn.execute("SELECT key, value FROM relation_candidate_meta").fetchall())
+        finally:
+            conn.close()
+
+    def load(self):
+        """All candidates, in stored rank order."""
+        conn = get_db_connection(self.db_path)
+        try:
+            rows = conn.execute(f"""
+            SELECT {", ".join(self.FIELDS)} FROM relation_candidates ORDER BY rank
+            """).fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(self.FIELDS, row)) for row in rows]
+
+    def counts(self):
+        conn = get_db_connection(self.db_path)
+        try:
+            return dict(conn.execute("SELECT tag, count FROM relation_candidate_counts").fetchall())
+        finally:
+            conn.close()
+
+    def seen(self):
+        conn = get_db_connection(self.db_path)
+        try:
+            return set(conn.execute(
+                "SELECT tag1, tag2, context_tags, relation_type FROM relation_seen_suggestions").fetchall())
+        finally:
+            conn.close()
+
+    # -------------------------------------------------
+    # Writes
+    # -------------------------------------------------
+    def replace_all(self, candidates, tag_counts, index_version, settings_key):
+        """Store a full mining run."""
+        now = datetime.now()
+        with self._lock:
+            conn = get_db_connection(self.db_path)
+            try:
+                c = conn.cursor()
+                c.execute("DELETE FROM relation_candidates")
+                c.execute("DELETE FROM relation_candidate_counts")
+                c.executemany(self._insert_sql(), (self._row(s, rank, index_version, now)
+                                                   for rank, s in enumerate(candidates)))
+                c.executemany("INSERT INTO relation_candidate_counts (tag, count) VALUES (?, ?)",
+                              tag_counts.items())
+                self._set_meta(c, index_version, settings_key)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def replace_tags(self, tags, candidates, tag_counts, index_version, settings_key):
+        """
+        Replace the candidates involving any of `tags` (as either tag or as
+        context) with `candidates`, and update their count snapshot.
+        """
+        now = datetime.now()
+        tags = list(tags)
+        with self._lock:
+            conn = get_db_connection(self.db_path)
+            try:
+                c = conn.cursor()
+                next_rank = (c.execute("SELECT MAX(rank) FROM relation_candidates").fetchone()[0] or 0) + 1
+                for i in range(0, len(tags), 500):
+                    chunk = tags[i:i + 500]
+                    marks = ",".join("?" * len(chunk))
+                    c.execute(f"""
+                    DELETE FROM relation_candidates
+                    WHERE base_tag1 IN ({marks}) OR base_tag2 IN ({marks}) OR context_tags IN ({marks})
+                    """, chunk * 3)
+                    c.execute(f"DELETE FROM relation_candidate_counts WHERE tag IN ({marks})", chunk)
+                c.executemany(self._insert_sql(), (self._row(s, next_rank + i, index_version, now)
+                                                   for i, s in enumerate(candidates)))
+                c.executemany("INSERT INTO relation_candidate_counts (tag, count) VALUES (?, ?)",
+                              ((t, tag_counts[t]) for t in tags if t in tag_counts))
+                self._set_meta(c, index_version, settings_key)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def add_seen(self, keys):
+        if not keys:
+            return
+        conn = get_db_connection(self.db_path)
+        try:
+            conn.executemany("""
+            INSERT OR IGNORE INTO relation_seen_suggestions (tag1, tag2, context_tags, relation_type)
+            VALUES (?, ?, ?, ?)
+            """, [(k[0], k[1], k[2] or "", k[3]) for k in keys])
+            conn.commit()
+        except Exception as e:
+            print(f"[PERF] Failed to persist seen suggestions: {e}")
+        finally:
+            conn.close()
+
+    def _insert_sql(self):
+        return f"""
+        INSERT OR REPLACE INTO relation_candidates
+        ({", ".join(self.FIELDS)}, base_tag1, base_tag2, rank, index_version, computed_date)
+        VALUES ({", ".join("?" * (len(self.FIELDS) + 5))})
+        """
+
+    @staticmethod
+    def _set_meta(c, index_version, settings_key):
+        c.executemany("INSERT OR REPLACE INTO relation_candidate_meta (key, value) VALUES (?, ?)",
+                      [("index_version", index_version), ("settings", settings_key)])
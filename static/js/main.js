@@ -225,31 +225,74 @@ function initDragDrop() {
         handleFiles(e.dataTransfer.files); 
     });
 
+    const IMAGE_EXTS = ['png', 'jpg', 'jpeg', 'gif', 'bmp'];
+
+    function fileExt(file) {
+        return file.name.split('.').pop().toLowerCase();
+    }
+
     function handleFiles(files) {
         files = Array.from(files);
         if (files.length === 0) return;
 
+        // Images are tagged server-side in one streaming request
+        const imageFiles = files.filter(f => IMAGE_EXTS.includes(fileExt(f)));
+        files = files.filter(f => !IMAGE_EXTS.includes(fileExt(f)));
+        const totalFiles = files.length + imageFiles.length;
+
         progressContainer.style.display = "block";
         let processed = 0;
 
         function updateProgress() {
-            let pct = Math.round((processed / files.length) * 100);
+            let pct = Math.round((processed / totalFiles) * 100);
             progressBar.style.width = pct + "%";
             progressBar.innerText = pct + "%";
         }
 
+        function finish() {
+            progressBar.style.width = "100%";
+            progressBar.innerText = "Done!";
+            setTimeout(() => {
+                progressContainer.style.display = "none";
+            }, 1200);
+        }
+
+        function addImageTags(tags) {
+            const tagsEl = document.getElementById("tags");
+            let existing = tagsEl.value.split(/\s+/).filter(t => t.trim().length > 0);
+            let combined = Array.from(new Set([...existing, ...tags]));
+            tagsEl.value = combined.join(" ") + " ";
+        }
+
+        function tagImages() {
+            streamBulkImageTags(imageFiles, result => {
+                if (result.done) return;
+                if (result.tags && result.tags.length > 0) {
+                    addImageTags(result.tags);
+                }
+                processed++;
+                updateProgress();
+            })
+            .catch(err => console.error("Bulk image tagging failed:", err))
+            .finally(() => {
+                currentOffset = 0;
+                fetchSuggestions(false);
+                finish();
+            });
+        }
+
         function next() {
             if (files.length === 0) {
-                progressBar.style.width = "100%";
-                progressBar.innerText = "Done!";
-                setTimeout(() => {
-                    progressContainer.style.display = "none";
-                }, 1200);
+                if (imageFiles.length > 0) {
+                    tagImages();
+                } else {
+                    finish();
+                }
                 return;
             }
 
             let file = files.shift();
-            const ext = file.name.split('.').pop().toLowerCase();
+            const ext = fileExt(file);
             const reader = new FileReader();
 
             reader.onload = event => {
@@ -306,44 +349,14 @@ function initDragDrop() {
                             return;
                         }
                     }
-                    processed++;
-                    updateProgress();
-                    next();
-                }
-                else if (['png', 'jpg', 'jpeg', 'gif', 'bmp'].includes(ext)) {
-                    const formData = new FormData();
-                    formData.append("image", file);
-
-                    fetch("/suggest_from_image", {
-                        method: "POST",
-                        body: formData
-                    })
-                    .then(r => r.json())
-                    .then(data => {
-                        if (data.tags && data.tags.length > 0) {
-                            let existing = tagsInputEl.value.split(/\s+/).filter(t => t.trim().length > 0);
-                            let combined = Array.from(new Set([...existing, ...data.tags]));
-                            tagsInputEl.value = combined.join(" ") + " ";
-                            handleTagsUpdated();
-                            fetchSuggestions();
-                        }
-                    })
-                    .finally(() => {
-                        processed++;
-                        updateProgress();
-                        next();
-                    });
-                } else {
-                    processed++;
-                    updateProgress();
-                    next();
                 }
+                processed++;
+                updateProgress();
+                next();
             };
 
             if (['json', 'xmp'].includes(ext)) {
                 reader.readAsText(file);
-            } else if (['png', 'jpg', 'jpeg', 'gif', 'bmp'].includes(ext)) {
-                reader.readAsArrayBuffer(file);
             } else {
                 processed++;
                 updateProgress();
@@ -355,6 +368,41 @@ function initDragDrop() {
     }
 }
 
+// Send images to /bulk_tag_images and call onResult for each NDJSON line as it arrives
+function streamBulkImageTags(files, onResult) {
+    const formData = new FormData();
+    files.forEach(file => formData.append("images", file));
+
+    return fetch("/bulk_tag_images", {
+        method: "POST",
+        body: formData
+    })
+    .then(async response => {
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+
+        while (true) {
+            const {done, value} = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, {stream: true});
+            let lines = buffer.split("\n");
+            buffer = lines.pop();
+            lines.filter(line => line.trim().length > 0)
+                 .forEach(line => onResult(JSON.parse(line)));
+        }
+
+        if (buffer.trim().length > 0) {
+            onResult(JSON.parse(buffer));
+        }
+    });
+}
+
 /* =========================
    FLIP animation utilities
    =========================
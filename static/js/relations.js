@@ -20,10 +20,57 @@ let processedSuggestions = new Set();
 
 let relationsCache = null;
 let relationsCacheTime = 0;
+let relationsCursor = null; // keyset position of the page shown, sent with the next page request
 const CACHE_DURATION = 5000; // 5 seconds
 
 console.log('[RELATIONS.JS] Script loaded');
 
+const JOB_POLL_INTERVAL = 500; // ms between relation job status polls
+
+// Fetch suggestions; long queries answer 202 with a mining job that is polled until done
+function fetchSuggestions(url, onProgress) {
+    return fetch(url)
+    .then(r => r.json().then(data => ({ status: r.status, data })))
+    .then(({ status, data }) => {
+        if (status === 202) return waitForRelationJob(data.task_id, onProgress).then(() => fetchSuggestions(url, onProgress));
+        if (status !== 200) throw new Error(data.error || `Request failed (${status})`);
+        return data;
+    });
+}
+
+function waitForRelationJob(jobId, onProgress) {
+    return new Promise((resolve, reject) => {
+        const poll = () => {
+            fetch(`/relation_job_status/${jobId}?limit=${SUGGESTION_LIMIT}`)
+            .then(r => r.json())
+            .then(job => {
+                if (onProgress) onProgress(job);
+                if (job.status === 'completed') resolve(job);
+                else if (job.status === 'cancelled') reject(new Error('Cancelled'));
+                else if (job.status === 'error' || job.error) reject(new Error(job.error || 'Mining failed'));
+                else setTimeout(poll, JOB_POLL_INTERVAL);
+            })
+            .catch(reject);
+        };
+        poll();
+    });
+}
+
+function cancelRelationJob(jobId) {
+    fetch(`/cancel_relation_job/${jobId}`, { method: 'POST' })
+    .then(r => r.json())
+    .then(job => console.log(`[SUGGESTIONS] Job ${jobId} ${job.status}`));
+}
+
+function renderJobProgress(container, job) {
+    if (job.status !== 'pending' && job.status !== 'running') return;
+    container.innerHTML = `
+        <div class="loading-spinner">
+            Mining suggestions: ${Math.round(job.progress)}% (${job.stage}, ${job.found || 0} found)
+            <button class="deny-btn" onclick="cancelRelationJob('${job.task_id}')">Cancel</button>
+        </div>`;
+}
+
 // Load dynamic suggestions with preloading
 function loadDynamicSuggestions(type = 'both') {
     console.log(`[SUGGESTIONS] Manual load triggered for: ${type}`);
@@ -54,8 +101,9 @@ function loadSuggestionType(type, offset) {
     
     updateLoadMoreButton(type, -1); // Hide during load
     
-    fetch(url)
-    .then(r => r.json())
+    fetchSuggestions(url, job => {
+        if (offset === 0) renderJobProgress(container, job);
+    })
     .then(data => {
         if (data.length === 0 && offset === 0) {
             container.innerHTML = "<em>No suggestions available at this time.</em>";
@@ -84,6 +132,10 @@ function loadSuggestionType(type, offset) {
             document.getElementById(`load_more_${type}`).style.display = 'none';
         }
     })
+    .catch(err => {
+        console.error(`[SUGGESTIONS] ${type} suggestions failed:`, err);
+        if (offset === 0) container.innerHTML = `<em>${err.message}</em>`;
+    })
     .finally(() => {
         if (type === 'synonym') isLoadingSynonyms = false;
         else isLoadingAntonyms = false;
@@ -94,15 +146,16 @@ function preloadNextSuggestions(type, offset) {
     const forceTag = document.getElementById(`force_tag_${type}`).value.trim();
     const url = `/suggest_relations?limit=${SUGGESTION_LIMIT}&offset=${offset}&type=${type}${forceTag ? '&force_tag=' + encodeURIComponent(forceTag) : ''}`;
     
-    fetch(url)
-    .then(r => r.json())
+    fetchSuggestions(url)
     .then(data => {
-        if (type === 'synonym') {
-            preloadedSynonyms = data;
-        } else {
-            preloadedAntonyms = data;
-        }
-    });
+        // Queued suggestions are handed out once: keep what is already buffered
+        const buffer = type === 'synonym' ? preloadedSynonyms : preloadedAntonyms;
+        const buffered = new Set(buffer.map(s => `${s.tag1}|${s.tag2}|${s.context_tags || ''}`));
+        data.forEach(s => {
+            if (!buffered.has(`${s.tag1}|${s.tag2}|${s.context_tags || ''}`)) buffer.push(s);
+        });
+    })
+    .catch(err => console.error(`[SUGGESTIONS] Preloading ${type} failed:`, err));
 }
 
 function createSuggestionCard(suggestion) {
@@ -476,9 +529,12 @@ function replaceSuggestionCard(oldCard, type) {
         const newCard = createSuggestionCard(preloaded);
         container.replaceChild(newCard, oldCard);
         
-        // Preload another
+        // Top up the buffer once it runs low
         const offset = type === 'synonym' ? synonymOffset : antonymOffset;
-        preloadNextSuggestions(type, offset + SUGGESTION_LIMIT + (type === 'synonym' ? preloadedSynonyms.length : preloadedAntonyms.length));
+        const buffered = type === 'synonym' ? preloadedSynonyms.length : preloadedAntonyms.length;
+        if (buffered < SUGGESTION_LIMIT) {
+            preloadNextSuggestions(type, offset + SUGGESTION_LIMIT + buffered);
+        }
     } else {
         // Show loading card
         const loadingCard = createLoadingCard();
@@ -488,8 +544,7 @@ function replaceSuggestionCard(oldCard, type) {
         const offset = type === 'synonym' ? synonymOffset : antonymOffset;
         const currentCount = container.querySelectorAll('.suggestion-card:not(.loading)').length;
         
-        fetch(`/suggest_relations?limit=1&offset=${offset + currentCount}&type=${type}`)
-        .then(r => r.json())
+        fetchSuggestions(`/suggest_relations?limit=1&offset=${offset + currentCount}&type=${type}`)
         .then(data => {
             if (data.length > 0) {
                 const newCard = createSuggestionCard(data[0]);
@@ -497,7 +552,8 @@ function replaceSuggestionCard(oldCard, type) {
             } else {
                 loadingCard.remove();
             }
-        });
+        })
+        .catch(() => loadingCard.remove());
     }
 }
 
@@ -519,7 +575,7 @@ function denyRelation(suggestion, cardElement) {
 function loadConfirmedRelations(page = 1, forceReload = false) {
     isUpdatingRelations = true;
     currentPage = page;
-    const url = `/list_relations?page=${page}&page_size=${PAGE_SIZE}&search=${encodeURIComponent(currentSearch)}&sort_by=${currentSortBy}${currentFilterType ? '&filter_type=' + currentFilterType : ''}`;
+    const url = `/list_relations?page=${page}&page_size=${PAGE_SIZE}&search=${encodeURIComponent(currentSearch)}&sort_by=${currentSortBy}${currentFilterType ? '&filter_type=' + currentFilterType : ''}${relationsCursor && page > 1 ? '&cursor=' + encodeURIComponent(relationsCursor) : ''}`;
     
     // Use cache if available and fresh
     const now = Date.now();
@@ -534,6 +590,7 @@ function loadConfirmedRelations(page = 1, forceReload = false) {
     .then(data => {
         relationsCache = data;
         relationsCacheTime = Date.now();
+        relationsCursor = data.cursor;
         renderRelations(data);
     })
     .catch(err => console.error('Error loading relations:', err))
@@ -1328,7 +1385,7 @@ async function loadPerformanceSettings() {
 function loadConfirmedRelations(page = 1, forceReload = false) {
     isUpdatingRelations = true;
     currentPage = page;
-    const url = `/list_relations?page=${page}&page_size=${PAGE_SIZE}&search=${encodeURIComponent(currentSearch)}&sort_by=${currentSortBy}${currentFilterType ? '&filter_type=' + currentFilterType : ''}`;
+    const url = `/list_relations?page=${page}&page_size=${PAGE_SIZE}&search=${encodeURIComponent(currentSearch)}&sort_by=${currentSortBy}${currentFilterType ? '&filter_type=' + currentFilterType : ''}${relationsCursor && page > 1 ? '&cursor=' + encodeURIComponent(relationsCursor) : ''}`;
     
     console.log(`[RELATIONS] Loading confirmed relations page ${page}...`);
     
@@ -1357,6 +1414,7 @@ function loadConfirmedRelations(page = 1, forceReload = false) {
         console.log(`[RELATIONS] Loaded ${data.relations.length} relations`);
         relationsCache = data;
         relationsCacheTime = Date.now();
+        relationsCursor = data.cursor;
         renderRelations(data);
     })
     .catch(err => {
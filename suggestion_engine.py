@@ -3,6 +3,7 @@
 # FILE: suggestion_engine.py
 # ==========================================
 import math
+import threading
 from collections import Counter
 from config import (ALPHA, BETA, GAMMA, MIN_TAG_OCCURRENCES, 
                    STRONG_CORRELATION_THRESHOLD, SYNONYM_BOOST_SCORE, 
@@ -10,15 +11,56 @@ from config import (ALPHA, BETA, GAMMA, MIN_TAG_OCCURRENCES,
 from database import get_confirmed_synonyms, get_confirmed_antonyms
 
 class SuggestionEngine:
-    def __init__(self, tag_lists, tag_counts, tag_to_objects, total_objects):
+    def __init__(self, tag_lists, tag_counts, tag_to_objects, total_objects, lock=None):
         self.tag_lists = tag_lists
         self.tag_counts = tag_counts
         self.tag_to_objects = tag_to_objects
         self.total_objects = total_objects
-        self.tag_rarity = {
-            tag: math.log((total_objects + 1)/(count + 1)) 
-            for tag, count in tag_counts.items()
-        }
+        # Object updates vs. reads of the posting sets; shared with
+        # RelationAnalyzer, which reads the same tag_counts / tag_to_objects.
+        # Scoring holds it only to copy one candidate's postings at a time.
+        self.lock = lock or threading.RLock()
+    
+    def tag_rarity(self, tag):
+        """log((N + 1) / (count + 1)) for current counts; 0 for unknown tags"""
+        count = self.tag_counts.get(tag)
+        if count is None:
+            return 0
+        return math.log((self.total_objects + 1)/(count + 1))
+    
+    # -------------------------------------------------
+    # Object updates
+    # -------------------------------------------------
+    def add_object(self, tags):
+        """Append an object to the index. Returns its row in tag_lists."""
+        with self.lock:
+            row = len(self.tag_lists)
+            self.tag_lists.append(list(tags))
+            for tag, n in Counter(tags).items():
+                self.tag_counts[tag] = self.tag_counts.get(tag, 0) + n
+                self.tag_to_objects.setdefault(tag, set()).add(row)
+            self.total_objects += 1
+            return row
+    
+    def remove_object(self, row):
+        """
+        Drop the object at `row` (the row stays, empty). Tags whose count
+        reaches 0 leave the index. Returns the object's tags.
+        """
+        with self.lock:
+            tags, self.tag_lists[row] = self.tag_lists[row], []
+            for tag, n in Counter(tags).items():
+                count = self.tag_counts.get(tag, 0) - n
+                objects = self.tag_to_objects.get(tag)
+                if objects is not None:
+                    objects.discard(row)
+                if count > 0:
+                    self.tag_counts[tag] = count
+                else:
+                    self.tag_counts.pop(tag, None)
+                    self.tag_to_objects.pop(tag, None)
+            self.total_objects -= 1
+            return tags
     
     def is_antonym_pair(self, candidate, input_tags, confirmed_antonyms):
         """Check if candidate is an antonym of any input tag"""
@@ -37,6 +79,87 @@ class SuggestionEngine:
                         return True
         return False
     
+    def _postings(self, tags):
+        """Copies of the tags' object sets, taken under the lock"""
+        with self.lock:
+            return {t: set(self.tag_to_objects.get(t, ())) for t in tags}
+    
+    def _score_candidate(self, candidate, input_tags, synonym_boost_tags, confirmed_antonyms, input_postings):
+        """
+        Score one candidate against the input tags. Returns None if filtered out.
+        input_postings: _postings(input_tags), copied once per request.
+        """
+        # HARD FILTER: Skip confirmed antonyms
+        if self.is_antonym_pair(candidate, input_tags, confirmed_antonyms):
+            return None
+        
+        # Skip very rare tags (< MIN_TAG_OCCURRENCES) unless they're synonyms
+        candidate_count = self.tag_counts.get(candidate, 0)
+        if candidate_count < MIN_TAG_OCCURRENCES and candidate not in synonym_boost_tags:
+            return None
+        
+        candidate_objects = self._postings([candidate])[candidate]
+        cooccurrence_score = 0
+        for obj_idx in candidate_objects:
+            obj_tags = set(self.tag_lists[obj_idx])
+            cooccurrence_score += len(obj_tags & set(input_tags))
+        
+        rarity_score = self.tag_rarity(candidate)
+        
+        # Enhanced contradiction penalty
+        contradiction_penalty = 0.0
+        for t in input_tags:
+            input_objects = input_postings.get(t, set())
+            
+            if not input_objects or not candidate_objects:
+                continue
+            
+            cooccur_count = len(candidate_objects & input_objects)
+            rate = cooccur_count / max(1, len(input_objects))
+            
+            # Reduced penalty for rare tags
+            if candidate_count >= 50:
+                contradiction_penalty += 1 - rate
+            else:
+                contradiction_penalty += (1 - rate) * (candidate_count / 50)
+        
+        cooccurrence_norm = cooccurrence_score / max(1, len(input_tags))
+        rarity_boosted = rarity_score * (1 + math.log1p(rarity_score))
+        
+        # Check for strong correlation (99%+ co-occurrence)
+        strongly_correlated = False
+        max_correlation = 0.0
+        for t in input_tags:
+            t_objs = input_postings.get(t, set())
+            if t_objs:
+                cooccur_ratio = len(candidate_objects & t_objs) / len(t_objs)
+                max_correlation = max(max_correlation, cooccur_ratio)
+                if cooccur_ratio >= STRONG_CORRELATION_THRESHOLD:
+                    strongly_correlated = True
+                    break
+        
+        # Base score
+        score = ALPHA * cooccurrence_norm + BETA * rarity_boosted - GAMMA * contradiction_penalty
+        
+        # Massive boost for strong correlation (likely synonyms)
+        if strongly_correlated:
+            score = STRONG_CORRELATION_BOOST + max_correlation
+        
+        # Even bigger boost for confirmed synonyms
+        if candidate in synonym_boost_tags:
+            score = SYNONYM_BOOST_SCORE
+        
+        return {
+            "tag": candidate,
+            "score": round(score, 4),
+            "probability": round(score, 4),
+            "similarity": 0.0,
+            "rarity": round(rarity_boosted, 4),
+            "cooccurrence": round(cooccurrence_norm, 4),
+            "penalty": round(contradiction_penalty, 4),
+            "is_synonym": candidate in synonym_boost_tags
+        }
+    
     def calculate_suggestions(self, input_tags, top_n=10, offset=0):
         """Calculate tag suggestions based on input tags"""
         if not input_tags:
@@ -46,12 +169,15 @@ class SuggestionEngine:
         confirmed_synonyms = get_confirmed_synonyms()
         confirmed_antonyms = get_confirmed_antonyms()
         
-        # Ignore incomplete last tag
-        last_tag = input_tags[-1]
-        if last_tag not in self.tag_to_objects or len(self.tag_to_objects[last_tag]) == 0:
-            input_tags = input_tags[:-1]
+        with self.lock:
+            # Ignore incomplete last tag
+            last_tag = input_tags[-1]
+            if not self.tag_to_objects.get(last_tag):
+                input_tags = input_tags[:-1]
+            candidate_tags = set(self.tag_counts.keys()) - set(input_tags)
+            matched_documents = self.total_objects
+        input_postings = self._postings(input_tags)
         
-        candidate_tags = set(self.tag_counts.keys()) - set(input_tags)
         suggestions = []
         synonym_boost_tags = []
         
@@ -63,83 +189,91 @@ class SuggestionEngine:
                         synonym_boost_tags.append(syn)
         
         for candidate in candidate_tags:
-            # HARD FILTER: Skip confirmed antonyms
-            if self.is_antonym_pair(candidate, input_tags, confirmed_antonyms):
-                continue
-            
-            # Skip very rare tags (< MIN_TAG_OCCURRENCES) unless they're synonyms
-            candidate_count = self.tag_counts.get(candidate, 0)
-            if candidate_count < MIN_TAG_OCCURRENCES and candidate not in synonym_boost_tags:
-                continue
-            
-            cooccurrence_score = 0
-            for obj_idx in self.tag_to_objects.get(candidate, set()):
-                obj_tags = set(self.tag_lists[obj_idx])
-                cooccurrence_score += len(obj_tags & set(input_tags))
-            
-            rarity_score = self.tag_rarity.get(candidate, 0)
-            
-            # Enhanced contradiction penalty
-            contradiction_penalty = 0.0
-            for t in input_tags:
-                candidate_objects = self.tag_to_objects.get(candidate, set())
-                input_objects = self.tag_to_objects.get(t, set())
-                
-                if not input_objects or not candidate_objects:
-                    continue
-                
-                cooccur_count = len(candidate_objects & input_objects)
-                rate = cooccur_count / max(1, len(input_objects))
-                
-                # Reduced penalty for rare tags
-                if candidate_count >= 50:
-                    contradiction_penalty += 1 - rate
-                else:
-                    contradiction_penalty += (1 - rate) * (candidate_count / 50)
-            
-            cooccurrence_norm = cooccurrence_score / max(1, len(input_tags))
-            rarity_boosted = rarity_score * (1 + math.log1p(rarity_score))
-            
-            # Check for strong correlation (99%+ co-occurrence)
-            strongly_correlated = False
-            max_correlation = 0.0
-            for t in input_tags:
-                candidate_objs = self.tag_to_objects.get(candidate, set())
-                t_objs = self.tag_to_objects.get(t, set())
-                if t_objs:
-                    cooccur_ratio = len(candidate_objs & t_objs) / len(t_objs)
-                    max_correlation = max(max_correlation, cooccur_ratio)
-                    if cooccur_ratio >= STRONG_CORRELATION_THRESHOLD:
-                        strongly_correlated = True
-                        break
-            
-            # Base score
-            score = ALPHA * cooccurrence_norm + BETA * rarity_boosted - GAMMA * contradiction_penalty
-            
-            # Massive boost for strong correlation (likely synonyms)
-            if strongly_correlated:
-                score = STRONG_CORRELATION_BOOST + max_correlation
-            
-            # Even bigger boost for confirmed synonyms
-            if candidate in synonym_boost_tags:
-                score = SYNONYM_BOOST_SCORE
-            
-            suggestions.append({
-                "tag": candidate,
-                "score": round(score, 4),
-                "probability": round(score, 4),
-                "similarity": 0.0,
-                "rarity": round(rarity_boosted, 4),
-                "cooccurrence": round(cooccurrence_norm, 4),
-                "penalty": round(contradiction_penalty, 4),
-                "is_synonym": candidate in synonym_boost_tags
-            })
+            suggestion = self._score_candidate(candidate, input_tags, synonym_boost_tags, confirmed_antonyms,
+                                               input_postings)
+            if suggestion is not None:
+                suggestions.append(suggestion)
         
         suggestions.sort(key=lambda x: x["score"], reverse=True)
         paginated = suggestions[offset : offset + top_n]
         
         return {
-            "matched_documents": self.total_objects,
+            "matched_documents": matched_documents,
             "suggestions": paginated,
             "has_more": (offset + top_n) < len(suggestions)
         }
+
+    def calculate_image_suggestions(self, clip_ranking, input_tags=None, top_n=10, offset=0,
+                                    seed_count=5, rrf_k=60, clip_weight=1.0, cooccurrence_weight=1.0):
+        """
+        Fuse an image's CLIP ranking with co-occurrence scores.
+        
+        clip_ranking is the CLIP shortlist [{"tag", "score"}, ...], best first.
+        Only shortlist tags are scored for co-occurrence, against the input
+        tags plus the top seed_count CLIP tags. The two rankings are merged
+        by weighted reciprocal-rank fusion, so their different scales don't
+        matter; tags without a co-occurrence score keep their CLIP rank only.
+        """
+        # Load confirmed relations
+        confirmed_synonyms = get_confirmed_synonyms()
+        confirmed_antonyms = get_confirmed_antonyms()
+        
+        with self.lock:
+            input_tags = [t for t in (input_tags or []) if self.tag_to_objects.get(t)]
+            clip_seeds = [item["tag"] for item in clip_ranking[:seed_count] if self.tag_to_objects.get(item["tag"])]
+            matched_documents = self.total_objects
+        seeds = list(dict.fromkeys(input_tags + clip_seeds))
+        seed_postings = self._postings(seeds)
+        
+        synonym_boost_tags = []
+        for seed in seeds:
+            for syn in confirmed_synonyms.get(seed, ()):
+                if syn not in input_tags:
+                    synonym_boost_tags.append(syn)
+        
+        scored = []
+        for clip_rank, item in enumerate(clip_ranking, start=1):
+            candidate = item["tag"]
+            # HARD FILTER: tags the user already has and their confirmed antonyms
+            if candidate in input_tags or self.is_antonym_pair(candidate, input_tags, confirmed_antonyms):
+                continue
+            
+            # A CLIP seed is scored against the other seeds, not itself
+            context = [s for s in seeds if s != candidate]
+            suggestion = None
+            if context:
+                suggestion = self._score_candidate(candidate, context, synonym_boost_tags, confirmed_antonyms,
+                                                   seed_postings)
+            if suggestion is None:
+                suggestion = {"tag": candidate, "score": None, "rarity": 0.0, "cooccurrence": 0.0,
+                              "penalty": 0.0, "is_synonym": False}
+            
+            suggestion["cooccurrence_score"] = suggestion.pop("score")
+            suggestion["similarity"] = round(item["score"], 4)
+            suggestion["clip_rank"] = clip_rank
+            scored.append(suggestion)
+        
+        # Co-occurrence rank among the shortlist
+        ranked = sorted((s for s in scored if s["cooccurrence_score"] is not None),
+                        key=lambda x: x["cooccurrence_score"], reverse=True)
+        for rank, suggestion in enumerate(ranked, start=1):
+            suggestion["cooccurrence_rank"] = rank
+        
+        for suggestion in scored:
+            fused = clip_weight / (rrf_k + suggestion["clip_rank"])
+            if "cooccurrence_rank" in suggestion:
+                fused += cooccurrence_weight / (rrf_k + suggestion["cooccurrence_rank"])
+            else:
+                suggestion["cooccurrence_rank"] = None
+            suggestion["score"] = round(fused, 6)
+            suggestion["probability"] = suggestion["score"]
+        
+        scored.sort(key=lambda x: x["score"], reverse=True)
+        paginated = scored[offset : offset + top_n]
+        
+        return {
+            "matched_documents": matched_documents,
+            "seed_tags": seeds,
+            "suggestions": paginated,
+            "has_more": (offset + top_n) < len(scored)
+        }
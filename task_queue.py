@@ -0,0 +1,155 @@
+# ==========================================
+# FILE: task_queue.py
+# ==========================================
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised when a BoundedExecutor has no free slot for another task."""
+    pass
+
+
+# =====================================================
+# BOUNDED EXECUTOR
+# =====================================================
+class BoundedExecutor:
+    """
+    Fixed-size thread pool with a bounded backlog. submit() raises
+    QueueFullError instead of queueing without limit, so callers can
+    shed load (HTTP 429) rather than oversubscribing the CPU.
+    """
+
+    def __init__(self, max_workers=4, queue_size=64, name="tasks"):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + queue_size)
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(f"{self.max_workers} running and {self.queue_size} queued")
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# =====================================================
+# TTL TASK STORE
+# =====================================================
+class TaskStore:
+    """
+    Thread-safe task state for background jobs.
+
+    Each task is a small JSON-able dict (status, stage, progress, result
+    fields). Finished tasks are evicted ttl_seconds after they finish.
+    Futures attached to a task are kept outside the public dict so
+    cancel() can stop the work.
+    """
+
+    FINISHED = ("completed", "error", "cancelled")
+
+    def __init__(self, ttl_seconds=600, sweep_interval=5.0):
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._tasks = {}      # task_id -> public state dict
+        self._futures = {}    # task_id -> list of futures to cancel
+        self._finished_at = {}
+        self._last_sweep = 0.0
+
+    # -------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------
+    def create(self, task_id, **fields):
+        self._sweep()
+        with self._lock:
+            self._tasks[task_id] = dict({"status": "pending", "stage": "queued", "progress": 0,
+                                         "created": time.time()}, **fields)
+            self._futures[task_id] = []
+
+    def update(self, task_id, **fields):
+        """Merge fields into a live task. Returns False if it is gone or already finished."""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task["status"] in self.FINISHED:
+                return False
+            task.update(fields)
+            if fields.get("status") in self.FINISHED:
+                self._finished_at[task_id] = time.time()
+                self._futures.pop(task_id, None)
+            return True
+
+    def attach(self, task_id, future):
+        """Register a future to be cancelled along with the task."""
+        with self._lock:
+            if task_id in self._futures:
+                self._futures[task_id].append(future)
+                return True
+        future.cancel()
+        return False
+
+    def cancel(self, task_id):
+        """
+        Mark a task cancelled and cancel its attached futures.
+        Returns the task's state, or None if unknown.
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            if task["status"] in self.FINISHED:
+                return dict(task)
+            task.update(status="cancelled", stage="cancelled")
+            self._finished_at[task_id] = time.time()
+            futures = self._futures.pop(task_id, [])
+
+        for future in futures:
+            future.cancel()
+        return dict(task)
+
+    def remove(self, task_id):
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            self._futures.pop(task_id, None)
+            self._finished_at.pop(task_id, None)
+
+    # -------------------------------------------------
+    # Reads
+    # -------------------------------------------------
+    def get(self, task_id):
+        self._sweep()
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return dict(task) if task is not None else None
+
+    def is_cancelled(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return task is None or task["status"] == "cancelled"
+
+    def __len__(self):
+        return len(self._tasks)
+
+    # -------------------------------------------------
+    # TTL eviction
+    # -------------------------------------------------
+    def _sweep(self):
+        now = time.time()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        with self._lock:
+            self._last_sweep = now
+            expired = [tid for tid, t in self._finished_at.items() if now - t > self.ttl_seconds]
+            for tid in expired:
+                self._tasks.pop(tid, None)
+                self._futures.pop(tid, None)
+                del self._finished_at[tid]
@@ -0,0 +1,27 @@
+# ==========================================
+# FILE: tests/test_ann_index.py
+# ==========================================
+import torch
+
+from ann_index import IVFTagIndex
+
+
+def _normalized(n, dim=32, seed=0):
+    gen = torch.Generator().manual_seed(seed)
+    vectors = torch.randn(n, dim, generator=gen)
+    return vectors / vectors.norm(dim=-1, keepdim=True)
+
+
+def test_search_skips_rows_added_after_the_snapshot():
+    matrix = _normalized(150)
+    snapshot = matrix[:100]
+    index = IVFTagIndex.build(snapshot, n_lists=4)
+    index.add(matrix[100:], start=100)
+
+    for query in _normalized(20, seed=1):
+        scores, ids = index.search(snapshot, query, n_probe=4)
+        assert ids.numel() == 100 and int(ids.max()) < 100
+        assert torch.allclose(scores, snapshot[ids] @ query)
+
+    scores, ids = index.search(matrix, matrix[120], n_probe=4)
+    assert 120 in ids.tolist()
@@ -0,0 +1,98 @@
+# ==========================================
+# FILE: tests/test_database.py
+# ==========================================
+import random
+from collections import Counter
+
+import pytest
+
+import database
+from database import (add_tag_relation, delete_tag_relation, get_db_connection, list_tag_relations,
+                      update_relation_direction, update_relation_type)
+
+
+SORTS = ["created_date_asc", "created_date_desc", "tag1_count_asc", "tag1_count_desc", "gap_asc", "gap_desc"]
+
+
+@pytest.fixture
+def relations_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "RELATIONS_DB", str(tmp_path / "relations.db"))
+    monkeypatch.setattr(database, "OBJECTS_DB", str(tmp_path / "objects.db"))
+    monkeypatch.setattr(database, "_relations_fts", None)
+    monkeypatch.setattr(database, "_gap_column", None)
+    database.init_databases()
+    return database.RELATIONS_DB
+
+
+def _populate(n, seed=0):
+    """n relations whose sort keys repeat (and are NULL for some created dates)"""
+    rng = random.Random(seed)
+    for i in range(n):
+        add_tag_relation(f"tag{i}", f"other{i % 7}", rng.choice(["synonym", "antonym", "unrelated"]),
+                         tag1_count=rng.randint(1, 4), tag2_count=rng.choice([4, 8, 16]))
+    conn = get_db_connection(database.RELATIONS_DB)
+    try:
+        conn.execute("UPDATE tag_relations SET created_date = CASE WHEN id % 5 = 0 THEN NULL "
+                     "ELSE '2024-01-0' || (id % 3 + 1) END")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _rows():
+    conn = get_db_connection(database.RELATIONS_DB)
+    try:
+        return conn.execute("SELECT id, tag1, tag2, relation_type FROM tag_relations").fetchall()
+    finally:
+        conn.close()
+
+
+def _ids(relations):
+    return [r["id"] for r in relations]
+
+
+@pytest.mark.parametrize("sort_by", SORTS)
+def test_cursor_pages_match_offset_pages(relations_db, sort_by):
+    _populate(95)
+    pages = -(-95 // 7)
+    expected = {page: _ids(list_tag_relations(page, 7, sort_by=sort_by)[0]) for page in range(1, pages + 1)}
+    assert sorted(sum(expected.values(), [])) == sorted(r[0] for r in _rows())
+
+    # Forward, backward and skipping pages from the previous page's cursor
+    cursor = None
+    for page in list(range(1, pages + 1)) + list(range(pages - 1, 0, -1)) + [3, 6, 4, 4, pages, 1]:
+        relations, total, _, cursor = list_tag_relations(page, 7, sort_by=sort_by, cursor=cursor)
+        assert total == 95
+        assert _ids(relations) == expected[page], page
+
+
+def test_cursor_is_ignored_when_the_query_changes(relations_db):
+    _populate(40)
+    _, _, _, cursor = list_tag_relations(2, 7, sort_by="tag1_count_desc")
+    relations = list_tag_relations(3, 7, sort_by="tag1_count_asc", cursor=cursor)[0]
+    assert _ids(relations) == _ids(list_tag_relations(3, 7, sort_by="tag1_count_asc")[0])
+
+
+def test_counts_and_search_follow_writes(relations_db):
+    _populate(60)
+    rows = _rows()
+    update_relation_type(rows[0][0], "antonym" if rows[0][3] != "antonym" else "synonym")
+    update_relation_type(rows[1][0], rows[1][3])  # same type
+    update_relation_direction(rows[2][0], True, swap=True)
+    delete_tag_relation(rows[3][0])
+    delete_tag_relation(rows[4][0])
+    add_tag_relation(rows[5][1], rows[5][2], "unrelated")  # existing pair: update in place
+    add_tag_relation("searchable-new", "other1", "synonym")
+
+    rows = _rows()
+    _, total, stats, _ = list_tag_relations(1, 200)
+    expected = Counter(r[3] for r in rows)
+    assert total == len(rows) == stats["total"]
+    assert {t: n for t, n in stats.items() if t != "total"} == dict(expected)
+    for relation_type, count in expected.items():
+        assert list_tag_relations(1, 200, filter_type=relation_type)[1] == count
+
+    for search in ("tag2", "other1", "searchable", "ag1", "nothing-like-it"):
+        relations, total, _, _ = list_tag_relations(1, 200, search=search)
+        matching = sorted(r[0] for r in rows if search in r[1] or search in r[2])
+        assert sorted(_ids(relations)) == matching and total == len(matching), search
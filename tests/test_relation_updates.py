@@ -0,0 +1,206 @@
+# ==========================================
+# FILE: tests/test_relation_updates.py
+# ==========================================
+import math
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import config
+import database
+import relation_analyzer
+from relation_analyzer import RelationAnalyzer
+from relation_store import RelationCandidateStore
+from suggestion_engine import SuggestionEngine
+
+
+def _corpus(n_objects, seed=0):
+    """Tag lists with a skewed tag distribution, so every mined band is populated"""
+    rng = random.Random(seed)
+    vocab = [f"tag{i}" for i in range(120)]
+    weights = [1.0 / (i + 1) ** 0.8 for i in range(len(vocab))]
+    lists = []
+    for _ in range(n_objects):
+        tags = set(rng.choices(vocab, weights, k=rng.randint(3, 9)))
+        if "tag1" in tags and rng.random() < 0.9:
+            tags.discard("tag2")  # an antonym-like pair
+        if "tag3" in tags:
+            tags.add("tag4")      # a synonym-like pair
+        lists.append(sorted(tags))
+    return lists
+
+
+def _index(tag_lists):
+    tag_counts, tag_to_objects = Counter(), {}
+    for row, tags in enumerate(tag_lists):
+        for tag in tags:
+            tag_counts[tag] += 1
+            tag_to_objects.setdefault(tag, set()).add(row)
+    return dict(tag_counts), tag_to_objects
+
+
+def _key(s):
+    return (s['relation_type'], s['tag1'], s['tag2'], s['context_tags'])
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database, "RELATIONS_DB", str(tmp_path / "relations.db"))
+    monkeypatch.setattr(database, "OBJECTS_DB", str(tmp_path / "objects.db"))
+    monkeypatch.setattr(relation_analyzer, "TAG_CONTEXT_CACHE", str(tmp_path / "tag_contexts.npz"))
+    monkeypatch.setitem(config.PERF_SETTINGS, 'candidate_count_tolerance', 0.0)
+    monkeypatch.setitem(config.PERF_SETTINGS, 'candidate_min_count_delta', 0)
+    monkeypatch.setitem(config.PERF_SETTINGS, 'contextual_min_context_count', 300)
+    monkeypatch.setitem(config.PERF_SETTINGS, 'min_tag_frequency_antonym', 50)
+    database.init_databases()
+    return tmp_path
+
+
+def test_incremental_candidates_match_fresh_mine(workdir):
+    tag_lists = _corpus(3000)
+    tag_counts, tag_to_objects = _index(tag_lists)
+    engine = SuggestionEngine(tag_lists, tag_counts, tag_to_objects, len(tag_lists))
+    analyzer = RelationAnalyzer(tag_counts, tag_to_objects, RelationCandidateStore(str(workdir / "relations.db")),
+                                lock=engine.lock)
+    assert analyzer._stored_candidates()
+
+    rng = random.Random(1)
+    live = list(range(len(tag_lists)))
+    rng.shuffle(live)
+    for row in live[:400]:
+        analyzer.remove_object(row, engine.remove_object(row))
+    for tags in _corpus(100, seed=2):
+        analyzer.add_object(engine.add_object(tags), tags)
+
+    incremental = analyzer._stored_candidates()
+
+    fresh_counts, fresh_objects = _index(tag_lists)
+    fresh = RelationAnalyzer(fresh_counts, fresh_objects)
+    fresh._tags, fresh._tag_ids = analyzer._tags, analyzer._tag_ids
+    expected = fresh._mine_candidates()
+
+    assert sorted(incremental, key=_key) == sorted(expected, key=_key)
+
+
+def test_rare_tag_churn_is_not_a_change(workdir, monkeypatch):
+    tag_lists = _corpus(3000)
+    for i in range(9000):
+        tag_lists[i % 3000] = tag_lists[i % 3000] + [f"mid{i // 10}"]  # 900 tags of 10 fill the top 1000
+    for row in range(2000):
+        tag_lists[row] = tag_lists[row] + [f"rare{row}"]  # a long tail beyond every mined band
+    tag_counts, tag_to_objects = _index(tag_lists)
+    analyzer = RelationAnalyzer(tag_counts, tag_to_objects)
+    snapshot = dict(tag_counts)
+    rare = set(tag_counts).difference(*analyzer._candidate_scope(tag_counts))
+    assert rare
+    monkeypatch.setitem(config.PERF_SETTINGS, 'candidate_count_tolerance', 0.05)
+    monkeypatch.setitem(config.PERF_SETTINGS, 'candidate_min_count_delta', 5)
+    for tag in rare:
+        tag_counts[tag] += 3  # far beyond 5% of a rare count, below the floor
+    assert analyzer._changed_tags(snapshot, dirty=rare) == set()
+
+    common = max(tag_counts, key=tag_counts.get)
+    tag_counts[common] += int(tag_counts[common] * 0.1)
+    assert common in analyzer._changed_tags(snapshot)
+
+
+def test_suggestion_engine_tracks_object_updates(workdir):
+    tag_lists = _corpus(500)
+    tag_counts, tag_to_objects = _index(tag_lists)
+    engine = SuggestionEngine(tag_lists, tag_counts, tag_to_objects, len(tag_lists))
+
+    row = engine.add_object(["tag0", "brand-new"])
+    assert engine.total_objects == 501 and tag_counts["brand-new"] == 1
+    assert engine.remove_object(row) == ["tag0", "brand-new"]
+    assert "brand-new" not in tag_counts and "brand-new" not in tag_to_objects
+
+    for row in range(100):
+        engine.remove_object(row)
+    fresh_counts, fresh_objects = _index(tag_lists)
+    assert tag_counts == fresh_counts
+    assert {t: s for t, s in tag_to_objects.items()} == fresh_objects
+    assert engine.total_objects == 400
+    assert engine.tag_rarity("tag0") == pytest.approx(math.log(401 / (fresh_counts["tag0"] + 1)))
+
+    result = engine.calculate_suggestions(["tag0"], top_n=200)
+    assert result["matched_documents"] == 400
+    assert all(s["tag"] in fresh_counts for s in result["suggestions"])
+
+
+def test_sparse_engine_matches_pairwise_mining(workdir, monkeypatch):
+    tag_lists = _corpus(3000)
+    monkeypatch.setitem(config.PERF_SETTINGS, 'enable_parallel_processing', False)
+
+    def mine(use_sparse_engine):
+        monkeypatch.setitem(config.PERF_SETTINGS, 'use_sparse_engine', use_sparse_engine)
+        tag_counts, tag_to_objects = _index(tag_lists)
+        return RelationAnalyzer(tag_counts, tag_to_objects).mine_suggestions()
+
+    sparse = mine(True)
+    assert sparse
+    assert sorted(sparse, key=_key) == sorted(mine(False), key=_key)
+
+
+def test_engine_folds_match_a_rebuild(workdir):
+    tag_lists = _corpus(3000)
+    tag_counts, tag_to_objects = _index(tag_lists)
+    engine = SuggestionEngine(tag_lists, tag_counts, tag_to_objects, len(tag_lists))
+    analyzer = RelationAnalyzer(tag_counts, tag_to_objects, lock=engine.lock)
+    cooccurrence = analyzer._cooccurrence_engine()
+    cooccurrence.statistics()
+
+    rng = random.Random(3)
+    for row in rng.sample(range(len(tag_lists)), 500):
+        analyzer.remove_object(row, engine.remove_object(row))
+    for tags in _corpus(200, seed=4):
+        analyzer.add_object(engine.add_object(tags), tags)
+    assert analyzer._cooccurrence_engine() is cooccurrence
+
+    fresh_counts, fresh_objects = _index(tag_lists)
+    fresh = RelationAnalyzer(fresh_counts, fresh_objects)
+    fresh._tags, fresh._tag_ids = analyzer._tags, analyzer._tag_ids
+    rebuilt = fresh._cooccurrence_engine()
+
+    folded, expected = cooccurrence.statistics(), rebuilt.statistics()
+    assert np.array_equal(folded.tracked, expected.tracked)
+    assert (folded.matrix() != expected.matrix()).nnz == 0
+    assert sorted(analyzer.mine_suggestions(), key=_key) == sorted(fresh.mine_suggestions(), key=_key)
+
+
+def _borderline_corpus(pairs=12, per_side=300, unique=10, seed=5):
+    """
+    Mutually exclusive tag pairs whose context sets share 4..15 of their
+    tags, so context similarity spans the 0.35 antonym threshold.
+    """
+    rng = random.Random(seed)
+    lists = []
+    for k in range(pairs):
+        shared = [f"p{k}s{i}" for i in range(4 + k)]
+        for side in "ab":
+            context = shared + [f"p{k}{side}{i}" for i in range(unique)]
+            for _ in range(per_side):
+                lists.append(sorted({f"pair{k}{side}"} | set(rng.sample(context, 3))))
+    return lists
+
+
+def test_minhash_screen_keeps_every_exact_antonym(workdir, monkeypatch):
+    tag_lists = _borderline_corpus()
+
+    def mine(minhash_error):
+        monkeypatch.setitem(config.PERF_SETTINGS, 'context_minhash_error', minhash_error)
+        tag_counts, tag_to_objects = _index(tag_lists)
+        analyzer = RelationAnalyzer(tag_counts, tag_to_objects)
+        return analyzer, analyzer.mine_suggestions(relation_type='antonym')
+
+    analyzer, exact = mine(None)
+    similarity = [analyzer._tag_contexts().similarity(f"pair{k}a", f"pair{k}b") for k in range(12)]
+    assert min(similarity) < 0.35 < max(similarity)
+    assert any(abs(s - 0.35) < 0.05 for s in similarity)
+    assert any(s['tag1'].startswith("pair") for s in exact)
+
+    for minhash_error in (0.1, 0.2):
+        _, screened = mine(minhash_error)
+        assert sorted(screened, key=_key) == sorted(exact, key=_key)